@@ -29,6 +29,24 @@ const SAMPLE_DECKS = [
   { id: 4, title: 'Calculus I',         subject: 'MATHS',      cards: 40,  progress: 52, lastPracticed: '3d ago',  colour: C.amber,   colourBg: C.amberBg   },
 ]
 
+// Calls onLine with each parsed line of an NDJSON response body as it arrives.
+async function readNdjson(response, onLine) {
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    buffered += decoder.decode(value, { stream: !done })
+    const lines = buffered.split('\n')
+    buffered = lines.pop()
+    for (const line of lines) {
+      if (line.trim()) onLine(JSON.parse(line))
+    }
+    if (done) break
+  }
+  if (buffered.trim()) onLine(JSON.parse(buffered))
+}
+
 export default function Flashcards() {
   const [view, setView]               = useState('decks')
   const [decks]                       = useState(SAMPLE_DECKS)
@@ -39,14 +57,16 @@ export default function Flashcards() {
   const [file, setFile]               = useState(null)
   const [maxCards, setMaxCards]       = useState(12)
   const [loading, setLoading]         = useState(false)
+  const [streamedCards, setStreamedCards] = useState([])
   const fileInputRef                  = useRef(null)
   const [generatingPremade, setGeneratingPremade] = useState(false)
   const [error, setError]             = useState('')
 
   // study session state
-  const [deck, setDeck]               = useState([])
+  const [sessionId, setSessionId]     = useState(null)
+  const [card, setCard]               = useState(null)
+  const [remaining, setRemaining]     = useState(0)
   const [totalCards, setTotalCards]   = useState(0)
-  const [cardIdx, setCardIdx]         = useState(0)
   const [flipped, setFlipped]         = useState(false)
   const [stats, setStats]             = useState({ easy: 0, hard: 0, missed: 0 })
 
@@ -57,6 +77,25 @@ export default function Flashcards() {
 
   // ── Handlers ───────────────────────────────────────────────────────────────
 
+  // Stores the generated cards as a deck and opens a server-side session on it;
+  // from here on only the current card travels between client and server.
+  async function beginSession(cards, title, subject) {
+    const deckRes = await axios.post('http://localhost:8000/flashcards/decks', {
+      title: title || 'Study Session',
+      subject: subject || 'General',
+      cards: cards.map(({ term, definition }) => ({ term, definition })),
+    })
+    const res = await axios.post(`http://localhost:8000/flashcards/decks/${deckRes.data.id}/sessions`)
+    setSessionId(res.data.id)
+    setCard(res.data.card)
+    setRemaining(res.data.remaining)
+    setTotalCards(res.data.total_cards)
+    setFlipped(false)
+    setUserAnswer('')
+    setFeedback(null)
+    setStats({ easy: 0, hard: 0, missed: 0 })
+  }
+
   // Called when "Study Now" is clicked on a premade deck card
   async function startStudy(deckData) {
     setActiveDeck(deckData)
@@ -69,14 +108,7 @@ export default function Flashcards() {
         deck_title: deckData.title,
         max_cards: 15,
       })
-      const cards = res.data.flashcards
-      setDeck(cards)
-      setTotalCards(cards.length)
-      setCardIdx(0)
-      setFlipped(false)
-      setUserAnswer('')
-      setFeedback(null)
-      setStats({ easy: 0, hard: 0, missed: 0 })
+      await beginSession(res.data.flashcards, deckData.title, res.data.subject)
       setView('study')
     } catch (e) {
       setError(e.response?.data?.detail || 'Failed to generate cards. Is the backend running?')
@@ -90,6 +122,7 @@ export default function Flashcards() {
     if (!noteText.trim() && !file) { setError('Please paste some notes or upload a file first.'); return }
     setError('')
     setLoading(true)
+    setStreamedCards([])
     try {
       let res
       if (file) {
@@ -97,28 +130,39 @@ export default function Flashcards() {
         if (noteText) formData.append('note_text', noteText)
         formData.append('file', file)
         formData.append('max_cards', maxCards)
-        res = await axios.post('http://localhost:8000/flashcards/generate-upload', formData, {
-            headers: { 'Content-Type': 'multipart/form-data' }
-        })
+        res = await fetch('http://localhost:8000/flashcards/generate-upload/stream', { method: 'POST', body: formData })
       } else {
-        res = await axios.post('http://localhost:8000/flashcards/generate', {
-          note_text: noteText,
-          max_cards: maxCards,
+        res = await fetch('http://localhost:8000/flashcards/generate/stream', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ note_text: noteText, max_cards: maxCards }),
         })
       }
+      if (!res.ok) {
+        const body = await res.json().catch(() => ({}))
+        throw new Error(typeof body.detail === 'string' ? body.detail : 'Failed to generate cards.')
+      }
 
-      const cards = res.data.flashcards
-      setDeck(cards)
-      setTotalCards(cards.length)
-      setCardIdx(0)
-      setFlipped(false)
-      setUserAnswer('')
-      setFeedback(null)
-      setStats({ easy: 0, hard: 0, missed: 0 })
+      // Cards are shown as Claude writes them; the session starts once the stream says it is done.
+      const cards = []
+      let finished = false
+      await readNdjson(res, line => {
+        if (line.type === 'card') {
+          cards.push(line)
+          setStreamedCards([...cards])
+        } else if (line.type === 'error') {
+          throw new Error(line.detail || 'Failed to generate cards.')
+        } else if (line.type === 'done') {
+          finished = true
+        }
+      })
+      if (!finished) throw new Error('Card generation stopped before it finished.')
+
+      await beginSession(cards)
       setActiveDeck(null)
       setView('study')
     } catch (e) {
-      setError(e.response?.data?.detail || 'Failed to connect to backend.')
+      setError(e.response?.data?.detail || (e instanceof TypeError ? 'Failed to connect to backend.' : e.message))
     } finally {
       setLoading(false)
     }
@@ -127,25 +171,18 @@ export default function Flashcards() {
   async function handleRate(rating) {
     if (!flipped) { setError('Flip the card first!'); return }
     setError('')
-    const newStats = { ...stats, [rating]: stats[rating] + 1 }
-    setStats(newStats)
     try {
-      const res = await axios.post('http://localhost:8000/flashcards/rate', {
-        cards: deck,
-        card_id: deck[cardIdx % deck.length].id,
+      const res = await axios.post(`http://localhost:8000/flashcards/sessions/${sessionId}/rate`, {
+        card_id: card.id,
         rating,
       })
-      const updated = res.data.cards
-      setDeck(updated)
-      if (res.data.session_complete || updated.length === 0) {
+      setStats(res.data.stats)
+      setCard(res.data.card)
+      setRemaining(res.data.remaining)
+      if (res.data.session_complete) {
         setView('complete')
         return
       }
-      if (rating === 'easy') {
-        setCardIdx(cardIdx % updated.length)
-      } else {
-        setCardIdx((cardIdx + 1) % updated.length)
-      }
       setFlipped(false)
       setUserAnswer('')
       setFeedback(null)
@@ -160,10 +197,9 @@ export default function Flashcards() {
     setIsChecking(true)
     setError('')
     try {
-      const currentCard = deck[cardIdx % deck.length]
       const res = await axios.post('http://localhost:8000/flashcards/check', {
-        term: currentCard.term,
-        definition: currentCard.definition,
+        term: card.term,
+        definition: card.definition,
         user_answer: userAnswer,
       })
       setFeedback(res.data)
@@ -194,7 +230,7 @@ export default function Flashcards() {
     }
     window.addEventListener('keydown', onKey)
     return () => window.removeEventListener('keydown', onKey)
-  }, [view, flipped, deck, cardIdx, stats])
+  }, [view, flipped, sessionId, card])
 
   // ── Render ─────────────────────────────────────────────────────────────────
   return (
@@ -313,11 +349,24 @@ export default function Flashcards() {
                 </div>
                 <button style={loading ? s.btnDisabled : s.btnPrimary} onClick={handleGenerate} disabled={loading}>
                   {loading
-                    ? <span style={{ display:'flex', alignItems:'center', gap:8 }}><Spinner /> Extracting with AI…</span>
+                    ? <span style={{ display:'flex', alignItems:'center', gap:8 }}><Spinner /> Extracting with AI… {streamedCards.length > 0 && `(${streamedCards.length})`}</span>
                     : '✨ Generate Flashcards'}
                 </button>
               </div>
               {error && <p style={s.errorText}>{error}</p>}
+              {loading && streamedCards.length > 0 && (
+                <div style={{ marginTop:16 }}>
+                  {streamedCards.map(streamed => (
+                    <div key={streamed.id} style={{ ...s.tipRow, ...s.fadeIn }}>
+                      <span style={s.tipDot} />
+                      <span style={{ fontSize:13, lineHeight:1.5 }}>
+                        <strong style={{ color:C.text }}>{streamed.term}</strong>
+                        <span style={{ color:C.muted }}> — {streamed.definition}</span>
+                      </span>
+                    </div>
+                  ))}
+                </div>
+              )}
             </div>
             <div style={{ display:'flex', flexDirection:'column', gap:16 }}>
               <div style={s.card}>
@@ -343,7 +392,7 @@ export default function Flashcards() {
       )}
 
       {/* ── STUDY ─────────────────────────────────────────────────────────── */}
-      {view === 'study' && deck.length > 0 && (
+      {view === 'study' && card && (
         <div style={s.fadeIn}>
           <div style={s.pageHeader}>
             <div>
@@ -366,11 +415,11 @@ export default function Flashcards() {
 
           <div style={s.progressWrap}>
             <div style={s.progressMeta}>
-              <span style={{ fontSize:13, color:C.muted }}>Card {(cardIdx%deck.length)+1} of {deck.length} remaining</span>
-              <span style={{ fontSize:13, color:C.muted }}>{Math.round(((totalCards-deck.length)/totalCards)*100)}% mastered</span>
+              <span style={{ fontSize:13, color:C.muted }}>{remaining} of {totalCards} cards remaining</span>
+              <span style={{ fontSize:13, color:C.muted }}>{Math.round(((totalCards-remaining)/totalCards)*100)}% mastered</span>
             </div>
             <div style={s.progressTrack}>
-              <div style={{ ...s.progressFill, width:`${((totalCards-deck.length)/totalCards)*100}%` }} />
+              <div style={{ ...s.progressFill, width:`${((totalCards-remaining)/totalCards)*100}%` }} />
             </div>
           </div>
 
@@ -380,7 +429,7 @@ export default function Flashcards() {
                 <div style={{ ...s.cardInner, transform: flipped ? 'rotateY(180deg)' : 'rotateY(0deg)' }}>
                   <div style={s.cardFront}>
                     <span style={s.cardFaceLabel}>TERM</span>
-                    <p style={s.cardTerm}>{deck[cardIdx%deck.length]?.term}</p>
+                    <p style={s.cardTerm}>{card.term}</p>
                     <div style={{ marginTop:24, width:'100%' }} onClick={e => e.stopPropagation()}>
                       <textarea
                         style={{ ...s.textarea, minHeight:80, fontSize:15 }}
@@ -398,13 +447,13 @@ export default function Flashcards() {
                           : 'Check Answer'}
                       </button>
                     </div>
-                    <div style={s.cardCounter}>{(cardIdx%deck.length)+1} / {deck.length}</div>
+                    <div style={s.cardCounter}>{remaining} left</div>
                     <span style={s.cardHint}>Or click anywhere to reveal definition</span>
                   </div>
 
                   <div style={s.cardBack}>
                     <span style={s.cardFaceLabel}>DEFINITION</span>
-                    <p style={s.cardDefinition}>{deck[cardIdx%deck.length]?.definition}</p>
+                    <p style={s.cardDefinition}>{card.definition}</p>
                     {feedback && (
                       <div style={{ marginTop:20, padding:16, borderRadius:8, background:feedback.correct?C.greenBg:C.redBg, border:`1px solid ${feedback.correct?'#bbf7d0':'#fecaca'}`, width:'100%', textAlign:'left' }}>
                         <p style={{ fontWeight:600, color:feedback.correct?C.green:C.red, marginBottom:4, fontSize:14 }}>
@@ -413,7 +462,7 @@ export default function Flashcards() {
                         <p style={{ fontSize:14, color:C.text, lineHeight:1.5 }}>{feedback.feedback}</p>
                       </div>
                     )}
-                    <div style={s.cardCounter}>{(cardIdx%deck.length)+1} / {deck.length}</div>
+                    <div style={s.cardCounter}>{remaining} left</div>
                     <span style={s.cardHint}>Rate yourself below</span>
                   </div>
                 </div>
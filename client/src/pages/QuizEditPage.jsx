@@ -226,7 +226,11 @@ export default function QuizEditPage() {
       const response = await api.post(`/api/quizzes/${id}/generate`, formData, { timeout: 120000 })
       setQuestions(response.data.questions)
       setLatestUpload(file.name)
-      setSuccess(`Generated ${response.data.created_count} questions in ${response.data.llm_latency_ms}ms`)
+      const dropped = response.data.duplicates_dropped
+      setSuccess(
+        `Generated ${response.data.created_count} questions in ${response.data.llm_latency_ms}ms` +
+          (dropped ? ` (${dropped} near-duplicate${dropped === 1 ? '' : 's'} left out)` : ''),
+      )
       setActiveTab('questions')
 
       // Refetch quiz metadata + attempts from backend so all tabs
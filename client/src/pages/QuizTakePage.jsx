@@ -115,6 +115,37 @@ export default function QuizTakePage() {
     loadSession()
   }, [id, attemptIdFromQuery])
 
+  const hasPendingGrades = Object.values(answersByQuestionId).some((answer) => answer.grading_status === 'pending')
+
+  // Open answers are graded in the background; poll the attempt until their scores land.
+  useEffect(() => {
+    if (!session || !hasPendingGrades) {
+      return undefined
+    }
+
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.get(`/api/attempts/${session.id}`)
+        setAnswersByQuestionId((previous) => {
+          const next = { ...previous }
+          for (const answer of response.data.answers || []) {
+            const known = previous[answer.question_id]
+            // Skip answers edited since this poll was sent; their own save result is newer.
+            if (known?.grading_status === 'pending' && known.user_answer === answer.user_answer) {
+              next[answer.question_id] = answer
+            }
+          }
+          return next
+        })
+      } catch {
+        // Keep polling; a transient failure should not leave the placeholder feedback forever.
+        setAnswersByQuestionId((previous) => ({ ...previous }))
+      }
+    }, 1500)
+
+    return () => clearTimeout(timer)
+  }, [session, hasPendingGrades, answersByQuestionId])
+
   async function saveAnswer(questionId, userAnswer) {
     if (!session) {
       return
@@ -135,6 +166,7 @@ export default function QuizTakePage() {
           user_answer: userAnswer,
           score: response.data.score,
           ai_feedback: response.data.ai_feedback,
+          grading_status: response.data.grading_status,
           updated_at: new Date().toISOString(),
         },
       }))
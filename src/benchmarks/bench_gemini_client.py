@@ -0,0 +1,98 @@
+"""Per-call latency of a fresh Gemini client versus the pooled GeminiService client.
+
+Both variants talk to the local stub in ``benchmarks.llm_stub``, so the numbers
+isolate client construction and connection setup from model latency::
+
+    cd src && python -m benchmarks.bench_gemini_client --calls 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Callable
+
+try:
+    from ..services.gemini import GeminiService
+    from ..services.gemini import GradeEnvelope
+    from ..services.gemini import _extract_response_text
+    from .llm_stub import running_stub
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from services.gemini import GeminiService
+    from services.gemini import GradeEnvelope
+    from services.gemini import _extract_response_text
+    from benchmarks.llm_stub import running_stub
+
+
+API_KEY = "benchmark-key"
+MODEL = "stub-model"
+
+
+def _per_call_client(base_url: str) -> Callable[[], None]:
+    from google import genai
+
+    def call() -> None:
+        client = genai.Client(api_key=API_KEY, http_options={"base_url": base_url})
+        try:
+            response = client.models.generate_content(
+                model=MODEL,
+                contents="Grade this answer.",
+                config={"response_mime_type": "application/json", "response_schema": GradeEnvelope},
+            )
+            _extract_response_text(response)
+        finally:
+            client.close()
+
+    return call
+
+
+def _pooled_client(service: GeminiService) -> Callable[[], None]:
+    def call() -> None:
+        service.grade_open_answer(
+            reference_text="Cells are the basic unit of life.",
+            question_text="What is a cell?",
+            user_answer="The basic unit of life.",
+        )
+
+    return call
+
+
+def _measure(call: Callable[[], None], calls: int) -> list[float]:
+    call()  # warm imports and, for the pooled client, the connection
+    samples: list[float] = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples: list[float]) -> float:
+    ordered = sorted(samples)
+    p50 = statistics.median(ordered)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    mean = statistics.fmean(ordered)
+    print(f"{label:<18} mean={mean:7.2f}ms p50={p50:7.2f}ms p95={p95:7.2f}ms")
+    return mean
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Artificial stub latency per request")
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms) as stub:
+        service = GeminiService(api_key=API_KEY, model_name=MODEL, base_url=stub.base_url)
+        try:
+            fresh_mean = _report("client per call", _measure(_per_call_client(stub.base_url), args.calls))
+            pooled_mean = _report("pooled client", _measure(_pooled_client(service), args.calls))
+        finally:
+            service.close()
+
+    print(f"saved per call     {fresh_mean - pooled_mean:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Local stand-in for the Gemini and Anthropic REST APIs used by benchmarks.
+
+Serves Gemini's ``POST /v1beta/models/{model}:generateContent`` and its
+``:streamGenerateContent?alt=sse`` variant, and Anthropic's ``POST /v1/messages``
+(with ``"stream": true`` answered as typed SSE events), over plain HTTP/1.1 with
+keep-alive. Responses are canned JSON shaped like what the caller asked for:
+quiz questions, grades or summaries for Gemini, flashcard arrays or answer
+checks for Claude.
+
+Each request waits ``latency_ms`` before answering, drawn from
+``latency_distribution`` (``fixed``, ``uniform`` over 0..2x, ``exponential``
+or ``lognormal`` with median ``latency_ms`` and shape ``latency_sigma``).
+Faults can be injected with ``fail_first`` (fail the first N requests) and
+``error_rate`` (fail a random share of the rest), both answered with
+``error_status``. A ``seed`` makes latencies and faults reproducible. Run it
+standalone with ``python -m benchmarks.llm_stub --port 8765``.
+"""
+
+from __future__ import annotations
+
+import argparse
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from typing import Any
+from typing import Iterator
+
+
+_GENERATED_QUESTION = {
+    "type": "mcq",
+    "question_text": "Which structure is the basic unit of life?",
+    "options": ["Cell", "Atom", "Organ", "Tissue"],
+    "correct_option": "A",
+    "explanation": "The cell is the smallest unit that carries out life processes.",
+}
+
+
+def _gemini_payload_for(request_body: dict[str, Any]) -> dict[str, Any]:
+    config_blob = json.dumps(request_body.get("generationConfig", {}))
+    if '"summary"' in config_blob:
+        return {"summary": "Stub summary.", "key_points": ["Stub point"], "questions": [_GENERATED_QUESTION]}
+    if '"grades"' in config_blob:
+        prompt = json.dumps(request_body.get("contents", []))
+        question_ids = [int(value) for value in re.findall(r'question_id=\\+"(\d+)', prompt)]
+        return {"grades": [{"question_id": qid, "score": 0.75, "feedback": "Stub feedback."} for qid in question_ids]}
+    if '"score"' in config_blob:
+        return {"score": 0.75, "feedback": "Stub feedback."}
+    return {"questions": [_GENERATED_QUESTION]}
+
+
+_LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+def _prompt_text(request_body: dict[str, Any]) -> str:
+    parts: list[str] = []
+    for message in request_body.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content if isinstance(block, dict))
+    return "\n".join(parts)
+
+
+def _claude_payload_for(request_body: dict[str, Any]) -> Any:
+    prompt = _prompt_text(request_body)
+    if '"correct"' in prompt:
+        return {"correct": True, "feedback": "Stub feedback."}
+    match = re.search(r"(\d+) flashcards", prompt)
+    count = int(match.group(1)) if match else 5
+    return [
+        {"term": f"Stub term {index + 1}", "definition": f"Stub definition number {index + 1}."}
+        for index in range(count)
+    ]
+
+
+def _claude_message(model: str, text: str) -> dict[str, Any]:
+    return {
+        "id": "msg_stub",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 1, "output_tokens": 1},
+    }
+
+
+def _claude_stream_events(model: str, text: str, step: int) -> list[tuple[str | None, dict[str, Any]]]:
+    start = {**_claude_message(model, ""), "content": [], "stop_reason": None}
+    events: list[tuple[str | None, dict[str, Any]]] = [
+        ("message_start", {"type": "message_start", "message": start}),
+        ("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}),
+    ]
+    events.extend(
+        (
+            "content_block_delta",
+            {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text[index : index + step]}},
+        )
+        for index in range(0, len(text), step)
+    )
+    events.extend(
+        [
+            ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+            (
+                "message_delta",
+                {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": 1}},
+            ),
+            ("message_stop", {"type": "message_stop"}),
+        ]
+    )
+    return events
+
+
+def _gemini_response(text: str) -> dict[str, Any]:
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "usageMetadata": {"promptTokenCount": 1, "candidatesTokenCount": 1, "totalTokenCount": 2},
+    }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def setup(self) -> None:
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle's
+        # algorithm adds ~40ms to every keep-alive response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self) -> None:  # noqa: N802 - stdlib handler naming
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.split("?")[0] == "/v1/messages":
+            self._handle_claude(body)
+            return
+        streaming = ":streamGenerateContent" in self.path
+        if not streaming and ":generateContent" not in self.path:
+            self._send_json(404, {"error": {"code": 404, "message": f"Unknown path {self.path}"}})
+            return
+
+        if not self._admit():
+            status = self.server.error_status
+            self._send_json(status, {"error": {"code": status, "message": "Injected fault", "status": "UNAVAILABLE"}})
+            return
+
+        text = json.dumps(_gemini_payload_for(body))
+        if streaming:
+            step = self.server.stream_chunk_chars
+            self._send_sse([(None, _gemini_response(text[index : index + step])) for index in range(0, len(text), step)])
+        else:
+            self._send_json(200, _gemini_response(text))
+
+    def _handle_claude(self, body: dict[str, Any]) -> None:
+        if not self._admit():
+            status = self.server.error_status
+            kind = "overloaded_error" if status == 529 else "rate_limit_error" if status == 429 else "api_error"
+            self._send_json(status, {"type": "error", "error": {"type": kind, "message": "Injected fault"}})
+            return
+
+        model = body.get("model", "stub-model")
+        text = json.dumps(_claude_payload_for(body))
+        if body.get("stream"):
+            self._send_sse(_claude_stream_events(model, text, self.server.stream_chunk_chars))
+        else:
+            self._send_json(200, _claude_message(model, text))
+
+    def _admit(self) -> bool:
+        """Count the request, wait out its sampled latency and decide whether it fails."""
+        self.server.request_count += 1
+        delay_ms = self.server.sample_latency_ms()
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        return not self.server.should_fail()
+
+    def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+        encoded = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _send_sse(self, events: list[tuple[str | None, dict[str, Any]]]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for name, event in events:
+            prefix = f"event: {name}\r\n" if name else ""
+            encoded = f"{prefix}data: {json.dumps(event)}\r\n\r\n".encode("utf-8")
+            self.wfile.write(f"{len(encoded):X}\r\n".encode("ascii") + encoded + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+        return
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        latency_ms: float = 0.0,
+        latency_distribution: str = "fixed",
+        latency_sigma: float = 0.5,
+        stream_chunk_chars: int = 48,
+        fail_first: int = 0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int | None = None,
+    ) -> None:
+        if latency_distribution not in _LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_distribution must be one of {_LATENCY_DISTRIBUTIONS}")
+        super().__init__((host, port), _StubHandler)
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.stream_chunk_chars = stream_chunk_chars
+        self.fail_first = fail_first
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._fault_lock = threading.Lock()
+
+    def sample_latency_ms(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        with self._fault_lock:
+            if self.latency_distribution == "uniform":
+                return self._random.uniform(0, 2 * self.latency_ms)
+            if self.latency_distribution == "exponential":
+                return self._random.expovariate(1 / self.latency_ms)
+            if self.latency_distribution == "lognormal":
+                return self.latency_ms * math.exp(self._random.gauss(0, self.latency_sigma))
+            return self.latency_ms
+
+    def should_fail(self) -> bool:
+        with self._fault_lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return True
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+@contextmanager
+def running_stub(**kwargs: Any) -> Iterator[StubServer]:
+    server = StubServer(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local Gemini and Anthropic API stub.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-distribution", choices=_LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = StubServer(
+        args.host,
+        args.port,
+        latency_ms=args.latency_ms,
+        latency_distribution=args.latency_distribution,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    print(f"LLM stub listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
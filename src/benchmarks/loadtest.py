@@ -0,0 +1,316 @@
+"""Offline end-to-end load test of the API against the local LLM stub.
+
+Boots the app under uvicorn on a throwaway database with ``GEMINI_BASE_URL``
+and ``CLAUDE_BASE_URL`` pointed at ``benchmarks.llm_stub``, then starts a
+weighted mix of user scenarios at a fixed rate (open loop, so slow responses
+do not lower the offered load) and reports throughput and latency percentiles
+per request step::
+
+    cd src && python -m benchmarks.loadtest --rps 10 --duration 30 \\
+        --latency-ms 400 --latency-distribution lognormal --error-rate 0.02
+
+Scenarios: ``generate`` (create a quiz and generate questions from an upload),
+``attempt`` (answer an MCQ and an AI-graded open question, then complete),
+``flashcards`` (generate a deck and check an answer) and ``video`` (analyze a
+video). Video analysis normally downloads a YouTube transcript; the harness
+swaps that fetch for a canned transcript so the run stays offline. Provider
+limits default to off because the stub has no quota; set the usual
+``*_MAX_IN_FLIGHT`` / ``*_REQUESTS_PER_MINUTE`` variables to test them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from collections import defaultdict
+from dataclasses import dataclass
+from dataclasses import field
+import itertools
+import logging
+import math
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+import httpx
+
+try:
+    from .llm_stub import running_stub
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from benchmarks.llm_stub import running_stub
+
+
+SCENARIOS = ("generate", "attempt", "flashcards", "video")
+DEFAULT_MIX = "generate=1,attempt=4,flashcards=3,video=1"
+SEED_QUIZZES = 4
+_TRANSCRIPT = "Cells are the basic unit of life. Mitochondria produce ATP through respiration. " * 40
+
+
+@dataclass
+class LoadStats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: dict[str, Counter[str]] = field(default_factory=lambda: defaultdict(Counter))
+    scenarios: Counter[str] = field(default_factory=Counter)
+    failed_scenarios: Counter[str] = field(default_factory=Counter)
+
+    def record(self, step: str, seconds: float, status: str) -> None:
+        self.latencies[step].append(seconds * 1000)
+        self.statuses[step][status] += 1
+
+
+class _StepFailed(RuntimeError):
+    pass
+
+
+@dataclass
+class _Runner:
+    client: httpx.AsyncClient
+    stats: LoadStats
+    quiz_ids: list[int]
+    rng: random.Random
+    _sequence: itertools.count = field(default_factory=itertools.count, init=False, repr=False)
+
+    async def step(self, name: str, method: str, url: str, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as error:
+            self.stats.record(name, time.perf_counter() - start, type(error).__name__)
+            raise _StepFailed(name) from error
+        self.stats.record(name, time.perf_counter() - start, str(response.status_code))
+        if response.status_code >= 400:
+            raise _StepFailed(name)
+        return response.json() if response.content else None
+
+    def unique(self) -> int:
+        # Varies every prompt so the generation and grading caches cannot short-circuit the upstream call.
+        return next(self._sequence)
+
+    async def generate(self) -> int:
+        quiz = await self.step("quiz.create", "POST", "/api/quizzes", json={"title": f"Load quiz {self.unique()}"})
+        notes = f"Run {self.unique()}. {_TRANSCRIPT}".encode("utf-8")
+        await self.step(
+            "quiz.generate",
+            "POST",
+            f"/api/quizzes/{quiz['id']}/generate",
+            files={"file": ("notes.txt", notes, "text/plain")},
+            data={"mcq_count": "1", "open_count": "0"},
+        )
+        return quiz["id"]
+
+    async def attempt(self) -> None:
+        quiz_id = self.rng.choice(self.quiz_ids)
+        session = await self.step(
+            "attempt.start", "POST", f"/api/quizzes/{quiz_id}/attempts", json={"resume_if_exists": False}
+        )
+        for question in session["questions"]:
+            if question["type"] == "mcq":
+                await self.step(
+                    "attempt.answer_mcq", "PUT", f"/api/attempts/{session['id']}/answers/{question['id']}", json={"user_answer": "A"}
+                )
+            else:
+                answer = f"Cells use mitochondria to make energy ({self.unique()})."
+                await self.step(
+                    "attempt.answer_open", "PUT", f"/api/attempts/{session['id']}/answers/{question['id']}", json={"user_answer": answer}
+                )
+        await self.step("attempt.complete", "POST", f"/api/attempts/{session['id']}/complete")
+
+    async def flashcards(self) -> None:
+        notes = f"Session {self.unique()}. {_TRANSCRIPT[:600]}"
+        deck = await self.step("flashcards.generate", "POST", "/flashcards/generate", json={"note_text": notes, "max_cards": 5})
+        card = deck["flashcards"][0]
+        await self.step(
+            "flashcards.check",
+            "POST",
+            "/flashcards/check",
+            json={"term": card["term"], "definition": card["definition"], "user_answer": f"My answer {self.unique()}"},
+        )
+
+    async def video(self) -> None:
+        await self.step(
+            "video.analyze", "POST", "/transcription/analyze", json={"video_url": f"https://youtu.be/load{self.unique()}"}
+        )
+
+    async def seed(self, count: int) -> None:
+        """Quizzes for the attempt scenario: one generated MCQ plus one open question."""
+        for _ in range(count):
+            quiz_id = await self.generate()
+            await self.step(
+                "seed.open_question",
+                "POST",
+                f"/api/quizzes/{quiz_id}/questions",
+                json={"type": "open", "question_text": "How do cells obtain energy?", "explanation": {"text": "Cells respire to make ATP."}},
+            )
+            self.quiz_ids.append(quiz_id)
+
+    async def run_scenario(self, name: str) -> None:
+        scenarios: dict[str, Callable[[], Awaitable[Any]]] = {
+            "generate": self.generate,
+            "attempt": self.attempt,
+            "flashcards": self.flashcards,
+            "video": self.video,
+        }
+        try:
+            await scenarios[name]()
+        except _StepFailed:
+            self.stats.failed_scenarios[name] += 1
+        finally:
+            self.stats.scenarios[name] += 1
+
+
+def parse_mix(raw: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for part in filter(None, (item.strip() for item in raw.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}; expected one of {SCENARIOS}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The scenario mix needs at least one positive weight")
+    return mix
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    rank = max(1, min(len(ordered), math.ceil(fraction * len(ordered))))
+    return ordered[rank - 1]
+
+
+def _configure_environment(stub_url: str, database: str) -> None:
+    # Must run before the app is imported: settings are read once at import time.
+    os.environ.update(
+        {
+            "GEMINI_API_KEY": "loadtest-key",
+            "GEMINI_BASE_URL": stub_url,
+            "CLAUDE_API_KEY": "loadtest-key",
+            "CLAUDE_BASE_URL": stub_url,
+            "DB_PATH": database,
+        }
+    )
+    for name in ("GEMINI_MAX_IN_FLIGHT", "CLAUDE_MAX_IN_FLIGHT", "CLAUDE_REQUESTS_PER_MINUTE", "CLAUDE_TOKENS_PER_MINUTE"):
+        os.environ.setdefault(name, "0")
+    # Startup warm-up calls would land in the measured window.
+    os.environ.setdefault("PREMADE_WARMUP", "false")
+
+
+def _load_app() -> Any:
+    try:
+        from ..main import app
+        from ..routers import transcription
+    except ImportError:  # pragma: no cover - allows top-level module imports
+        from main import app
+        from routers import transcription
+
+    transcription.fetch_transcript = lambda video_id: f"Transcript of {video_id}. {_TRANSCRIPT}"
+    return app
+
+
+def _serve(app: Any) -> tuple[Any, threading.Thread, str]:
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("API server failed to start")
+        time.sleep(0.05)
+    host, port = sock.getsockname()[:2]
+    return server, thread, f"http://{host}:{port}"
+
+
+async def drive(base_url: str, *, rps: float, duration: float, mix: dict[str, float], seed: int | None) -> tuple[LoadStats, float]:
+    stats = LoadStats()
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=256)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        runner = _Runner(client, stats, [], rng)
+        await runner.seed(SEED_QUIZZES)
+        stats.latencies.clear()
+        stats.statuses.clear()
+
+        names, weights = list(mix), list(mix.values())
+        tasks: list[asyncio.Task[None]] = []
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for index in range(int(rps * duration)):
+            delay = start + index / rps - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(runner.run_scenario(rng.choices(names, weights)[0])))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - start
+    return stats, elapsed
+
+
+def report(stats: LoadStats, elapsed: float) -> None:
+    total = sum(len(samples) for samples in stats.latencies.values())
+    errors = sum(
+        count for statuses in stats.statuses.values() for status, count in statuses.items() if not status.startswith(("2", "3"))
+    )
+    print(f"{'step':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step in sorted(stats.latencies):
+        ordered = sorted(stats.latencies[step])
+        failed = sum(count for status, count in stats.statuses[step].items() if not status.startswith(("2", "3")))
+        print(
+            f"{step:<22}{len(ordered):>7}{failed:>8}"
+            f"{percentile(ordered, 0.50):>10.1f}{percentile(ordered, 0.95):>10.1f}"
+            f"{percentile(ordered, 0.99):>10.1f}{ordered[-1]:>10.1f}"
+        )
+    completed = sum(stats.scenarios.values())
+    failed = sum(stats.failed_scenarios.values())
+    print(f"scenarios  {completed} run, {failed} failed, {completed / elapsed:.2f}/s")
+    print(f"requests   {total} sent, {errors} errors, {total / elapsed:.2f}/s over {elapsed:.1f}s")
+    for step, statuses in sorted(stats.statuses.items()):
+        unusual = {status: count for status, count in statuses.items() if not status.startswith(("2", "3"))}
+        if unusual:
+            print(f"  {step}: {unusual}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=5.0, help="Scenarios started per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep starting scenarios")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. attempt=3,video=1")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Stub latency per upstream request")
+    parser.add_argument("--latency-distribution", default="lognormal")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of upstream requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    # Per-request client logs from both sides of the stub would drown the report.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as workdir, running_stub(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.latency_distribution,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    ) as stub:
+        _configure_environment(stub.base_url, os.path.join(workdir, "loadtest.db"))
+        server, thread, base_url = _serve(_load_app())
+        try:
+            stats, elapsed = asyncio.run(drive(base_url, rps=args.rps, duration=args.duration, mix=mix, seed=args.seed))
+        finally:
+            server.should_exit = True
+            thread.join()
+        report(stats, elapsed)
+        print(f"upstream   {stub.request_count} stub requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,8 +14,56 @@ load_dotenv()
 class Settings:
     gemini_api_key: str
     gemini_model: str
+    gemini_base_url: str
+    gemini_max_connections: int
+    gemini_max_keepalive_connections: int
+    gemini_keepalive_expiry_seconds: float
+    gemini_timeout_seconds: float
+    gemini_retry_attempts: int
+    gemini_retry_base_delay_seconds: float
+    gemini_retry_max_delay_seconds: float
+    gemini_hedge_requests: bool
+    gemini_circuit_failure_threshold: int
+    gemini_circuit_reset_seconds: float
+    generation_cache_ttl_seconds: int
+    generation_cache_max_entries: int
+    generation_cache_memory_entries: int
+    grading_cache_ttl_seconds: int
+    grading_cache_max_entries: int
+    grading_cache_memory_entries: int
+    defer_open_grading: bool
+    grading_workers: int
+    grading_queue_size: int
+    generation_max_source_chars: int
+    generation_max_pdf_pages: int
+    generation_chunk_chars: int
+    generation_chunk_concurrency: int
+    grading_context_tokens: int
+    grading_local_accept_score: float
+    grading_local_reject_score: float
+    retrieval_passage_chars: int
+    question_duplicate_threshold: float
+    flashcard_max_interval_days: int
+    flashcard_check_accept_score: float
+    flashcard_check_reject_score: float
+    premade_variants: int
+    premade_cards_per_deck: int
+    premade_regenerate_interval_seconds: float
+    premade_warmup: bool
     claude_api_key: str
     claude_model: str
+    claude_base_url: str
+    claude_timeout_seconds: float
+    claude_max_connections: int
+    claude_max_keepalive_connections: int
+    gemini_max_in_flight: int
+    gemini_requests_per_minute: int
+    gemini_tokens_per_minute: int
+    claude_max_in_flight: int
+    claude_requests_per_minute: int
+    claude_tokens_per_minute: int
+    llm_queue_timeout_seconds: float
+    threadpool_size: int
     db_path: Path
     cors_origins: tuple[str, ...]
 
@@ -40,8 +88,56 @@ def _parse_cors_origins(raw: str) -> tuple[str, ...]:
 settings = Settings(
     gemini_api_key=os.getenv("GEMINI_API_KEY", ""),
     gemini_model=os.getenv("GEMINI_MODEL", "gemini-3-flash-preview"),
+    gemini_base_url=os.getenv("GEMINI_BASE_URL", ""),
+    gemini_max_connections=int(os.getenv("GEMINI_MAX_CONNECTIONS", "20")),
+    gemini_max_keepalive_connections=int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10")),
+    gemini_keepalive_expiry_seconds=float(os.getenv("GEMINI_KEEPALIVE_EXPIRY_SECONDS", "30")),
+    gemini_timeout_seconds=float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60")),
+    gemini_retry_attempts=int(os.getenv("GEMINI_RETRY_ATTEMPTS", "3")),
+    gemini_retry_base_delay_seconds=float(os.getenv("GEMINI_RETRY_BASE_DELAY_SECONDS", "0.5")),
+    gemini_retry_max_delay_seconds=float(os.getenv("GEMINI_RETRY_MAX_DELAY_SECONDS", "8")),
+    gemini_hedge_requests=os.getenv("GEMINI_HEDGE_REQUESTS", "false").lower() in {"1", "true", "yes"},
+    gemini_circuit_failure_threshold=int(os.getenv("GEMINI_CIRCUIT_FAILURE_THRESHOLD", "5")),
+    gemini_circuit_reset_seconds=float(os.getenv("GEMINI_CIRCUIT_RESET_SECONDS", "30")),
+    generation_cache_ttl_seconds=int(os.getenv("GENERATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    generation_cache_max_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "500")),
+    generation_cache_memory_entries=int(os.getenv("GENERATION_CACHE_MEMORY_ENTRIES", "64")),
+    grading_cache_ttl_seconds=int(os.getenv("GRADING_CACHE_TTL_SECONDS", str(30 * 24 * 3600))),
+    grading_cache_max_entries=int(os.getenv("GRADING_CACHE_MAX_ENTRIES", "5000")),
+    grading_cache_memory_entries=int(os.getenv("GRADING_CACHE_MEMORY_ENTRIES", "256")),
+    defer_open_grading=os.getenv("DEFER_OPEN_GRADING", "false").lower() in {"1", "true", "yes"},
+    grading_workers=int(os.getenv("GRADING_WORKERS", "4")),
+    grading_queue_size=int(os.getenv("GRADING_QUEUE_SIZE", "256")),
+    generation_max_source_chars=int(os.getenv("GENERATION_MAX_SOURCE_CHARS", "1000000")),
+    generation_max_pdf_pages=int(os.getenv("GENERATION_MAX_PDF_PAGES", "500")),
+    generation_chunk_chars=int(os.getenv("GENERATION_CHUNK_CHARS", "40000")),
+    generation_chunk_concurrency=int(os.getenv("GENERATION_CHUNK_CONCURRENCY", "4")),
+    grading_context_tokens=int(os.getenv("GRADING_CONTEXT_TOKENS", "1500")),
+    grading_local_accept_score=float(os.getenv("GRADING_LOCAL_ACCEPT_SCORE", "0.9")),
+    grading_local_reject_score=float(os.getenv("GRADING_LOCAL_REJECT_SCORE", "-1")),
+    retrieval_passage_chars=int(os.getenv("RETRIEVAL_PASSAGE_CHARS", "1200")),
+    question_duplicate_threshold=float(os.getenv("QUESTION_DUPLICATE_THRESHOLD", "0.7")),
+    flashcard_max_interval_days=int(os.getenv("FLASHCARD_MAX_INTERVAL_DAYS", "365")),
+    flashcard_check_accept_score=float(os.getenv("FLASHCARD_CHECK_ACCEPT_SCORE", "0.85")),
+    flashcard_check_reject_score=float(os.getenv("FLASHCARD_CHECK_REJECT_SCORE", "-1")),
+    premade_variants=int(os.getenv("PREMADE_VARIANTS", "3")),
+    premade_cards_per_deck=int(os.getenv("PREMADE_CARDS_PER_DECK", "20")),
+    premade_regenerate_interval_seconds=float(os.getenv("PREMADE_REGENERATE_INTERVAL_SECONDS", "3600")),
+    premade_warmup=os.getenv("PREMADE_WARMUP", "true").lower() in {"1", "true", "yes"},
     claude_api_key=os.getenv("CLAUDE_API_KEY", ""),
-    claude_model=os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307"),
+    claude_model=os.getenv("CLAUDE_MODEL", "claude-haiku-4-5-20251001"),
+    claude_base_url=os.getenv("CLAUDE_BASE_URL", ""),
+    claude_timeout_seconds=float(os.getenv("CLAUDE_TIMEOUT_SECONDS", "60")),
+    claude_max_connections=int(os.getenv("CLAUDE_MAX_CONNECTIONS", "20")),
+    claude_max_keepalive_connections=int(os.getenv("CLAUDE_MAX_KEEPALIVE_CONNECTIONS", "10")),
+    gemini_max_in_flight=int(os.getenv("GEMINI_MAX_IN_FLIGHT", "16")),
+    gemini_requests_per_minute=int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "0")),
+    gemini_tokens_per_minute=int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "0")),
+    claude_max_in_flight=int(os.getenv("CLAUDE_MAX_IN_FLIGHT", "8")),
+    claude_requests_per_minute=int(os.getenv("CLAUDE_REQUESTS_PER_MINUTE", "50")),
+    claude_tokens_per_minute=int(os.getenv("CLAUDE_TOKENS_PER_MINUTE", "50000")),
+    llm_queue_timeout_seconds=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30")),
+    threadpool_size=int(os.getenv("THREADPOOL_SIZE", "40")),
     db_path=_resolve_db_path(os.getenv("DB_PATH", "quiz_arena.db")),
     cors_origins=_parse_cors_origins(os.getenv("CORS_ORIGINS", "")),
 )
@@ -4,14 +4,18 @@ from collections.abc import Generator
 
 from sqlalchemy import event
 from sqlalchemy import create_engine
+from sqlalchemy import inspect
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 try:
     from .config import settings
+    from .services.metrics import instrument_engine
 except ImportError:  # pragma: no cover - allows top-level module imports
     from config import settings
+    from services.metrics import instrument_engine
 
 
 engine = create_engine(
@@ -27,6 +31,9 @@ def _set_sqlite_pragma(dbapi_connection, connection_record) -> None:  # noqa: AN
     cursor.close()
 
 
+instrument_engine(engine)
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -46,6 +53,25 @@ def init_db() -> None:
         import models  # noqa: F401
 
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+
+# Columns added to existing tables after release; ``create_all`` only creates missing tables.
+_ADDED_COLUMNS = {
+    "attempt_answers": {
+        "grading_status": "VARCHAR(8) NOT NULL DEFAULT 'graded'",
+    },
+}
+
+
+def _add_missing_columns() -> None:
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in existing:
+                    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
 
 
 def ensure_test_user() -> None:
@@ -2,19 +2,227 @@ from __future__ import annotations
 
 from functools import lru_cache
 
+from anyio import to_thread
+
 try:
+    from .config import settings
+    from .services.cache import ResultCache
+    from .services.flashcard_check import FlashcardChecker
     from .services.gemini import GeminiService
     from .services.grading import GradingService
+    from .services.grading_queue import GradingQueue
+    from .services.llm import ClaudeProvider
+    from .services.llm import ProviderLimiter
+    from .services.metrics import MetricFamily
+    from .services.metrics import registry
+    from .services.premade import PremadeDeckStore
+    from .services.reference import build_grading_context
 except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
+    from services.cache import ResultCache
+    from services.flashcard_check import FlashcardChecker
     from services.gemini import GeminiService
     from services.grading import GradingService
+    from services.grading_queue import GradingQueue
+    from services.llm import ClaudeProvider
+    from services.llm import ProviderLimiter
+    from services.metrics import MetricFamily
+    from services.metrics import registry
+    from services.premade import PremadeDeckStore
+    from services.reference import build_grading_context
+
+
+@lru_cache(maxsize=1)
+def get_generation_cache() -> ResultCache:
+    return ResultCache(
+        namespace="generation",
+        ttl_seconds=settings.generation_cache_ttl_seconds,
+        max_entries=settings.generation_cache_max_entries,
+        memory_entries=settings.generation_cache_memory_entries,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_llm_limiter(provider: str) -> ProviderLimiter:
+    """One limiter per upstream provider, shared by every caller in the process."""
+    limits = {
+        "gemini": (settings.gemini_max_in_flight, settings.gemini_requests_per_minute, settings.gemini_tokens_per_minute),
+        "claude": (settings.claude_max_in_flight, settings.claude_requests_per_minute, settings.claude_tokens_per_minute),
+    }
+    max_in_flight, requests_per_minute, tokens_per_minute = limits[provider]
+    return ProviderLimiter(
+        name=provider,
+        max_in_flight=max_in_flight,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        queue_timeout_seconds=settings.llm_queue_timeout_seconds,
+    )
 
 
 @lru_cache(maxsize=1)
 def get_gemini_service() -> GeminiService:
-    return GeminiService()
+    return GeminiService(generation_cache=get_generation_cache(), limiter=get_llm_limiter("gemini"))
+
+
+@lru_cache(maxsize=1)
+def get_claude_provider() -> ClaudeProvider:
+    return ClaudeProvider(limiter=get_llm_limiter("claude"))
+
+
+@lru_cache(maxsize=1)
+def get_flashcard_checker() -> FlashcardChecker:
+    return FlashcardChecker()
+
+
+@lru_cache(maxsize=1)
+def get_premade_store() -> PremadeDeckStore:
+    return PremadeDeckStore(claude=get_claude_provider())
+
+
+@lru_cache(maxsize=1)
+def get_grading_cache() -> ResultCache:
+    return ResultCache(
+        namespace="grading",
+        ttl_seconds=settings.grading_cache_ttl_seconds,
+        max_entries=settings.grading_cache_max_entries,
+        memory_entries=settings.grading_cache_memory_entries,
+    )
 
 
 @lru_cache(maxsize=1)
 def get_grading_service() -> GradingService:
-    return GradingService(gemini_service=get_gemini_service())
+    gemini_service = get_gemini_service()
+    return GradingService(
+        gemini_service=gemini_service,
+        grading_cache=get_grading_cache(),
+        # Shares the fitted reference matrices with the offline fallback.
+        local_grader=gemini_service.offline_grader,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_grading_queue() -> GradingQueue:
+    return GradingQueue(
+        workers=settings.grading_workers,
+        max_size=settings.grading_queue_size,
+        reference_builder=build_grading_context,
+    )
+
+
+def start_services() -> None:
+    """Start background workers; must run on the event loop (FastAPI startup)."""
+    # Threads for sync routes and their database work. LLM calls are async and never hold one.
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    get_grading_queue().start()
+    if settings.premade_warmup:
+        get_premade_store().start_warmup()
+
+
+async def close_services() -> None:
+    """Stop background workers and release pooled upstream connections held by the process-wide services."""
+    if get_grading_queue.cache_info().currsize:
+        get_grading_queue().stop()
+    if get_gemini_service.cache_info().currsize:
+        await get_gemini_service().aclose()
+    if get_premade_store.cache_info().currsize:
+        await get_premade_store().aclose()
+    if get_claude_provider.cache_info().currsize:
+        await get_claude_provider().aclose()
+
+
+def _service_metrics() -> list[MetricFamily]:
+    """Scrape-time view of the process-wide services; ones not yet built are skipped."""
+    families = [
+        MetricFamily("cache_lookups_total", "counter", "Result cache lookups by outcome."),
+        MetricFamily("cache_hit_ratio", "gauge", "Share of result cache lookups served from memory or the database."),
+        MetricFamily("llm_in_flight", "gauge", "LLM requests holding a provider slot."),
+        MetricFamily("llm_queued", "gauge", "LLM requests waiting for a provider slot."),
+        MetricFamily("llm_admitted_total", "counter", "LLM requests admitted by the provider limiter."),
+        MetricFamily("llm_rejected_total", "counter", "LLM requests shed after the queue timeout."),
+    ]
+    lookups, ratio, in_flight, queued, admitted, rejected = families
+
+    for factory in (get_generation_cache, get_grading_cache):
+        if not factory.cache_info().currsize:
+            continue
+        cache = factory()
+        for outcome, value in (
+            ("memory_hit", cache.stats.memory_hits),
+            ("db_hit", cache.stats.db_hits),
+            ("miss", cache.stats.misses),
+        ):
+            lookups.samples.append(({"cache": cache.namespace, "outcome": outcome}, value))
+        ratio.samples.append(({"cache": cache.namespace}, cache.stats.hit_ratio))
+
+    for provider in ("gemini", "claude"):
+        limiter = get_llm_limiter(provider)
+        labels = {"provider": provider}
+        in_flight.samples.append((labels, limiter.in_flight))
+        queued.samples.append((labels, limiter.queued))
+        admitted.samples.append((labels, limiter.stats.admitted))
+        rejected.samples.append((labels, limiter.stats.rejected))
+
+    if get_gemini_service.cache_info().currsize:
+        service = get_gemini_service()
+        families.extend(
+            [
+                MetricFamily(
+                    "llm_coalesced_calls_total",
+                    "counter",
+                    "Calls that shared an identical in-flight request.",
+                    [({"provider": "gemini"}, service.single_flight.stats.coalesced)],
+                ),
+                MetricFamily(
+                    "llm_retries_total",
+                    "counter",
+                    "Retried upstream attempts.",
+                    [({"provider": "gemini"}, service.resilience.stats.retries)],
+                ),
+                MetricFamily(
+                    "llm_hedged_requests_total",
+                    "counter",
+                    "Hedged duplicate requests sent.",
+                    [({"provider": "gemini"}, service.resilience.stats.hedges)],
+                ),
+                MetricFamily(
+                    "llm_circuit_open",
+                    "gauge",
+                    "1 while the circuit breaker refuses calls.",
+                    [({"provider": "gemini"}, int(service.resilience.breaker.rejecting))],
+                ),
+            ]
+        )
+
+    if get_grading_service.cache_info().currsize:
+        tier_stats = get_grading_service().tier_stats
+        families.append(
+            MetricFamily(
+                "grading_tier_total",
+                "counter",
+                "Open answers by grading tier: resolved locally or escalated to the LLM.",
+                [
+                    ({"tier": "local_accepted"}, tier_stats.local_accepted),
+                    ({"tier": "local_rejected"}, tier_stats.local_rejected),
+                    ({"tier": "escalated"}, tier_stats.escalated),
+                ],
+            )
+        )
+
+    if get_grading_queue.cache_info().currsize:
+        grading_queue = get_grading_queue()
+        families.extend(
+            [
+                MetricFamily("grading_queue_depth", "gauge", "Open answers waiting for a grading worker.", [({}, grading_queue.depth)]),
+                MetricFamily("grading_queue_in_flight", "gauge", "Open answers being graded.", [({}, grading_queue.in_flight)]),
+                MetricFamily(
+                    "grading_jobs_total",
+                    "counter",
+                    "Background grading jobs by outcome.",
+                    [({"outcome": "completed"}, grading_queue.completed), ({"outcome": "failed"}, grading_queue.failed)],
+                ),
+            ]
+        )
+    return families
+
+
+registry.add_collector(_service_metrics)
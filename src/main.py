@@ -1,39 +1,93 @@
 from __future__ import annotations
 import logging
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import Depends, FastAPI, HTTPException, Request, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from dataclasses import asdict
+from pydantic import BaseModel, Field
 from typing import List, Optional
+import math
 import random
 import json
 import uuid
 import os
-from anthropic import Anthropic
 
 try:
     from .config import settings
     from .database import ensure_test_user
     from .database import init_db
+    from .dependencies import close_services
+    from .dependencies import get_claude_provider
+    from .dependencies import get_flashcard_checker
+    from .dependencies import get_premade_store
+    from .dependencies import start_services
     from .routers.attempts import router as attempts_router
+    from .routers.flashcards import router as flashcards_router
+    from .routers.metrics import router as metrics_router
     from .routers.quizzes import router as quizzes_router
-    from routers.transcription import router as transcription_router
-    from services.extract import extract_text, ephemeral_upload, validate_upload_file
+    from .routers.transcription import router as transcription_router
+    from .services.extract import extract_text, ephemeral_upload, validate_upload_file
+    from .services.flashcard_check import (
+        FlashcardAnswer,
+        FlashcardChecker,
+        FlashcardVerdict,
+        batch_check_prompt,
+        parse_batch_check,
+    )
+    from .services.json_repair import loads_tolerant
+    from .services.json_stream import JsonArrayStreamParser
+    from .services.llm import ClaudeProvider, ProviderBusyError
+    from .services.premade import (
+        PREMADE_TOPICS,
+        PremadeDeckStore,
+        PremadeGenerationError,
+        PremadeRegenerationLimited,
+        cards_from_reply,
+        premade_prompt,
+    )
+    from .services.metrics import MetricsMiddleware
 except ImportError:  # pragma: no cover - allows `uvicorn main:app` from src/
     from config import settings
     from database import ensure_test_user
     from database import init_db
+    from dependencies import close_services
+    from dependencies import get_claude_provider
+    from dependencies import get_flashcard_checker
+    from dependencies import get_premade_store
+    from dependencies import start_services
     from routers.attempts import router as attempts_router
+    from routers.flashcards import router as flashcards_router
+    from routers.metrics import router as metrics_router
     from routers.quizzes import router as quizzes_router
     from routers.transcription import router as transcription_router
     from services.extract import extract_text, ephemeral_upload, validate_upload_file
-
-client = Anthropic(api_key=settings.claude_api_key)
+    from services.flashcard_check import (
+        FlashcardAnswer,
+        FlashcardChecker,
+        FlashcardVerdict,
+        batch_check_prompt,
+        parse_batch_check,
+    )
+    from services.json_repair import loads_tolerant
+    from services.json_stream import JsonArrayStreamParser
+    from services.llm import ClaudeProvider, ProviderBusyError
+    from services.premade import (
+        PREMADE_TOPICS,
+        PremadeDeckStore,
+        PremadeGenerationError,
+        PremadeRegenerationLimited,
+        cards_from_reply,
+        premade_prompt,
+    )
+    from services.metrics import MetricsMiddleware
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s level=%(levelname)s name=%(name)s message=%(message)s",
 )
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Quiz & Viva Arena API", version="1.0.0")
 
@@ -44,10 +98,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(ProviderBusyError)
+async def provider_busy_handler(request: Request, error: ProviderBusyError) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"{error.provider} is busy, please retry shortly."},
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
+
 
 app.include_router(quizzes_router)
 app.include_router(attempts_router)
+app.include_router(flashcards_router)
 app.include_router(transcription_router)
+app.include_router(metrics_router)
 
 COLOURS = [
     "#fde8e8", "#fef3c7", "#d1fae5",
@@ -58,69 +124,6 @@ COLOURS = [
 def get_colour():
     return {"colour": random.choice(COLOURS)}
 
-# ── Premade topic descriptions for Claude to generate cards from ──────────────
-PREMADE_TOPICS = {
-    "human anatomy ii": {
-        "subject": "Medicine",
-        "description": """
-        Human Anatomy II covering:
-        - The cardiovascular system: heart chambers, valves, major vessels (aorta, vena cava, pulmonary)
-        - The respiratory system: trachea, bronchi, alveoli, gas exchange
-        - The nervous system: CNS vs PNS, neurons, synaptic transmission, reflex arcs
-        - The musculoskeletal system: major bones, joints, muscle types, tendons vs ligaments
-        - The digestive system: organs, enzymes, absorption
-        - The endocrine system: key hormones and their glands (insulin, cortisol, adrenaline, thyroxine)
-        - The renal system: nephron structure, filtration, osmoregulation
-        Focus on precise anatomical terminology and functional relationships between structures.
-        """,
-    },
-    "microbiology basic": {
-        "subject": "Biology",
-        "description": """
-        Introductory Microbiology covering:
-        - Cell types: prokaryotes vs eukaryotes, key structural differences
-        - Bacterial structure: cell wall, flagella, pili, plasmids, capsule
-        - Bacterial reproduction: binary fission, conjugation, transformation, transduction
-        - Viruses: structure, lytic vs lysogenic cycles, viral replication
-        - Fungi: hyphae, spore formation, pathogenic fungi
-        - Microbial metabolism: aerobic vs anaerobic respiration, fermentation
-        - Host-pathogen interactions: infection, colonisation, virulence factors
-        - Antibiotics: mechanisms of action (cell wall inhibition, protein synthesis inhibition, etc.)
-        - Gram staining: principle, procedure, interpretation
-        """,
-    },
-    "organic compounds": {
-        "subject": "Chemistry",
-        "description": """
-        Organic Chemistry covering:
-        - Functional groups: alkanes, alkenes, alkynes, alcohols, aldehydes, ketones, carboxylic acids, amines, esters
-        - IUPAC nomenclature rules
-        - Reaction types: addition, substitution, elimination, condensation, hydrolysis
-        - Isomerism: structural isomers, stereoisomers, enantiomers, diastereomers
-        - Mechanisms: nucleophilic substitution (SN1 vs SN2), electrophilic addition
-        - Aromatic chemistry: benzene, electrophilic aromatic substitution
-        - Polymers: addition polymers, condensation polymers
-        - Organic analysis: mass spec, IR spectroscopy, NMR key concepts
-        """,
-    },
-    "calculus i": {
-        "subject": "Mathematics",
-        "description": """
-        Calculus I covering:
-        - Limits: definition, limit laws, one-sided limits, limits at infinity
-        - Continuity: definition, types of discontinuities
-        - Derivatives: definition from first principles, differentiation rules
-        - Rules: power rule, product rule, quotient rule, chain rule
-        - Derivatives of standard functions: sin, cos, tan, exp, ln
-        - Applications: tangent lines, increasing/decreasing functions, critical points
-        - Optimisation: finding local and global maxima/minima
-        - Integration: antiderivatives, definite vs indefinite integrals
-        - Fundamental Theorem of Calculus
-        - Integration techniques: substitution, integration by parts
-        """,
-    },
-}
-
 # ── Models ────────────────────────────────────────────────────────────────────
 class GenerateRequest(BaseModel):
     note_text: str
@@ -140,45 +143,40 @@ class CheckAnswerRequest(BaseModel):
     definition: str
     user_answer: str
 
+class BatchCheckRequest(BaseModel):
+    items: List[CheckAnswerRequest] = Field(min_length=1, max_length=50)
+
+# ── Parse Claude's JSON replies ───────────────────────────────────────────────
+MALFORMED_JSON_DETAIL = "AI returned malformed JSON. Please try again."
+UNCHECKED_FEEDBACK = "This answer could not be checked automatically. Compare it with the definition."
+
+
+def with_card_ids(cards: list[dict]) -> list[dict]:
+    return [{"id": str(uuid.uuid4()), **card} for card in cards]
+
+
+def parse_cards(response_text: str, max_cards: int) -> list[dict]:
+    """Flashcards from Claude's reply, keeping every complete card of a truncated or untidy array."""
+    cards = with_card_ids(cards_from_reply(response_text))
+    if not cards:
+        raise HTTPException(status_code=502, detail=MALFORMED_JSON_DETAIL)
+    return cards[:max_cards]
+
+
 # ── Generate from user notes ──────────────────────────────────────────────────
-@app.post("/flashcards/generate")
-def generate_flashcards(req: GenerateRequest):
-    prompt = f"""
-    You are an expert educational assistant. Extract key concepts from the following notes and create up to {req.max_cards} flashcards.
+def notes_prompt(note_text: str, max_cards: int) -> str:
+    return f"""
+    You are an expert educational assistant. Extract key concepts from the following notes and create up to {max_cards} flashcards.
     Each flashcard should have a 'term' and a 'definition'.
     Return ONLY a JSON array of objects, where each object has 'term' and 'definition' string properties.
     Do not include any markdown formatting like ```json or any other text.
     
     Notes:
-    {req.note_text}
+    {note_text}
     """
-    try:
-        message = client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=2000,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        response_text = message.content[0].text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        cards_data = json.loads(response_text.strip())
-        flashcards = [
-            {"id": str(uuid.uuid4()), "term": c.get("term", ""), "definition": c.get("definition", "")}
-            for c in cards_data
-        ]
-        return {"flashcards": flashcards[:req.max_cards]}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/flashcards/generate-upload")
-async def generate_flashcards_upload(
-    file: Optional[UploadFile] = File(None),
-    note_text: Optional[str] = Form(None),
-    max_cards: int = Form(12)
-):
+async def read_upload_notes(file: Optional[UploadFile], note_text: Optional[str]) -> str:
     text_content = ""
     if note_text:
         text_content += note_text + "\n\n"
@@ -187,118 +185,193 @@ async def generate_flashcards_upload(
         try:
             suffix = validate_upload_file(file)
             async with ephemeral_upload(file, suffix) as temp_path:
-                extracted_text, _ = extract_text(temp_path, suffix)
+                extracted_text, _ = await run_in_threadpool(extract_text, temp_path, suffix)
                 text_content += extracted_text
         except Exception as e:
              raise HTTPException(status_code=400, detail=str(e))
 
     if not text_content.strip():
         raise HTTPException(status_code=400, detail="No content provided for flashcard generation. Please add notes or upload a file.")
+    return text_content
 
-    prompt = f"""
-    You are an expert educational assistant. Extract key concepts from the following notes and create up to {max_cards} flashcards.
-    Each flashcard should have a 'term' and a 'definition'.
-    Return ONLY a JSON array of objects, where each object has 'term' and 'definition' string properties.
-    Do not include any markdown formatting like ```json or any other text.
-    
-    Notes:
-    {text_content}
+
+@app.post("/flashcards/generate")
+async def generate_flashcards(req: GenerateRequest, claude: ClaudeProvider = Depends(get_claude_provider)):
+    prompt = notes_prompt(req.note_text, req.max_cards)
+    try:
+        response_text = await claude.acomplete(prompt, max_tokens=2000, operation="flashcards_generate")
+        return {"flashcards": parse_cards(response_text, req.max_cards)}
+    except (HTTPException, ProviderBusyError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/flashcards/generate-upload")
+async def generate_flashcards_upload(
+    file: Optional[UploadFile] = File(None),
+    note_text: Optional[str] = Form(None),
+    max_cards: int = Form(12),
+    claude: ClaudeProvider = Depends(get_claude_provider),
+):
+    prompt = notes_prompt(await read_upload_notes(file, note_text), max_cards)
+    try:
+        response_text = await claude.acomplete(prompt, max_tokens=2000, operation="flashcards_generate_upload")
+        return {"flashcards": parse_cards(response_text, max_cards)}
+    except (HTTPException, ProviderBusyError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ── Stream generated cards as NDJSON ──────────────────────────────────────────
+def ndjson_line(payload: dict) -> str:
+    return json.dumps(payload) + "\n"
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """Runs ``on_close`` however the response ends: finished, failed, disconnected, or never iterated."""
+
+    def __init__(self, content, *, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
+async def stream_cards(claude: ClaudeProvider, prompt: str, max_cards: int, operation: str) -> StreamingResponse:
+    """
+    One {"type": "card", ...} line per flashcard as soon as Claude has closed
+    its JSON object, then a {"type": "done"} line, or {"type": "error"} if
+    generation fails after the response has started.
     """
+    deltas = claude.astream(prompt, max_tokens=2000, operation=operation)
     try:
-        message = client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=2000,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        response_text = message.content[0].text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        cards_data = json.loads(response_text.strip())
-        flashcards = [
-            {"id": str(uuid.uuid4()), "term": c.get("term", ""), "definition": c.get("definition", "")}
-            for c in cards_data
-        ]
-        return {"flashcards": flashcards[:max_cards]}
+        # Waiting for the first delta here lets a busy provider still answer 503 with Retry-After.
+        first = await anext(deltas, None)
+    except ProviderBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def lines():
+        parser = JsonArrayStreamParser()
+        received = []
+        count = 0
+        try:
+            chunk = first
+            while chunk is not None:
+                received.append(chunk)
+                for card in parser.feed(chunk):
+                    if count < max_cards and card.get("term") and card.get("definition"):
+                        count += 1
+                        card = {"term": str(card["term"]), "definition": str(card["definition"])}
+                        yield ndjson_line({"type": "card", **with_card_ids([card])[0]})
+                if parser.finished or count >= max_cards:
+                    break
+                chunk = await anext(deltas, None)
+            if count == 0:
+                # Nothing streamed cleanly; the buffered reply may still be repairable.
+                for card in with_card_ids(cards_from_reply("".join(received))[:max_cards]):
+                    count += 1
+                    yield ndjson_line({"type": "card", **card})
+        except Exception:
+            logger.exception("event=flashcards_stream_failed operation=%s cards=%s", operation, count)
+            yield ndjson_line({"type": "error", "detail": "Flashcard generation failed.", "count": count})
+            return
+        finally:
+            # Frees the provider slot as soon as the reply is read, not when the client has caught up.
+            await deltas.aclose()
+
+        if count == 0:
+            yield ndjson_line({"type": "error", "detail": MALFORMED_JSON_DETAIL, "count": 0})
+        else:
+            yield ndjson_line({"type": "done", "count": count})
+
+    # The stream already holds a provider slot, so close it even if lines() never runs to its finally.
+    return ClosingStreamingResponse(
+        lines(),
+        on_close=deltas.aclose,
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/flashcards/generate/stream")
+async def stream_flashcards(req: GenerateRequest, claude: ClaudeProvider = Depends(get_claude_provider)):
+    prompt = notes_prompt(req.note_text, req.max_cards)
+    return await stream_cards(claude, prompt, req.max_cards, "flashcards_generate_stream")
+
+
+@app.post("/flashcards/generate-upload/stream")
+async def stream_flashcards_upload(
+    file: Optional[UploadFile] = File(None),
+    note_text: Optional[str] = Form(None),
+    max_cards: int = Form(12),
+    claude: ClaudeProvider = Depends(get_claude_provider),
+):
+    prompt = notes_prompt(await read_upload_notes(file, note_text), max_cards)
+    return await stream_cards(claude, prompt, max_cards, "flashcards_generate_upload_stream")
+
 
 # ── Generate premade deck cards ───────────────────────────────────────────────
 @app.post("/flashcards/generate-premade")
-def generate_premade(req: GeneratePremadeRequest):
+async def generate_premade(
+    req: GeneratePremadeRequest,
+    claude: ClaudeProvider = Depends(get_claude_provider),
+    store: PremadeDeckStore = Depends(get_premade_store),
+):
     """
-    Looks up the topic by deck title and asks Claude to generate
-    high-quality exam-style flashcards for that subject.
+    Serves a stored deck for the fixed premade topics, and asks Claude
+    to generate exam-style flashcards for any other deck title.
     """
     key = req.deck_title.lower().strip()
     topic = PREMADE_TOPICS.get(key)
 
-    if topic is None:
+    try:
+        if topic is not None:
+            cards = await store.deck(key)
+            return {"flashcards": with_card_ids(cards[: req.max_cards]), "subject": topic["subject"]}
+
         # Fallback: generate generic cards for whatever topic name was given
         topic_description = f"The subject of {req.deck_title} at university level."
-    else:
-        topic_description = topic["description"]
-
-    prompt = f"""
-You are an expert university tutor creating high-quality exam flashcards.
-
-Topic: {req.deck_title}
-Curriculum content:
-{topic_description}
-
-Create exactly {req.max_cards} flashcards for this topic.
-
-Requirements:
-- Cover a broad range of concepts across the whole topic
-- Each 'term' should be a specific concept, process, structure, or definition (2-6 words)
-- Each 'definition' should be a clear, precise, student-friendly explanation (1-3 sentences)
-- Include a mix of: key definitions, mechanisms/processes, comparisons, and clinical/applied facts
-- Do NOT repeat similar cards
-
-Return ONLY a valid JSON array. No markdown, no prose, no code fences.
-Each object must have exactly two keys: "term" and "definition".
+        prompt = premade_prompt(req.deck_title, topic_description, req.max_cards)
+        response_text = await claude.acomplete(prompt, max_tokens=3000, operation="flashcards_generate_premade")
+        return {"flashcards": parse_cards(response_text, req.max_cards), "subject": req.deck_title}
+
+    except PremadeGenerationError:
+        raise HTTPException(status_code=502, detail=MALFORMED_JSON_DETAIL)
+    except (HTTPException, ProviderBusyError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-Example format:
-[{{"term": "Mitosis", "definition": "Cell division producing two genetically identical daughter cells. Occurs in 4 stages: prophase, metaphase, anaphase, telophase."}}]
-"""
 
+@app.post("/flashcards/premade/{deck_title}/regenerate")
+async def regenerate_premade(deck_title: str, store: PremadeDeckStore = Depends(get_premade_store)):
+    """Replaces a premade topic's stored decks; allowed once per PREMADE_REGENERATE_INTERVAL_SECONDS."""
+    key = deck_title.lower().strip()
+    if key not in PREMADE_TOPICS:
+        raise HTTPException(status_code=404, detail="Unknown premade deck")
     try:
-        message = client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=3000,
-            messages=[{"role": "user", "content": prompt}]
+        return {"deck_title": deck_title, "variants": await store.regenerate(key)}
+    except PremadeRegenerationLimited as limited:
+        raise HTTPException(
+            status_code=429,
+            detail="This deck was regenerated recently. Please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(limited.retry_after)))},
         )
-        response_text = message.content[0].text.strip()
-
-        # Clean up any accidental markdown fences
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        elif response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-
-        cards_data = json.loads(response_text.strip())
-
-        flashcards = [
-            {"id": str(uuid.uuid4()), "term": c.get("term", ""), "definition": c.get("definition", "")}
-            for c in cards_data
-        ]
-        return {
-            "flashcards": flashcards[:req.max_cards],
-            "subject": topic["subject"] if topic else req.deck_title,
-        }
-
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=502, detail="AI returned malformed JSON. Please try again.")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    except PremadeGenerationError:
+        raise HTTPException(status_code=502, detail=MALFORMED_JSON_DETAIL)
 
 
 # ── Rate a card ───────────────────────────────────────────────────────────────
-@app.post("/flashcards/rate")
+# Superseded by POST /flashcards/sessions/{id}/rate, which keeps the deck server-side.
+@app.post("/flashcards/rate", deprecated=True)
 def rate_flashcard(req: RateRequest):
     updated_cards = []
     for card in req.cards:
@@ -314,7 +387,15 @@ def rate_flashcard(req: RateRequest):
 
 # ── Check a user's written answer ─────────────────────────────────────────────
 @app.post("/flashcards/check")
-def check_answer(req: CheckAnswerRequest):
+async def check_answer(
+    req: CheckAnswerRequest,
+    claude: ClaudeProvider = Depends(get_claude_provider),
+    checker: FlashcardChecker = Depends(get_flashcard_checker),
+):
+    local = checker.triage([FlashcardAnswer(req.term, req.definition, req.user_answer)])[0]
+    if local is not None:
+        return asdict(local)
+
     prompt = f"""
     You are an expert tutor. A student is studying flashcards.
     Term: {req.term}
@@ -328,24 +409,63 @@ def check_answer(req: CheckAnswerRequest):
     Do not include any markdown formatting.
     """
     try:
-        message = client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=700,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        response_text = message.content[0].text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        return json.loads(response_text.strip())
+        response_text = await claude.acomplete(prompt, max_tokens=700, operation="flashcards_check")
+        try:
+            result = loads_tolerant(response_text)
+        except json.JSONDecodeError:
+            result = None
+        if not isinstance(result, dict):
+            raise HTTPException(status_code=502, detail=MALFORMED_JSON_DETAIL)
+        return result
+    except (HTTPException, ProviderBusyError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ── Check many written answers at once ────────────────────────────────────────
+@app.post("/flashcards/check-batch")
+async def check_answers_batch(
+    req: BatchCheckRequest,
+    claude: ClaudeProvider = Depends(get_claude_provider),
+    checker: FlashcardChecker = Depends(get_flashcard_checker),
+):
+    """
+    Marks near-verbatim and empty answers locally, then sends
+    everything else to Claude in a single prompt.
+    """
+    items = [FlashcardAnswer(item.term, item.definition, item.user_answer) for item in req.items]
+    verdicts = checker.triage(items)
+    pending = [index for index, verdict in enumerate(verdicts) if verdict is None]
+    logger.info("event=flashcard_check_batch cards=%s local=%s escalated=%s", len(items), len(items) - len(pending), len(pending))
+
+    if pending:
+        prompt = batch_check_prompt([items[index] for index in pending])
+        try:
+            response_text = await claude.acomplete(
+                prompt, max_tokens=min(4000, 200 + 150 * len(pending)), operation="flashcards_check_batch"
+            )
+        except ProviderBusyError:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        judged = parse_batch_check(response_text, len(pending))
+        if not judged:
+            raise HTTPException(status_code=502, detail=MALFORMED_JSON_DETAIL)
+        for position, index in enumerate(pending):
+            verdicts[index] = judged.get(position) or FlashcardVerdict(False, UNCHECKED_FEEDBACK, "unchecked")
+
+    return {"results": [asdict(verdict) for verdict in verdicts], "llm_calls": 1 if pending else 0}
+
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
     ensure_test_user()
+    start_services()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await close_services()
 
 
 @app.get("/api/health")
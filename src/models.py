@@ -9,6 +9,7 @@ from sqlalchemy import DateTime
 from sqlalchemy import Enum as SAEnum
 from sqlalchemy import Float
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import Text
@@ -31,6 +32,13 @@ class AttemptStatus(str, enum.Enum):
     completed = "completed"
 
 
+class GradingStatus(str, enum.Enum):
+    graded = "graded"
+    pending = "pending"
+    deferred = "deferred"
+    failed = "failed"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -65,6 +73,50 @@ class Quiz(Base):
         cascade="all, delete-orphan",
         order_by="QuizAttempt.started_at.desc()",
     )
+    source_chunks = relationship(
+        "QuizSourceChunk",
+        back_populates="quiz",
+        cascade="all, delete-orphan",
+        order_by="QuizSourceChunk.position",
+    )
+    reference = relationship(
+        "QuizReference",
+        back_populates="quiz",
+        cascade="all, delete-orphan",
+        uselist=False,
+    )
+
+
+class QuizSourceChunk(Base):
+    """A passage of the material a quiz was generated from, kept for grading retrieval."""
+
+    __tablename__ = "quiz_source_chunks"
+
+    id = Column(Integer, primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+
+    quiz = relationship("Quiz", back_populates="source_chunks")
+
+
+class QuizReference(Base):
+    """Grading reference material for a quiz, rebuilt whenever its questions or source change.
+
+    ``version`` increases only when the content hash changes, so clients can
+    tell whether grading material moved under them.
+    """
+
+    __tablename__ = "quiz_references"
+
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    content_hash = Column(String(64), nullable=False)
+    header_text = Column(Text, nullable=False, default="")
+    passages_json = Column(JSON, nullable=False, default=list)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    quiz = relationship("Quiz", back_populates="reference")
 
 
 class Question(Base):
@@ -113,7 +165,121 @@ class AttemptAnswer(Base):
     user_answer = Column(Text, nullable=False, default="")
     score = Column(Float, nullable=False, default=0.0)
     ai_feedback = Column(Text, nullable=True)
+    grading_status = Column(SAEnum(GradingStatus, native_enum=False), nullable=False, default=GradingStatus.graded)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     attempt = relationship("QuizAttempt", back_populates="answers")
     question = relationship("Question", back_populates="answers")
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache_entries"
+    __table_args__ = (
+        UniqueConstraint("namespace", "cache_key", name="uq_cache_namespace_key"),
+        Index("ix_cache_namespace_accessed", "namespace", "last_accessed_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    namespace = Column(String(64), nullable=False)
+    cache_key = Column(String(64), nullable=False)
+    value_json = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    last_accessed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    hit_count = Column(Integer, nullable=False, default=0)
+
+
+class FlashcardDeck(Base):
+    __tablename__ = "flashcard_decks"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    title = Column(String(255), nullable=False)
+    subject = Column(String(120), nullable=False, default="General")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    cards = relationship(
+        "Flashcard",
+        back_populates="deck",
+        cascade="all, delete-orphan",
+        order_by="Flashcard.position",
+    )
+    sessions = relationship("FlashcardSession", back_populates="deck", cascade="all, delete-orphan")
+
+
+class Flashcard(Base):
+    __tablename__ = "flashcards"
+
+    id = Column(Integer, primary_key=True)
+    deck_id = Column(Integer, ForeignKey("flashcard_decks.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    term = Column(Text, nullable=False)
+    definition = Column(Text, nullable=False)
+
+    deck = relationship("FlashcardDeck", back_populates="cards")
+    schedule = relationship("FlashcardSchedule", cascade="all, delete-orphan", uselist=False)
+
+
+class FlashcardSession(Base):
+    """One pass through a deck: cards rated easy leave the rotation, the rest go to the back."""
+
+    __tablename__ = "flashcard_sessions"
+
+    id = Column(Integer, primary_key=True)
+    deck_id = Column(Integer, ForeignKey("flashcard_decks.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    card_count = Column(Integer, nullable=False)
+    next_position = Column(Integer, nullable=False, default=0)
+    easy_count = Column(Integer, nullable=False, default=0)
+    hard_count = Column(Integer, nullable=False, default=0)
+    missed_count = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+    deck = relationship("FlashcardDeck", back_populates="sessions")
+    cards = relationship("FlashcardSessionCard", cascade="all, delete-orphan")
+
+
+class FlashcardSessionCard(Base):
+    """A card's place in a session's review queue; ``position`` is ``None`` once it has been mastered."""
+
+    __tablename__ = "flashcard_session_cards"
+    __table_args__ = (
+        Index("ix_flashcard_session_cards_queue", "session_id", "position"),
+    )
+
+    session_id = Column(Integer, ForeignKey("flashcard_sessions.id", ondelete="CASCADE"), primary_key=True)
+    card_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, nullable=True)
+
+
+class FlashcardSchedule(Base):
+    """SM-2 state of one card: the next review is ``interval_days`` after the last one."""
+
+    __tablename__ = "flashcard_schedules"
+    __table_args__ = (
+        Index("ix_flashcard_schedules_user_due", "user_id", "due_at"),
+    )
+
+    card_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    ease = Column(Float, nullable=False, default=2.5)
+    interval_days = Column(Integer, nullable=False, default=0)
+    repetitions = Column(Integer, nullable=False, default=0)
+    due_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_reviewed_at = Column(DateTime, nullable=True)
+
+
+class PremadeDeckVariant(Base):
+    """One pre-generated deck for a premade topic; each topic keeps several so repeat visits vary."""
+
+    __tablename__ = "premade_deck_variants"
+    __table_args__ = (
+        UniqueConstraint("topic_key", "variant", name="uq_premade_topic_variant"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    topic_key = Column(String(120), nullable=False)
+    variant = Column(Integer, nullable=False)
+    cards_json = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -11,10 +11,14 @@ from sqlalchemy.orm import Session
 from sqlalchemy.orm import selectinload
 
 try:
+    from ..config import settings
     from ..database import get_db
+    from ..dependencies import get_grading_queue
     from ..dependencies import get_grading_service
     from ..models import AttemptAnswer
     from ..models import AttemptStatus
+    from ..models import GradingStatus
+    from ..models import Question
     from ..models import QuestionType
     from ..models import Quiz
     from ..models import QuizAttempt
@@ -24,14 +28,23 @@ try:
     from ..schemas import AttemptResultQuestionRead
     from ..schemas import AttemptResultRead
     from ..schemas import AttemptSessionRead
+    from ..schemas import GradingQueueRead
+    from ..services.gemini import GeminiResponseError
+    from ..services.gemini import OpenAnswer
     from ..services.grading import GradingService
+    from ..services.grading_queue import GradingJob
+    from ..services.grading_queue import GradingQueue
+    from ..services.reference import build_grading_context
     from .utils import build_attempt_session
-    from .utils import build_reference_text
 except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
     from database import get_db
+    from dependencies import get_grading_queue
     from dependencies import get_grading_service
     from models import AttemptAnswer
     from models import AttemptStatus
+    from models import GradingStatus
+    from models import Question
     from models import QuestionType
     from models import Quiz
     from models import QuizAttempt
@@ -41,13 +54,21 @@ except ImportError:  # pragma: no cover - allows top-level module imports
     from schemas import AttemptResultQuestionRead
     from schemas import AttemptResultRead
     from schemas import AttemptSessionRead
+    from schemas import GradingQueueRead
+    from services.gemini import GeminiResponseError
+    from services.gemini import OpenAnswer
     from services.grading import GradingService
+    from services.grading_queue import GradingJob
+    from services.grading_queue import GradingQueue
+    from services.reference import build_grading_context
     from routers.utils import build_attempt_session
-    from routers.utils import build_reference_text
 
 
 router = APIRouter(prefix="/api", tags=["attempts"])
 
+DEFERRED_FEEDBACK = "Answer saved. It will be graded when the attempt is completed."
+PENDING_FEEDBACK = "Answer saved. Grading is in progress."
+
 
 def _attempt_stmt(attempt_id: int):
     return (
@@ -75,31 +96,20 @@ def upsert_answer(
     payload: AnswerUpsert,
     db: Session = Depends(get_db),
     grading_service: GradingService = Depends(get_grading_service),
+    grading_queue: GradingQueue = Depends(get_grading_queue),
 ) -> AnswerResult:
-    attempt = db.scalar(_attempt_stmt(attempt_id))
+    # Hot path: load only the attempt and the one question; grading context comes from the materialized reference.
+    attempt = db.get(QuizAttempt, attempt_id)
     if attempt is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attempt not found")
 
     if attempt.status == AttemptStatus.completed:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Attempt is already completed")
 
-    question = next((item for item in attempt.quiz.questions if item.id == question_id), None)
+    question = db.scalar(select(Question).where(Question.id == question_id, Question.quiz_id == attempt.quiz_id))
     if question is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found for this attempt")
 
-    explanation = ""
-    if isinstance(question.explanation_json, dict):
-        explanation = str(question.explanation_json.get("text", ""))
-
-    score, feedback, graded_by = grading_service.grade_answer(
-        question_type=question.type,
-        question_text=question.question_text,
-        user_answer=payload.user_answer,
-        correct_option=question.correct_option,
-        explanation=explanation,
-        reference_text=build_reference_text(attempt.quiz),
-    )
-
     answer = db.scalar(
         select(AttemptAnswer).where(
             AttemptAnswer.attempt_id == attempt_id,
@@ -115,28 +125,145 @@ def upsert_answer(
         db.add(answer)
 
     answer.user_answer = payload.user_answer
-    answer.score = float(min(1.0, max(0.0, score)))
-    answer.ai_feedback = feedback
     answer.updated_at = datetime.utcnow()
 
+    if question.type == QuestionType.open and grading_service.defer_open_grading:
+        _set_grade(answer, score=0.0, feedback=None, grading_status=GradingStatus.deferred)
+        db.commit()
+        return AnswerResult(
+            score=0.0,
+            ai_feedback=DEFERRED_FEEDBACK,
+            graded_by="deferred",
+            grading_status=GradingStatus.deferred.value,
+        )
+
+    if question.type == QuestionType.open and grading_queue.running:
+        _set_grade(answer, score=0.0, feedback=None, grading_status=GradingStatus.pending)
+        db.commit()
+        job = GradingJob(answer_id=answer.id, user_answer=payload.user_answer, grading_service=grading_service)
+        if grading_queue.submit(job):
+            return AnswerResult(
+                score=0.0,
+                ai_feedback=PENDING_FEEDBACK,
+                graded_by="queued",
+                grading_status=GradingStatus.pending.value,
+            )
+        # The queue is saturated: apply backpressure by grading inline.
+
+    score, feedback, graded_by = grading_service.grade_answer(
+        question_id=question.id,
+        question_type=question.type,
+        question_text=question.question_text,
+        user_answer=payload.user_answer,
+        correct_option=question.correct_option,
+        explanation=_explanation_text(question),
+        reference_text=build_grading_context(db, attempt.quiz_id, question.question_text),
+    )
+    _set_grade(answer, score=score, feedback=feedback, grading_status=GradingStatus.graded)
     db.commit()
 
     return AnswerResult(score=answer.score, ai_feedback=feedback, graded_by=graded_by)
 
 
+def _set_grade(answer: AttemptAnswer, *, score: float, feedback: str | None, grading_status: GradingStatus) -> None:
+    answer.score = float(min(1.0, max(0.0, score)))
+    answer.ai_feedback = feedback
+    answer.grading_status = grading_status
+
+
+@router.get("/grading/queue", response_model=GradingQueueRead)
+def get_grading_queue_status(grading_queue: GradingQueue = Depends(get_grading_queue)) -> GradingQueueRead:
+    return GradingQueueRead(
+        running=grading_queue.running,
+        workers=grading_queue.workers,
+        capacity=grading_queue.max_size,
+        depth=grading_queue.depth,
+        in_flight=grading_queue.in_flight,
+        completed=grading_queue.completed,
+        failed=grading_queue.failed,
+        cancelled=grading_queue.cancelled,
+    )
+
+
+def _explanation_text(question: Question) -> str:
+    if isinstance(question.explanation_json, dict):
+        return str(question.explanation_json.get("text", ""))
+    return ""
+
+
+def _take_over_background_grading(db: Session, attempt: QuizAttempt, grading_queue: GradingQueue) -> None:
+    """Cancel queued grading of this attempt's pending answers and let running jobs finish, so none is graded twice."""
+    pending = [answer for answer in attempt.answers if answer.grading_status == GradingStatus.pending]
+    if not pending:
+        return
+    grading_queue.take_over([answer.id for answer in pending], timeout=settings.gemini_timeout_seconds)
+    # Pick up grades the workers wrote meanwhile; what is still pending is graded with the rest.
+    for answer in pending:
+        db.refresh(answer)
+
+
+def _grade_outstanding_answers(db: Session, attempt: QuizAttempt, grading_service: GradingService) -> None:
+    """Grade every answer still deferred, queued or failed so completion never totals ungraded work."""
+    questions = {question.id: question for question in attempt.quiz.questions}
+    outstanding = [
+        answer
+        for answer in attempt.answers
+        if answer.grading_status != GradingStatus.graded and answer.question_id in questions
+    ]
+    if not outstanding:
+        return
+
+    # One shared context for the batch, retrieved against every outstanding question.
+    grades = grading_service.grade_batch(
+        reference_text=build_grading_context(
+            db,
+            attempt.quiz_id,
+            "\n".join(questions[answer.question_id].question_text for answer in outstanding),
+            token_budget=settings.grading_context_tokens * len(outstanding),
+        ),
+        answers=[
+            OpenAnswer(
+                question_id=answer.question_id,
+                question_text=questions[answer.question_id].question_text,
+                user_answer=answer.user_answer,
+                explanation=_explanation_text(questions[answer.question_id]),
+            )
+            for answer in outstanding
+        ],
+    )
+
+    for answer in outstanding:
+        grade = grades.get(answer.question_id)
+        if grade is None:
+            continue
+        score, feedback, _ = grade
+        _set_grade(answer, score=score, feedback=feedback, grading_status=GradingStatus.graded)
+
+
 @router.post("/attempts/{attempt_id}/complete", response_model=AttemptCompleteRead)
-def complete_attempt(attempt_id: int, db: Session = Depends(get_db)) -> AttemptCompleteRead:
+def complete_attempt(
+    attempt_id: int,
+    db: Session = Depends(get_db),
+    grading_service: GradingService = Depends(get_grading_service),
+    grading_queue: GradingQueue = Depends(get_grading_queue),
+) -> AttemptCompleteRead:
     attempt = db.scalar(_attempt_stmt(attempt_id))
     if attempt is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attempt not found")
 
     question_count = len(attempt.quiz.questions)
-    total_score = sum(answer.score for answer in attempt.answers)
 
     if attempt.status != AttemptStatus.completed:
+        _take_over_background_grading(db, attempt, grading_queue)
+        try:
+            _grade_outstanding_answers(db, attempt, grading_service)
+        except GeminiResponseError as error:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Failed to grade answers") from error
+
         attempt.status = AttemptStatus.completed
         attempt.completed_at = datetime.utcnow()
-        attempt.total_score = float(total_score)
+        attempt.total_score = float(sum(answer.score for answer in attempt.answers))
         db.commit()
 
     percentage = round((attempt.total_score / question_count) * 100, 2) if question_count > 0 else 0.0
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import selectinload
+
+try:
+    from ..database import get_db
+    from ..models import Flashcard
+    from ..models import FlashcardDeck
+    from ..models import FlashcardSchedule
+    from ..models import FlashcardSession
+    from ..models import FlashcardSessionCard
+    from ..models import User
+    from ..schemas import FlashcardDeckCreate
+    from ..schemas import FlashcardDeckRead
+    from ..schemas import FlashcardDueListRead
+    from ..schemas import FlashcardDueRead
+    from ..schemas import FlashcardRateRequest
+    from ..schemas import FlashcardRatingEnum
+    from ..schemas import FlashcardRead
+    from ..schemas import FlashcardRescheduleRead
+    from ..schemas import FlashcardSessionRead
+    from ..schemas import FlashcardStatsRead
+    from ..services.flashcard_sessions import ReviewQueue
+    from ..services.flashcard_sessions import forget_review_queue
+    from ..services.flashcard_sessions import review_queue
+    from ..services.spaced_repetition import due_heap
+    from ..services.spaced_repetition import reschedule_all
+    from ..services.spaced_repetition import review_card
+    from .quizzes import TEST_USER_ID
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from database import get_db
+    from models import Flashcard
+    from models import FlashcardDeck
+    from models import FlashcardSchedule
+    from models import FlashcardSession
+    from models import FlashcardSessionCard
+    from models import User
+    from schemas import FlashcardDeckCreate
+    from schemas import FlashcardDeckRead
+    from schemas import FlashcardDueListRead
+    from schemas import FlashcardDueRead
+    from schemas import FlashcardRateRequest
+    from schemas import FlashcardRatingEnum
+    from schemas import FlashcardRead
+    from schemas import FlashcardRescheduleRead
+    from schemas import FlashcardSessionRead
+    from schemas import FlashcardStatsRead
+    from services.flashcard_sessions import ReviewQueue
+    from services.flashcard_sessions import forget_review_queue
+    from services.flashcard_sessions import review_queue
+    from services.spaced_repetition import due_heap
+    from services.spaced_repetition import reschedule_all
+    from services.spaced_repetition import review_card
+    from routers.quizzes import TEST_USER_ID
+
+
+router = APIRouter(prefix="/flashcards", tags=["flashcards"])
+
+
+def _get_deck_or_404(db: Session, deck_id: int, *, include_cards: bool = False) -> FlashcardDeck:
+    stmt = select(FlashcardDeck).where(FlashcardDeck.id == deck_id, FlashcardDeck.user_id == TEST_USER_ID)
+    if include_cards:
+        stmt = stmt.options(selectinload(FlashcardDeck.cards))
+    deck = db.scalar(stmt)
+    if deck is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deck not found")
+    return deck
+
+
+def _get_session_or_404(db: Session, session_id: int) -> FlashcardSession:
+    study_session = db.get(FlashcardSession, session_id)
+    if study_session is None or study_session.user_id != TEST_USER_ID:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    return study_session
+
+
+def _test_user(db: Session) -> User:
+    user = db.get(User, TEST_USER_ID)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+def _session_to_schema(db: Session, study_session: FlashcardSession, queue: ReviewQueue) -> FlashcardSessionRead:
+    front = queue.front()
+    card = db.get(Flashcard, front) if front is not None else None
+    return FlashcardSessionRead(
+        id=study_session.id,
+        deck_id=study_session.deck_id,
+        total_cards=study_session.card_count,
+        remaining=len(queue),
+        session_complete=study_session.completed_at is not None,
+        card=FlashcardRead.model_validate(card) if card is not None else None,
+        stats=FlashcardStatsRead(
+            easy=study_session.easy_count,
+            hard=study_session.hard_count,
+            missed=study_session.missed_count,
+        ),
+    )
+
+
+@router.post("/decks", response_model=FlashcardDeckRead, status_code=status.HTTP_201_CREATED)
+def create_deck(payload: FlashcardDeckCreate, db: Session = Depends(get_db)) -> FlashcardDeckRead:
+    deck = FlashcardDeck(user_id=TEST_USER_ID, title=payload.title, subject=payload.subject)
+    now = datetime.utcnow()
+    deck.cards = [
+        Flashcard(
+            position=position,
+            term=card.term,
+            definition=card.definition,
+            # New cards are due straight away.
+            schedule=FlashcardSchedule(user_id=TEST_USER_ID, due_at=now),
+        )
+        for position, card in enumerate(payload.cards)
+    ]
+    db.add(deck)
+    db.commit()
+
+    heap = due_heap(db, _test_user(db))
+    for card in deck.cards:
+        heap.push(card.id, now)
+    return FlashcardDeckRead.model_validate(_get_deck_or_404(db, deck.id, include_cards=True))
+
+
+@router.get("/decks/{deck_id}", response_model=FlashcardDeckRead)
+def get_deck(deck_id: int, db: Session = Depends(get_db)) -> FlashcardDeckRead:
+    return FlashcardDeckRead.model_validate(_get_deck_or_404(db, deck_id, include_cards=True))
+
+
+@router.post("/decks/{deck_id}/sessions", response_model=FlashcardSessionRead, status_code=status.HTTP_201_CREATED)
+def start_session(deck_id: int, db: Session = Depends(get_db)) -> FlashcardSessionRead:
+    deck = _get_deck_or_404(db, deck_id, include_cards=True)
+    study_session = FlashcardSession(
+        deck_id=deck.id,
+        user_id=TEST_USER_ID,
+        card_count=len(deck.cards),
+        next_position=len(deck.cards),
+    )
+    study_session.cards = [
+        FlashcardSessionCard(card_id=card.id, position=position) for position, card in enumerate(deck.cards)
+    ]
+    db.add(study_session)
+    db.commit()
+    return _session_to_schema(db, study_session, review_queue(db, study_session))
+
+
+@router.get("/sessions/{session_id}", response_model=FlashcardSessionRead)
+def get_session(session_id: int, db: Session = Depends(get_db)) -> FlashcardSessionRead:
+    study_session = _get_session_or_404(db, session_id)
+    return _session_to_schema(db, study_session, review_queue(db, study_session))
+
+
+@router.post("/sessions/{session_id}/rate", response_model=FlashcardSessionRead)
+def rate_session_card(
+    session_id: int,
+    payload: FlashcardRateRequest,
+    db: Session = Depends(get_db),
+) -> FlashcardSessionRead:
+    """Rate the front card and reschedule it.
+
+    Within the session, easy retires the card and hard and missed send it to
+    the back of the queue. Every rating is also an SM-2 review that sets when
+    the card is next due.
+    """
+    study_session = _get_session_or_404(db, session_id)
+    queue = review_queue(db, study_session)
+    heap = due_heap(db, _test_user(db))
+
+    with queue.lock:
+        if queue.front() != payload.card_id:
+            # Also catches a double-submitted rating, which would otherwise skip a card.
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Card is not the current card of this session")
+
+        session_card = db.get(FlashcardSessionCard, (study_session.id, payload.card_id))
+        if payload.rating == FlashcardRatingEnum.easy:
+            session_card.position = None
+            study_session.easy_count += 1
+        else:
+            session_card.position = study_session.next_position
+            study_session.next_position += 1
+            if payload.rating == FlashcardRatingEnum.hard:
+                study_session.hard_count += 1
+            else:
+                study_session.missed_count += 1
+        if payload.rating == FlashcardRatingEnum.easy and len(queue) == 1:
+            study_session.completed_at = datetime.utcnow()
+        schedule = db.get(FlashcardSchedule, payload.card_id)
+        review_card(schedule, payload.rating.value, datetime.utcnow())
+        db.commit()
+        heap.push(schedule.card_id, schedule.due_at)
+
+        if payload.rating == FlashcardRatingEnum.easy:
+            queue.retire_front()
+        else:
+            queue.requeue_front()
+        response = _session_to_schema(db, study_session, queue)
+
+    if study_session.completed_at is not None:
+        forget_review_queue(study_session)
+    return response
+
+
+@router.get("/due", response_model=FlashcardDueListRead)
+def list_due_cards(
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db),
+) -> FlashcardDueListRead:
+    """The most overdue cards across all decks, from the in-memory due heap."""
+    due = due_heap(db, _test_user(db)).next_due(limit, datetime.utcnow())
+    card_ids = [card_id for card_id, _ in due]
+    cards = {
+        card.id: card
+        for card in db.scalars(
+            select(Flashcard).where(Flashcard.id.in_(card_ids)).options(selectinload(Flashcard.schedule))
+        )
+    }
+    return FlashcardDueListRead(
+        items=[
+            FlashcardDueRead(
+                card=FlashcardRead.model_validate(cards[card_id]),
+                deck_id=cards[card_id].deck_id,
+                due_at=due_at,
+                interval_days=cards[card_id].schedule.interval_days,
+                ease=cards[card_id].schedule.ease,
+            )
+            for card_id, due_at in due
+            if card_id in cards
+        ]
+    )
+
+
+@router.post("/reschedule", response_model=FlashcardRescheduleRead)
+def reschedule_cards(db: Session = Depends(get_db)) -> FlashcardRescheduleRead:
+    """Bulk recompute of every reviewed card's due time; run nightly or after changing the interval cap."""
+    return FlashcardRescheduleRead(rescheduled=reschedule_all(db, _test_user(db)))
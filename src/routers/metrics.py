@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+try:
+    from ..services.metrics import registry
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from services.metrics import registry
+
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
 from datetime import datetime
+from functools import partial
+import json
 import logging
+import time
 
 from fastapi import APIRouter
 from fastapi import Depends
@@ -11,6 +15,8 @@ from fastapi import HTTPException
 from fastapi import Query
 from fastapi import UploadFile
 from fastapi import status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy import delete
 from sqlalchemy import func
 from sqlalchemy import select
@@ -18,12 +24,15 @@ from sqlalchemy.orm import Session
 from sqlalchemy.orm import selectinload
 
 try:
+    from ..config import settings
+    from ..database import SessionLocal
     from ..database import get_db
     from ..dependencies import get_gemini_service
     from ..models import Question
     from ..models import QuestionType
     from ..models import Quiz
     from ..models import QuizAttempt
+    from ..models import QuizSourceChunk
     from ..models import AttemptStatus
     from ..schemas import AttemptCreate
     from ..schemas import AttemptListRead
@@ -38,24 +47,38 @@ try:
     from ..schemas import QuizDetailRead
     from ..schemas import QuizRead
     from ..schemas import QuizUpdate
+    from ..services.dedupe import QuestionIndex
+    from ..services.dedupe import find_duplicate
+    from ..services.dedupe import forget_question
+    from ..services.dedupe import index_question
+    from ..services.dedupe import option_texts
+    from ..services.dedupe import question_shingles
+    from ..services.dedupe import reset_quiz_index
     from ..services.extract import UnsupportedFileTypeError
+    from ..services.extract import chunk_text
     from ..services.extract import ephemeral_upload
     from ..services.extract import extract_text
     from ..services.extract import validate_upload_file
     from ..services.gemini import GeminiResponseError
     from ..services.gemini import GeminiService
+    from ..services.gemini import GeneratedQuestion
+    from ..services.reference import refresh_reference
     from .utils import attempt_to_summary
     from .utils import build_attempt_session
     from .utils import question_to_schema
     from .utils import quiz_to_schema
+    from .utils import streamed_question_to_schema
     from .utils import update_question_from_payload
 except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
+    from database import SessionLocal
     from database import get_db
     from dependencies import get_gemini_service
     from models import Question
     from models import QuestionType
     from models import Quiz
     from models import QuizAttempt
+    from models import QuizSourceChunk
     from models import AttemptStatus
     from schemas import AttemptCreate
     from schemas import AttemptListRead
@@ -70,16 +93,27 @@ except ImportError:  # pragma: no cover - allows top-level module imports
     from schemas import QuizDetailRead
     from schemas import QuizRead
     from schemas import QuizUpdate
+    from services.dedupe import QuestionIndex
+    from services.dedupe import find_duplicate
+    from services.dedupe import forget_question
+    from services.dedupe import index_question
+    from services.dedupe import option_texts
+    from services.dedupe import question_shingles
+    from services.dedupe import reset_quiz_index
     from services.extract import UnsupportedFileTypeError
+    from services.extract import chunk_text
     from services.extract import ephemeral_upload
     from services.extract import extract_text
     from services.extract import validate_upload_file
     from services.gemini import GeminiResponseError
     from services.gemini import GeminiService
+    from services.gemini import GeneratedQuestion
+    from services.reference import refresh_reference
     from routers.utils import attempt_to_summary
     from routers.utils import build_attempt_session
     from routers.utils import question_to_schema
     from routers.utils import quiz_to_schema
+    from routers.utils import streamed_question_to_schema
     from routers.utils import update_question_from_payload
 
 
@@ -171,6 +205,7 @@ def update_quiz(quiz_id: int, payload: QuizUpdate, db: Session = Depends(get_db)
         quiz.description = updates["description"]
 
     quiz.updated_at = datetime.utcnow()
+    refresh_reference(db, quiz.id)
     db.commit()
     db.refresh(quiz)
     db.refresh(quiz, attribute_names=["questions", "attempts"])
@@ -180,6 +215,7 @@ def update_quiz(quiz_id: int, payload: QuizUpdate, db: Session = Depends(get_db)
 @router.delete("/quizzes/{quiz_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_quiz(quiz_id: int, db: Session = Depends(get_db)) -> None:
     quiz = _get_quiz_or_404(db, quiz_id)
+    reset_quiz_index(quiz)
     db.delete(quiz)
     db.commit()
 
@@ -192,8 +228,16 @@ def list_questions(quiz_id: int, db: Session = Depends(get_db)) -> QuestionListR
 
 
 @router.post("/quizzes/{quiz_id}/questions", response_model=QuestionRead, status_code=status.HTTP_201_CREATED)
-def create_question(quiz_id: int, payload: QuestionCreate, db: Session = Depends(get_db)) -> QuestionRead:
-    _get_quiz_or_404(db, quiz_id)
+def create_question(
+    quiz_id: int,
+    payload: QuestionCreate,
+    allow_duplicate: bool = Query(default=False),
+    db: Session = Depends(get_db),
+) -> QuestionRead:
+    quiz = _get_quiz_or_404(db, quiz_id)
+    if not allow_duplicate:
+        options = [option.text for option in payload.options] if payload.options else None
+        _reject_duplicate(db, quiz, payload.question_text, options)
 
     question = Question(
         quiz_id=quiz_id,
@@ -205,13 +249,20 @@ def create_question(quiz_id: int, payload: QuestionCreate, db: Session = Depends
     )
 
     db.add(question)
+    refresh_reference(db, quiz_id)
     db.commit()
     db.refresh(question)
+    index_question(db, quiz, question)
     return question_to_schema(question)
 
 
 @router.patch("/questions/{question_id}", response_model=QuestionRead)
-def update_question(question_id: int, payload: QuestionUpdate, db: Session = Depends(get_db)) -> QuestionRead:
+def update_question(
+    question_id: int,
+    payload: QuestionUpdate,
+    allow_duplicate: bool = Query(default=False),
+    db: Session = Depends(get_db),
+) -> QuestionRead:
     question = db.get(Question, question_id)
     if question is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
@@ -239,9 +290,13 @@ def update_question(question_id: int, payload: QuestionUpdate, db: Session = Dep
         normalized_updates["explanation"] = updates["explanation"] or {}
 
     update_question_from_payload(question, normalized_updates)
+    if not allow_duplicate and ({"question_text", "options"} & normalized_updates.keys()):
+        _reject_duplicate(db, quiz, question.question_text, option_texts(question.options_json), exclude=question.id)
+    refresh_reference(db, question.quiz_id)
 
     db.commit()
     db.refresh(question)
+    index_question(db, quiz, question)
     return question_to_schema(question)
 
 
@@ -251,21 +306,44 @@ def delete_question(question_id: int, db: Session = Depends(get_db)) -> None:
     if question is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
 
-    _get_quiz_or_404(db, question.quiz_id)
+    quiz = _get_quiz_or_404(db, question.quiz_id)
     db.delete(question)
+    refresh_reference(db, question.quiz_id)
     db.commit()
+    forget_question(db, quiz, question_id)
+
+
+def _reject_duplicate(
+    db: Session, quiz: Quiz, question_text: str, options: list[str] | None, *, exclude: int | None = None
+) -> None:
+    duplicate = find_duplicate(db, quiz, question_text, options, exclude=exclude)
+    if duplicate is not None:
+        duplicate_id, similarity = duplicate
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=(
+                f"Near-duplicate of question {duplicate_id} (similarity {similarity:.2f}); "
+                "pass allow_duplicate=true to keep it"
+            ),
+        )
 
 
-@router.post("/quizzes/{quiz_id}/generate", response_model=GenerateResponse)
-async def generate_questions_for_quiz(
+def _is_near_duplicate(index: QuestionIndex, generated: GeneratedQuestion) -> bool:
+    """Check a generated question against the ones kept so far in this run, and keep it if new."""
+    shingles = question_shingles(generated.question_text, generated.options if generated.type == "mcq" else None)
+    if index.near_duplicates(shingles):
+        return True
+    index.add(len(index), shingles)
+    return False
+
+
+async def _read_generation_source(
+    db: Session,
     quiz_id: int,
-    file: UploadFile = File(...),
-    mcq_count: int = Form(default=5, ge=0, le=50),
-    open_count: int = Form(default=2, ge=0, le=50),
-    difficulty: str = Form(default="intermediate"),
-    db: Session = Depends(get_db),
-    gemini_service: GeminiService = Depends(get_gemini_service),
-) -> GenerateResponse:
+    file: UploadFile,
+    mcq_count: int,
+    open_count: int,
+) -> tuple[Quiz, str, bool]:
     if mcq_count + open_count <= 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one question must be requested")
 
@@ -286,7 +364,15 @@ async def generate_questions_for_quiz(
 
     try:
         async with ephemeral_upload(file, suffix) as temp_path:
-            extracted_text, was_truncated = extract_text(temp_path, suffix)
+            extracted_text, was_truncated = await run_in_threadpool(
+                partial(
+                    extract_text,
+                    temp_path,
+                    suffix,
+                    max_chars=settings.generation_max_source_chars,
+                    max_pages=settings.generation_max_pdf_pages,
+                )
+            )
     except Exception as error:
         logger.exception("event=file_extraction_failed quiz_id=%s filename=%s", quiz_id, file.filename)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to parse uploaded file") from error
@@ -294,43 +380,82 @@ async def generate_questions_for_quiz(
     if not extracted_text:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file produced no extractable text")
 
+    return quiz, extracted_text, was_truncated
+
+
+def _question_from_generated(quiz_id: int, generated: GeneratedQuestion) -> Question:
+    is_mcq = generated.type == "mcq"
+    return Question(
+        quiz_id=quiz_id,
+        type=QuestionType.mcq if is_mcq else QuestionType.open,
+        question_text=generated.question_text,
+        options_json=_build_options(generated.options or []) if is_mcq else None,
+        correct_option=generated.correct_option if is_mcq else None,
+        explanation_json={"text": generated.explanation},
+    )
+
+
+def _replace_source_chunks(db: Session, quiz_id: int, text: str) -> None:
+    """Store the uploaded material as small passages that grading can retrieve from."""
+    db.execute(delete(QuizSourceChunk).where(QuizSourceChunk.quiz_id == quiz_id))
+    for position, passage in enumerate(chunk_text(text, settings.retrieval_passage_chars)):
+        db.add(QuizSourceChunk(quiz_id=quiz_id, position=position, text=passage))
+
+
+@router.post("/quizzes/{quiz_id}/generate", response_model=GenerateResponse)
+async def generate_questions_for_quiz(
+    quiz_id: int,
+    file: UploadFile = File(...),
+    mcq_count: int = Form(default=5, ge=0, le=50),
+    open_count: int = Form(default=2, ge=0, le=50),
+    difficulty: str = Form(default="intermediate"),
+    db: Session = Depends(get_db),
+    gemini_service: GeminiService = Depends(get_gemini_service),
+) -> GenerateResponse:
+    quiz, extracted_text, was_truncated = await _read_generation_source(db, quiz_id, file, mcq_count, open_count)
+    chunks = chunk_text(extracted_text, settings.generation_chunk_chars)
+
     try:
-        generated_questions, llm_latency_ms = gemini_service.generate_questions(
-            source_text=extracted_text,
+        generated_questions, llm_latency_ms = await gemini_service.agenerate_questions_chunked(
+            chunks=chunks,
             title=quiz.title,
             mcq_count=mcq_count,
             open_count=open_count,
             difficulty=difficulty,
+            concurrency=settings.generation_chunk_concurrency,
         )
     except GeminiResponseError as error:
         logger.exception("event=generation_failed quiz_id=%s", quiz_id)
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Failed to generate quiz questions") from error
 
     logger.info(
-        "event=generation_request_complete quiz_id=%s question_count=%s llm_latency_ms=%s truncated=%s",
+        "event=generation_request_complete quiz_id=%s question_count=%s chunk_count=%s llm_latency_ms=%s truncated=%s",
         quiz_id,
         len(generated_questions),
+        len(chunks),
         llm_latency_ms,
         was_truncated,
     )
 
     db.execute(delete(Question).where(Question.quiz_id == quiz_id))
+    _replace_source_chunks(db, quiz_id, extracted_text)
 
+    batch_index = QuestionIndex()
     persisted: list[Question] = []
     for generated in generated_questions:
-        is_mcq = generated.type == "mcq"
-        question = Question(
-            quiz_id=quiz_id,
-            type=QuestionType.mcq if is_mcq else QuestionType.open,
-            question_text=generated.question_text,
-            options_json=_build_options(generated.options or []) if is_mcq else None,
-            correct_option=generated.correct_option if is_mcq else None,
-            explanation_json={"text": generated.explanation},
-        )
+        if _is_near_duplicate(batch_index, generated):
+            continue
+        question = _question_from_generated(quiz_id, generated)
         db.add(question)
         persisted.append(question)
 
+    duplicates = len(generated_questions) - len(persisted)
+    if duplicates:
+        logger.info("event=generation_duplicates_dropped quiz_id=%s count=%s", quiz_id, duplicates)
+
+    refresh_reference(db, quiz_id)
     db.commit()
+    reset_quiz_index(quiz)
 
     # Verify questions are queryable before returning — prevents race
     # conditions where the response arrives at the client before the DB
@@ -351,6 +476,112 @@ async def generate_questions_for_quiz(
         created_count=len(verified),
         questions=[question_to_schema(q) for q in verified],
         llm_latency_ms=llm_latency_ms,
+        duplicates_dropped=duplicates,
+    )
+
+
+def _save_streamed_questions(quiz_id: int, extracted_text: str, questions: list[Question]) -> list[QuestionRead]:
+    """Replace a quiz's questions, source passages and reference in one transaction."""
+    with SessionLocal() as db:
+        db.execute(delete(Question).where(Question.quiz_id == quiz_id))
+        _replace_source_chunks(db, quiz_id, extracted_text)
+        db.add_all(questions)
+        db.flush()
+        refresh_reference(db, quiz_id)
+        db.commit()
+        return [question_to_schema(question) for question in questions]
+
+
+def _sse_event(event: str, data: object) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/quizzes/{quiz_id}/generate/stream", response_class=StreamingResponse)
+async def stream_questions_for_quiz(
+    quiz_id: int,
+    file: UploadFile = File(...),
+    mcq_count: int = Form(default=5, ge=0, le=50),
+    open_count: int = Form(default=2, ge=0, le=50),
+    difficulty: str = Form(default="intermediate"),
+    db: Session = Depends(get_db),
+    gemini_service: GeminiService = Depends(get_gemini_service),
+) -> StreamingResponse:
+    """Server-Sent Events variant of generation: one `question` event per generated question, then `done`.
+
+    Questions are held in memory while they stream and carry their position
+    rather than an id. Once the stream has finished they replace the old set
+    in one short transaction, and `done` lists them with their ids. No
+    transaction is open while Gemini is streaming, and a failure or a dropped
+    connection part way leaves the quiz as it was.
+    """
+    quiz, extracted_text, was_truncated = await _read_generation_source(db, quiz_id, file, mcq_count, open_count)
+    chunks = chunk_text(extracted_text, settings.generation_chunk_chars)
+    title = quiz.title
+
+    async def events() -> AsyncIterator[str]:
+        start = time.perf_counter()
+        generated_questions: list[Question] = []
+        duplicates = 0
+        batch_index = QuestionIndex()
+        try:
+            async for generated in gemini_service.astream_questions_chunked(
+                chunks=chunks,
+                title=title,
+                mcq_count=mcq_count,
+                open_count=open_count,
+                difficulty=difficulty,
+                concurrency=settings.generation_chunk_concurrency,
+            ):
+                if _is_near_duplicate(batch_index, generated):
+                    duplicates += 1
+                    continue
+                if not generated_questions:
+                    logger.info(
+                        "event=generation_first_question quiz_id=%s latency_ms=%s",
+                        quiz_id,
+                        int((time.perf_counter() - start) * 1000),
+                    )
+                question = _question_from_generated(quiz_id, generated)
+                position = len(generated_questions)
+                generated_questions.append(question)
+                yield _sse_event("question", streamed_question_to_schema(question, position).model_dump(mode="json"))
+        except GeminiResponseError:
+            logger.exception(
+                "event=generation_stream_failed quiz_id=%s discarded=%s", quiz_id, len(generated_questions)
+            )
+            yield _sse_event("error", {"detail": "Failed to generate quiz questions", "created_count": 0})
+            return
+        finally:
+            if duplicates:
+                logger.info("event=generation_duplicates_dropped quiz_id=%s count=%s", quiz_id, duplicates)
+
+        saved: list[QuestionRead] = []
+        if generated_questions:
+            saved = await run_in_threadpool(_save_streamed_questions, quiz_id, extracted_text, generated_questions)
+            reset_quiz_index(quiz)
+
+        llm_latency_ms = int((time.perf_counter() - start) * 1000)
+        logger.info(
+            "event=generation_stream_complete quiz_id=%s question_count=%s llm_latency_ms=%s truncated=%s",
+            quiz_id,
+            len(saved),
+            llm_latency_ms,
+            was_truncated,
+        )
+        yield _sse_event(
+            "done",
+            {
+                "created_count": len(saved),
+                "llm_latency_ms": llm_latency_ms,
+                "duplicates_dropped": duplicates,
+                "questions": [question.model_dump(mode="json") for question in saved],
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from youtube_transcript_api import YouTubeTranscriptApi
-from services.gemini import GeminiService, VideoSummaryResponse
-from config import settings
 
-router = APIRouter(prefix="/transcription", tags=["transcription"])
+try:
+    from ..dependencies import get_gemini_service
+    from ..services.gemini import GeminiService
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from dependencies import get_gemini_service
+    from services.gemini import GeminiService
 
-gemini_service = GeminiService()
+router = APIRouter(prefix="/transcription", tags=["transcription"])
 
 class AnalyzeVideoRequest(BaseModel):
     video_url: str
@@ -33,28 +37,31 @@ def extract_video_id(url: str) -> str:
     # fail?
     return url
 
-@router.post("/analyze", response_model=AnalyzeVideoResponse)
-async def analyze_video(req: AnalyzeVideoRequest):
-    video_id = extract_video_id(req.video_url)
-    
+def fetch_transcript(video_id: str) -> str:
+    """Blocking transcript download; callers on the event loop run it in a worker thread."""
     try:
         api = YouTubeTranscriptApi()
         transcript_list = api.get_transcript(video_id)
         # Combine transcript text
-        full_transcript = " ".join([entry['text'] for entry in transcript_list])
+        return " ".join([entry['text'] for entry in transcript_list])
     except AttributeError:
         # Fallback for newer versions of youtube-transcript-api
         try:
             api = YouTubeTranscriptApi()
             transcript_list = api.fetch(video_id)
-            full_transcript = " ".join([entry.text for entry in transcript_list])
+            return " ".join([entry.text for entry in transcript_list])
         except Exception as e:
              raise HTTPException(status_code=400, detail=f"Failed to fetch transcript (v2): {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch transcript: {str(e)}")
 
+@router.post("/analyze", response_model=AnalyzeVideoResponse)
+async def analyze_video(req: AnalyzeVideoRequest, gemini_service: GeminiService = Depends(get_gemini_service)):
+    video_id = extract_video_id(req.video_url)
+    full_transcript = await run_in_threadpool(fetch_transcript, video_id)
+
     try:
-        summary_response = gemini_service.summarize_video(full_transcript)
+        summary_response = await gemini_service.asummarize_video(full_transcript)
         
         # Convert Pydantic models to dict for response
         questions_list = []
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections import Counter
 from typing import Any
 
 try:
@@ -10,8 +11,10 @@ try:
     from ..schemas import AttemptAnswerRead
     from ..schemas import AttemptSessionRead
     from ..schemas import AttemptSummaryRead
+    from ..schemas import GradingProgressRead
     from ..schemas import QuestionRead
     from ..schemas import QuizRead
+    from ..schemas import StreamedQuestionRead
 except ImportError:  # pragma: no cover - allows top-level module imports
     from models import AttemptAnswer
     from models import Quiz
@@ -20,22 +23,30 @@ except ImportError:  # pragma: no cover - allows top-level module imports
     from schemas import AttemptAnswerRead
     from schemas import AttemptSessionRead
     from schemas import AttemptSummaryRead
+    from schemas import GradingProgressRead
     from schemas import QuestionRead
     from schemas import QuizRead
+    from schemas import StreamedQuestionRead
 
 
 def question_to_schema(question: Question) -> QuestionRead:
-    options = question.options_json if question.options_json else None
-    explanation = question.explanation_json if question.explanation_json else None
-    return QuestionRead(
-        id=question.id,
-        quiz_id=question.quiz_id,
-        type=question.type.value,
-        question_text=question.question_text,
-        options=options,
-        correct_option=question.correct_option,
-        explanation=explanation,
-    )
+    return QuestionRead(**_question_fields(question))
+
+
+def streamed_question_to_schema(question: Question, position: int) -> StreamedQuestionRead:
+    return StreamedQuestionRead(position=position, **_question_fields(question))
+
+
+def _question_fields(question: Question) -> dict[str, Any]:
+    return {
+        "id": question.id,
+        "quiz_id": question.quiz_id,
+        "type": question.type.value,
+        "question_text": question.question_text,
+        "options": question.options_json if question.options_json else None,
+        "correct_option": question.correct_option,
+        "explanation": question.explanation_json if question.explanation_json else None,
+    }
 
 
 def _compute_percentage(total_score: float, question_count: int) -> float:
@@ -97,10 +108,12 @@ def build_attempt_session(attempt: QuizAttempt) -> AttemptSessionRead:
             user_answer=answer.user_answer,
             score=answer.score,
             ai_feedback=answer.ai_feedback,
+            grading_status=answer.grading_status.value,
             updated_at=answer.updated_at,
         )
         for answer in sorted(attempt.answers, key=lambda item: item.question_id)
     ]
+    status_counts = Counter(answer.grading_status.value for answer in attempt.answers)
 
     question_count = len(quiz_questions)
     return AttemptSessionRead(
@@ -114,28 +127,16 @@ def build_attempt_session(attempt: QuizAttempt) -> AttemptSessionRead:
         current_question_index=current_question_index,
         questions=[question_to_schema(question) for question in quiz_questions],
         answers=answers,
+        grading_progress=GradingProgressRead(
+            total=len(attempt.answers),
+            graded=status_counts["graded"],
+            pending=status_counts["pending"],
+            deferred=status_counts["deferred"],
+            failed=status_counts["failed"],
+        ),
     )
 
 
-def build_reference_text(quiz: Quiz) -> str:
-    chunks: list[str] = []
-    if quiz.title:
-        chunks.append(f"Quiz title: {quiz.title}")
-    if quiz.subject:
-        chunks.append(f"Subject: {quiz.subject}")
-    if quiz.description:
-        chunks.append(f"Description: {quiz.description}")
-
-    for question in quiz.questions:
-        chunks.append(f"Q: {question.question_text}")
-        explanation = (question.explanation_json or {}).get("text") if isinstance(question.explanation_json, dict) else None
-        if explanation:
-            chunks.append(f"Reference explanation: {explanation}")
-
-    text = "\n".join(chunks)
-    return text[:100_000]
-
-
 def update_question_from_payload(question: Question, payload: dict[str, Any]) -> None:
     if "type" in payload and payload["type"] is not None:
         question.type = payload["type"]
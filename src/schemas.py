@@ -105,6 +105,13 @@ class QuestionRead(BaseModel):
     explanation: dict[str, Any] | None = None
 
 
+class StreamedQuestionRead(QuestionRead):
+    """A generated question as it streams in, before it is saved and has an id."""
+
+    id: int | None = None
+    position: int
+
+
 class QuestionListRead(BaseModel):
     items: list[QuestionRead]
 
@@ -113,6 +120,8 @@ class GenerateResponse(BaseModel):
     created_count: int
     questions: list[QuestionRead]
     llm_latency_ms: int
+    # Near-duplicate questions left out, so callers can tell why fewer than requested came back.
+    duplicates_dropped: int = 0
 
 
 class AttemptCreate(BaseModel):
@@ -138,6 +147,13 @@ class AttemptListRead(BaseModel):
     total: int
 
 
+class GradingStatusEnum(str, Enum):
+    graded = "graded"
+    pending = "pending"
+    deferred = "deferred"
+    failed = "failed"
+
+
 class AttemptAnswerRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -145,9 +161,18 @@ class AttemptAnswerRead(BaseModel):
     user_answer: str
     score: float
     ai_feedback: str | None
+    grading_status: GradingStatusEnum = GradingStatusEnum.graded
     updated_at: datetime
 
 
+class GradingProgressRead(BaseModel):
+    total: int
+    graded: int
+    pending: int
+    deferred: int
+    failed: int
+
+
 class AttemptSessionRead(BaseModel):
     id: int
     quiz_id: int
@@ -159,6 +184,7 @@ class AttemptSessionRead(BaseModel):
     current_question_index: int
     questions: list[QuestionRead]
     answers: list[AttemptAnswerRead]
+    grading_progress: GradingProgressRead
 
 
 class AnswerUpsert(BaseModel):
@@ -169,6 +195,18 @@ class AnswerResult(BaseModel):
     score: float
     ai_feedback: str
     graded_by: str
+    grading_status: GradingStatusEnum = GradingStatusEnum.graded
+
+
+class GradingQueueRead(BaseModel):
+    running: bool
+    workers: int
+    capacity: int
+    depth: int
+    in_flight: int
+    completed: int
+    failed: int
+    cancelled: int
 
 
 class AttemptCompleteRead(BaseModel):
@@ -198,3 +236,77 @@ class AttemptResultRead(BaseModel):
     percentage: float
     completed_at: datetime | None
     questions: list[AttemptResultQuestionRead]
+
+
+class FlashcardRatingEnum(str, Enum):
+    easy = "easy"
+    hard = "hard"
+    missed = "missed"
+
+
+class FlashcardCreate(BaseModel):
+    term: str = Field(min_length=1)
+    definition: str = Field(min_length=1)
+
+
+class FlashcardDeckCreate(BaseModel):
+    title: str = Field(min_length=1, max_length=255)
+    subject: str = Field(default="General", min_length=1, max_length=120)
+    cards: list[FlashcardCreate] = Field(min_length=1)
+
+
+class FlashcardRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    term: str
+    definition: str
+
+
+class FlashcardDeckRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    subject: str
+    created_at: datetime
+    cards: list[FlashcardRead]
+
+
+class FlashcardStatsRead(BaseModel):
+    easy: int
+    hard: int
+    missed: int
+
+
+class FlashcardSessionRead(BaseModel):
+    """A session's progress and the one card to show next, whatever the deck size."""
+
+    id: int
+    deck_id: int
+    total_cards: int
+    remaining: int
+    session_complete: bool
+    card: FlashcardRead | None
+    stats: FlashcardStatsRead
+
+
+class FlashcardRateRequest(BaseModel):
+    card_id: int
+    rating: FlashcardRatingEnum
+
+
+class FlashcardDueRead(BaseModel):
+    card: FlashcardRead
+    deck_id: int
+    due_at: datetime
+    interval_days: int
+    ease: float
+
+
+class FlashcardDueListRead(BaseModel):
+    items: list[FlashcardDueRead]
+
+
+class FlashcardRescheduleRead(BaseModel):
+    rescheduled: int
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from datetime import timedelta
+import hashlib
+import json
+import logging
+import threading
+from typing import Any
+
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+try:
+    from ..database import SessionLocal
+    from ..models import LLMCacheEntry
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from database import SessionLocal
+    from models import LLMCacheEntry
+
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable SHA-256 over JSON-serializable parts, used as a content-addressed cache key."""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.db_hits
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class ResultCache:
+    """Two-tier cache for LLM results: an in-process LRU in front of a SQLite table.
+
+    Entries expire after ``ttl_seconds``; the table keeps at most ``max_entries``
+    rows per namespace, evicting the least recently read. Storage errors are
+    logged and treated as misses so the cache can never fail a request.
+    """
+
+    namespace: str
+    ttl_seconds: int
+    max_entries: int
+    memory_entries: int
+    session_factory: Callable[[], Session] = SessionLocal
+    stats: CacheStats = field(default_factory=CacheStats)
+    _memory: OrderedDict[str, tuple[datetime, Any]] = field(default_factory=OrderedDict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: str) -> Any | None:
+        if not self.enabled:
+            return None
+
+        now = datetime.utcnow()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                expires_at, value = cached
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+        try:
+            value, expires_at = self._read_row(key, now)
+        except SQLAlchemyError:
+            logger.exception("event=cache_read_failed namespace=%s", self.namespace)
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self.stats.db_hits += 1
+            self._remember(key, expires_at, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.stats.writes += 1
+
+        try:
+            evicted = self._write_row(key, value, now, expires_at)
+        except SQLAlchemyError:
+            logger.exception("event=cache_write_failed namespace=%s", self.namespace)
+            return
+
+        if evicted:
+            with self._lock:
+                self.stats.evictions += evicted
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def _remember(self, key: str, expires_at: datetime, value: Any) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_row(self, key: str, now: datetime) -> tuple[Any | None, datetime]:
+        with self.session_factory() as db:
+            entry = db.scalar(
+                select(LLMCacheEntry).where(
+                    LLMCacheEntry.namespace == self.namespace,
+                    LLMCacheEntry.cache_key == key,
+                )
+            )
+            if entry is None:
+                return None, now
+
+            if entry.expires_at <= now:
+                db.delete(entry)
+                db.commit()
+                return None, now
+
+            entry.last_accessed_at = now
+            entry.hit_count += 1
+            value, expires_at = entry.value_json, entry.expires_at
+            db.commit()
+            return value, expires_at
+
+    def _write_row(self, key: str, value: Any, now: datetime, expires_at: datetime) -> int:
+        with self.session_factory() as db:
+            entry = db.scalar(
+                select(LLMCacheEntry).where(
+                    LLMCacheEntry.namespace == self.namespace,
+                    LLMCacheEntry.cache_key == key,
+                )
+            )
+            if entry is None:
+                entry = LLMCacheEntry(namespace=self.namespace, cache_key=key)
+                db.add(entry)
+            entry.value_json = value
+            entry.created_at = now
+            entry.expires_at = expires_at
+            entry.last_accessed_at = now
+            db.flush()
+
+            evicted = self._evict(db, now)
+            db.commit()
+            return evicted
+
+    def _evict(self, db: Session, now: datetime) -> int:
+        expired = db.execute(
+            delete(LLMCacheEntry)
+            .where(LLMCacheEntry.namespace == self.namespace, LLMCacheEntry.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
+
+        count = db.scalar(
+            select(func.count()).select_from(LLMCacheEntry).where(LLMCacheEntry.namespace == self.namespace)
+        ) or 0
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return expired
+
+        stale_ids = select(LLMCacheEntry.id).where(
+            LLMCacheEntry.namespace == self.namespace
+        ).order_by(LLMCacheEntry.last_accessed_at.asc()).limit(overflow)
+        trimmed = db.execute(
+            delete(LLMCacheEntry)
+            .where(LLMCacheEntry.id.in_(stale_ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
+        return expired + trimmed
@@ -0,0 +1,182 @@
+"""Near-duplicate detection for quiz questions with MinHash and LSH banding.
+
+A question is a set of shingles: the content words of its text, their
+bigrams, and one feature for its option set. MinHash signatures are split
+into bands; two questions become candidates when any band matches, and only
+candidates are compared by exact Jaccard similarity, so a lookup touches a
+handful of questions however large the bank grows.
+
+Each quiz gets an index, built from the database on first use and kept up to
+date by the routes that insert, edit and delete questions. Indexes are keyed
+by quiz id and creation time, so a quiz that reuses a deleted quiz's id never
+sees the old questions.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections import defaultdict
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+import threading
+import zlib
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+try:
+    from ..config import settings
+    from ..models import Question
+    from ..models import Quiz
+    from .retrieval import tokenize
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
+    from models import Question
+    from models import Quiz
+    from services.retrieval import tokenize
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_INDEX_CACHE_SIZE = 128
+
+_indexes: OrderedDict[tuple[int, datetime], "QuestionIndex"] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def question_shingles(question_text: str, options: list[str] | None = None) -> frozenset[str]:
+    words = tokenize(question_text)
+    shingles = set(words)
+    shingles.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    if options:
+        # One feature for the whole option set: shared answer choices alone must not make questions duplicates.
+        shingles.add("options:" + "|".join(sorted(" ".join(tokenize(option)) for option in options)))
+    return frozenset(shingles)
+
+
+def option_texts(options_json: list[dict[str, str]] | None) -> list[str]:
+    return [str(option.get("text", "")) for option in options_json or []]
+
+
+@dataclass
+class QuestionIndex:
+    """MinHash/LSH index answering "which stored questions are at least ``threshold`` similar"."""
+
+    threshold: float = settings.question_duplicate_threshold
+    num_perm: int = 64
+    bands: int = 16
+    _shingles: dict[int, frozenset[str]] = field(default_factory=dict, init=False, repr=False)
+    _buckets: defaultdict[tuple[int, bytes], set[int]] = field(
+        default_factory=lambda: defaultdict(set), init=False, repr=False
+    )
+    _keys: dict[int, list[tuple[int, bytes]]] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _a: np.ndarray = field(init=False, repr=False)
+    _b: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.num_perm % self.bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        # Fixed seed: signatures must agree across indexes and restarts.
+        generator = np.random.default_rng(20240601)
+        self._a = generator.integers(1, 1 << 32, size=self.num_perm, dtype=np.uint64)
+        self._b = generator.integers(0, 1 << 32, size=self.num_perm, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def add(self, question_id: int, shingles: frozenset[str]) -> None:
+        band_keys = self._band_keys(shingles)
+        with self._lock:
+            self._remove(question_id)
+            self._shingles[question_id] = shingles
+            self._keys[question_id] = band_keys
+            for key in band_keys:
+                self._buckets[key].add(question_id)
+
+    def remove(self, question_id: int) -> None:
+        with self._lock:
+            self._remove(question_id)
+
+    def near_duplicates(self, shingles: frozenset[str], *, exclude: int | None = None) -> list[tuple[int, float]]:
+        """Stored questions at or above the threshold, most similar first."""
+        band_keys = self._band_keys(shingles)
+        with self._lock:
+            candidates = set().union(*(self._buckets.get(key, ()) for key in band_keys)) if band_keys else set()
+            candidates.discard(exclude)
+            scored = [(candidate, _jaccard(shingles, self._shingles[candidate])) for candidate in candidates]
+        matches = [(candidate, similarity) for candidate, similarity in scored if similarity >= self.threshold]
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def _remove(self, question_id: int) -> None:
+        self._shingles.pop(question_id, None)
+        for key in self._keys.pop(question_id, []):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(question_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _band_keys(self, shingles: frozenset[str]) -> list[tuple[int, bytes]]:
+        if not shingles:
+            return []
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64)
+        signature = ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+        rows = self.num_perm // self.bands
+        return [(band, signature[band * rows : (band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+
+def _jaccard(left: frozenset[str], right: frozenset[str]) -> float:
+    union = len(left | right)
+    return len(left & right) / union if union else 0.0
+
+
+def quiz_question_index(db: Session, quiz: Quiz) -> QuestionIndex:
+    key = (quiz.id, quiz.created_at)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = QuestionIndex()
+    rows = db.execute(
+        select(Question.id, Question.question_text, Question.options_json).where(Question.quiz_id == quiz.id)
+    ).all()
+    for question_id, question_text, options_json in rows:
+        index.add(question_id, question_shingles(question_text, option_texts(options_json)))
+
+    with _indexes_lock:
+        index = _indexes.setdefault(key, index)
+        while len(_indexes) > _INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def find_duplicate(
+    db: Session,
+    quiz: Quiz,
+    question_text: str,
+    options: list[str] | None,
+    *,
+    exclude: int | None = None,
+) -> tuple[int, float] | None:
+    matches = quiz_question_index(db, quiz).near_duplicates(question_shingles(question_text, options), exclude=exclude)
+    return matches[0] if matches else None
+
+
+def index_question(db: Session, quiz: Quiz, question: Question) -> None:
+    """Record a committed insert or edit."""
+    shingles = question_shingles(question.question_text, option_texts(question.options_json))
+    quiz_question_index(db, quiz).add(question.id, shingles)
+
+
+def forget_question(db: Session, quiz: Quiz, question_id: int) -> None:
+    quiz_question_index(db, quiz).remove(question_id)
+
+
+def reset_quiz_index(quiz: Quiz) -> None:
+    """Drop a quiz's index after its question set was replaced wholesale; the next lookup rebuilds it."""
+    with _indexes_lock:
+        _indexes.pop((quiz.id, quiz.created_at), None)
@@ -2,18 +2,33 @@ from __future__ import annotations
 
 from contextlib import asynccontextmanager
 from pathlib import Path
+import re
 import tempfile
+import time
 
 import markdown
 from bs4 import BeautifulSoup
 from fastapi import UploadFile
 
+try:
+    from .metrics import EXTRACTION_SECONDS
+    from .metrics import page_band
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from services.metrics import EXTRACTION_SECONDS
+    from services.metrics import page_band
+
 
 ALLOWED_EXTENSIONS = {".txt", ".pdf", ".md"}
 MAX_PDF_PAGES = 50
 MAX_EXTRACT_CHARS = 100_000
 
 
+_HEADING_PATTERN = re.compile(
+    r"^\s*(#{1,6}\s+\S|(chapter|section|part|lecture|unit|module|topic)\b\s*\S|\d+(\.\d+)*[.)]?\s+[A-Z])",
+    re.IGNORECASE,
+)
+
+
 class UnsupportedFileTypeError(ValueError):
     pass
 
@@ -48,22 +63,98 @@ async def ephemeral_upload(upload: UploadFile, suffix: str):
         await upload.seek(0)
 
 
-def extract_text(path: Path, suffix: str) -> tuple[str, bool]:
+def extract_text(
+    path: Path,
+    suffix: str,
+    *,
+    max_chars: int = MAX_EXTRACT_CHARS,
+    max_pages: int = MAX_PDF_PAGES,
+) -> tuple[str, bool]:
+    start = time.perf_counter()
+    pages: int | None = None
     if suffix == ".txt":
         text = _extract_txt(path)
     elif suffix == ".md":
         text = _extract_markdown(path)
     elif suffix == ".pdf":
-        text = _extract_pdf(path)
+        text, pages = _extract_pdf(path, max_pages)
     else:
         raise UnsupportedFileTypeError("Unsupported file type")
+    EXTRACTION_SECONDS.observe(time.perf_counter() - start, file_type=suffix.lstrip("."), pages=page_band(pages))
 
-    was_truncated = len(text) > MAX_EXTRACT_CHARS
+    was_truncated = len(text) > max_chars
     if was_truncated:
-        text = text[:MAX_EXTRACT_CHARS]
+        text = text[:max_chars]
     return text.strip(), was_truncated
 
 
+def chunk_text(text: str, target_chars: int) -> list[str]:
+    """Split text into chunks of at most ``target_chars``, preferring section and paragraph breaks.
+
+    A heading starts a new chunk once the current one is at least half full, so
+    chunks tend to line up with the document's own sections.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    if len(text) <= target_chars:
+        return [text]
+
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for block in _split_blocks(text):
+        for piece in _split_oversized(block, target_chars):
+            starts_section = bool(_HEADING_PATTERN.match(piece))
+            if current and (size + len(piece) > target_chars or (starts_section and size >= target_chars // 2)):
+                chunks.append("\n\n".join(current))
+                current = []
+                size = 0
+            current.append(piece)
+            size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _split_blocks(text: str) -> list[str]:
+    blocks: list[str] = []
+    lines: list[str] = []
+    for line in text.splitlines():
+        if not line.strip() or (lines and _HEADING_PATTERN.match(line)):
+            if lines:
+                blocks.append("\n".join(lines))
+                lines = []
+            if not line.strip():
+                continue
+        lines.append(line.rstrip())
+    if lines:
+        blocks.append("\n".join(lines))
+    return blocks
+
+
+def _split_oversized(block: str, target_chars: int) -> list[str]:
+    if len(block) <= target_chars:
+        return [block]
+
+    pieces: list[str] = []
+    current = ""
+    for line in block.split("\n"):
+        while len(line) > target_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:target_chars])
+            line = line[target_chars:]
+        if current and len(current) + len(line) + 1 > target_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
 def _extract_txt(path: Path) -> str:
     raw = path.read_bytes()
     try:
@@ -78,29 +169,30 @@ def _extract_markdown(path: Path) -> str:
     return BeautifulSoup(html, "html.parser").get_text(separator="\n")
 
 
-def _extract_pdf(path: Path) -> str:
-    text = _extract_pdf_pymupdf(path)
+def _extract_pdf(path: Path, max_pages: int = MAX_PDF_PAGES) -> tuple[str, int]:
+    """Return the text of up to ``max_pages`` pages and how many pages were read."""
+    text, pages = _extract_pdf_pymupdf(path, max_pages)
     if text.strip():
-        return text
-    return _extract_pdf_pdfplumber(path)
+        return text, pages
+    return _extract_pdf_pdfplumber(path, max_pages)
 
 
-def _extract_pdf_pymupdf(path: Path) -> str:
+def _extract_pdf_pymupdf(path: Path, max_pages: int) -> tuple[str, int]:
     import fitz
 
     blocks: list[str] = []
     with fitz.open(path) as doc:
-        pages = min(len(doc), MAX_PDF_PAGES)
+        pages = min(len(doc), max_pages)
         for index in range(pages):
             blocks.append(doc[index].get_text("text"))
-    return "\n".join(blocks)
+    return "\n".join(blocks), len(blocks)
 
 
-def _extract_pdf_pdfplumber(path: Path) -> str:
+def _extract_pdf_pdfplumber(path: Path, max_pages: int) -> tuple[str, int]:
     import pdfplumber
 
     blocks: list[str] = []
     with pdfplumber.open(path) as pdf:
-        for page in pdf.pages[:MAX_PDF_PAGES]:
+        for page in pdf.pages[:max_pages]:
             blocks.append(page.extract_text() or "")
-    return "\n".join(blocks)
+    return "\n".join(blocks), len(blocks)
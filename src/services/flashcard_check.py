@@ -0,0 +1,173 @@
+"""Local triage of written flashcard answers before asking Claude.
+
+Each answer is compared with its card's definition in two ways: normalized
+edit distance, which catches near-verbatim answers with typos, and F1 overlap
+of content words, which catches reordered or paraphrased ones. Both are
+computed for the whole batch at once in NumPy. The Levenshtein table is
+filled one row at a time for every pair together. Answers where either
+measure reaches ``accept_score`` are marked correct. Only empty answers and
+ones without a single content word are marked incorrect locally: a correct
+paraphrase can share no words with the definition ("the powerhouse of the
+cell" for "organelle that produces ATP"), so low overlap is not evidence of a
+wrong answer. ``reject_score`` can opt into rejecting on word overlap; it is
+disabled by default. Everything else goes to Claude, all in one prompt.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import re
+
+import numpy as np
+
+try:
+    from ..config import settings
+    from .json_repair import salvage_items
+    from .retrieval import tokenize
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
+    from services.json_repair import salvage_items
+    from services.retrieval import tokenize
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@dataclass(frozen=True)
+class FlashcardAnswer:
+    term: str
+    definition: str
+    user_answer: str
+
+
+@dataclass(frozen=True)
+class FlashcardVerdict:
+    correct: bool
+    feedback: str
+    checked_by: str
+
+
+def normalize(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def edit_similarity(left: list[str], right: list[str]) -> np.ndarray:
+    """``1 - levenshtein / longer length`` for each pair, computed for all pairs together."""
+    count = len(left)
+    if not count:
+        return np.zeros(0)
+    left_codes, left_lengths = _char_codes(left, pad=-1)
+    right_codes, right_lengths = _char_codes(right, pad=-2)
+    columns = np.arange(right_codes.shape[1] + 1)
+
+    previous = np.tile(columns, (count, 1))
+    for row in range(1, left_codes.shape[1] + 1):
+        cost = (left_codes[:, row - 1 : row] != right_codes).astype(np.int64)
+        current = np.empty_like(previous)
+        current[:, 0] = row
+        current[:, 1:] = np.minimum(previous[:, 1:] + 1, previous[:, :-1] + cost)
+        # Insertions chain left to right: current[j] = min over k <= j of current[k] + (j - k).
+        current = np.minimum.accumulate(current - columns, axis=1) + columns
+        finished = row > left_lengths
+        current[finished] = previous[finished]
+        previous = current
+
+    distances = previous[np.arange(count), right_lengths]
+    longest = np.maximum(np.maximum(left_lengths, right_lengths), 1)
+    return 1.0 - distances / longest
+
+
+def token_f1(definitions: list[str], answers: list[str]) -> np.ndarray:
+    """F1 of content-word overlap between each definition and its answer."""
+    definition_tokens = [{_stem(token) for token in tokenize(text)} for text in definitions]
+    answer_tokens = [{_stem(token) for token in tokenize(text)} for text in answers]
+    vocabulary = {token: index for index, token in enumerate(set().union(*definition_tokens, *answer_tokens))}
+    if not vocabulary:
+        return np.zeros(len(answers))
+
+    expected = np.zeros((len(answers), len(vocabulary)), dtype=bool)
+    given = np.zeros_like(expected)
+    for row, (wanted, written) in enumerate(zip(definition_tokens, answer_tokens)):
+        expected[row, [vocabulary[token] for token in wanted]] = True
+        given[row, [vocabulary[token] for token in written]] = True
+
+    shared = (expected & given).sum(axis=1)
+    total = expected.sum(axis=1) + given.sum(axis=1)
+    return np.where(total > 0, 2 * shared / np.maximum(total, 1), 0.0)
+
+
+def _stem(token: str) -> str:
+    # Plural folding only: enough for "cells" to meet "cell" without a stemmer dependency.
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def _char_codes(texts: list[str], *, pad: int) -> tuple[np.ndarray, np.ndarray]:
+    """Code points of each text in a padded matrix; the two sides use different pads so padding never matches."""
+    lengths = np.array([len(text) for text in texts], dtype=np.int64)
+    codes = np.full((len(texts), max(int(lengths.max(initial=0)), 1)), pad, dtype=np.int64)
+    for row, text in enumerate(texts):
+        codes[row, : len(text)] = [ord(char) for char in text]
+    return codes, lengths
+
+
+@dataclass
+class FlashcardChecker:
+    """Marks clear-cut answers locally and leaves the rest for Claude."""
+
+    accept_score: float = settings.flashcard_check_accept_score
+    reject_score: float = settings.flashcard_check_reject_score
+    max_chars: int = 400
+
+    def similarities(self, items: list[FlashcardAnswer]) -> tuple[np.ndarray, np.ndarray]:
+        """Edit similarity and word-overlap F1 of each answer against its definition."""
+        definitions = [normalize(item.definition)[: self.max_chars] for item in items]
+        answers = [normalize(item.user_answer)[: self.max_chars] for item in items]
+        return edit_similarity(definitions, answers), token_f1(definitions, answers)
+
+    def triage(self, items: list[FlashcardAnswer]) -> list[FlashcardVerdict | None]:
+        """A verdict per answer that can be decided locally, ``None`` for the ones Claude should judge."""
+        verdicts: list[FlashcardVerdict | None] = []
+        edits, overlaps = self.similarities(items)
+        for item, edit, overlap in zip(items, edits, overlaps):
+            if not normalize(item.user_answer):
+                verdicts.append(
+                    FlashcardVerdict(False, f"No answer given. The definition is: {item.definition}", "local")
+                )
+            elif max(edit, overlap) >= self.accept_score:
+                verdicts.append(FlashcardVerdict(True, "Correct! Your answer matches the definition.", "local"))
+            elif not tokenize(item.user_answer) or overlap <= self.reject_score:
+                verdicts.append(
+                    FlashcardVerdict(False, f"Not quite. The definition is: {item.definition}", "local")
+                )
+            else:
+                verdicts.append(None)
+        return verdicts
+
+
+def batch_check_prompt(items: list[FlashcardAnswer]) -> str:
+    cards = "\n\n".join(
+        f"Card {number}\nTerm: {item.term}\nActual Definition: {item.definition}\nStudent's Answer: {item.user_answer}"
+        for number, item in enumerate(items, start=1)
+    )
+    return f"""
+    You are an expert tutor. A student is studying flashcards.
+    Evaluate the student's answer on each numbered card below. Be encouraging. Keep each feedback brief (1-3 sentences).
+    Return ONLY a JSON array with one object per card, in card order, each with three keys:
+    - "card": integer (the card number)
+    - "correct": boolean (true if the student's answer captures the core meaning)
+    - "feedback": string (your brief feedback)
+    Do not include any markdown formatting.
+
+{cards}
+    """
+
+
+def parse_batch_check(response_text: str, count: int) -> dict[int, FlashcardVerdict]:
+    """Verdicts by zero-based position; cards missing from the reply are left out."""
+    verdicts: dict[int, FlashcardVerdict] = {}
+    for position, entry in enumerate(salvage_items(response_text)):
+        number = entry.get("card", position + 1)
+        if not isinstance(number, int) or not 1 <= number <= count or not isinstance(entry.get("correct"), bool):
+            continue
+        verdicts[number - 1] = FlashcardVerdict(entry["correct"], str(entry.get("feedback", "")), "llm")
+    return verdicts
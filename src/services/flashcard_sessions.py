@@ -0,0 +1,86 @@
+"""In-memory review queues for flashcard study sessions.
+
+The database is the source of truth: every card of a session stores its place
+in the queue, or ``None`` once mastered, and a rating rewrites that one row.
+Each active session also has a deque of card ids in review order. Rating the
+front card is then a ``popleft`` plus an optional ``append``, so a flip costs the
+same for a 10-card deck as for a 1000-card one. A queue evicted from memory, or
+lost in a restart, is rebuilt from the database on next use. Queues are keyed
+by session id and start time, so a reused id never sees an old queue.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+try:
+    from ..models import FlashcardSession
+    from ..models import FlashcardSessionCard
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from models import FlashcardSession
+    from models import FlashcardSessionCard
+
+
+_QUEUE_CACHE_SIZE = 1024
+
+_queues: OrderedDict[tuple[int, datetime], "ReviewQueue"] = OrderedDict()
+_queues_lock = threading.Lock()
+
+
+@dataclass
+class ReviewQueue:
+    """Card ids still in rotation, front card first.
+
+    Hold ``lock`` across a rating's database write and the matching deque
+    update so concurrent ratings of one session cannot interleave.
+    """
+
+    card_ids: deque[int]
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+    def front(self) -> int | None:
+        return self.card_ids[0] if self.card_ids else None
+
+    def retire_front(self) -> None:
+        self.card_ids.popleft()
+
+    def requeue_front(self) -> None:
+        self.card_ids.rotate(-1)
+
+
+def review_queue(db: Session, study_session: FlashcardSession) -> ReviewQueue:
+    key = (study_session.id, study_session.started_at)
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is not None:
+            _queues.move_to_end(key)
+            return queue
+
+    card_ids = db.scalars(
+        select(FlashcardSessionCard.card_id)
+        .where(FlashcardSessionCard.session_id == study_session.id, FlashcardSessionCard.position.is_not(None))
+        .order_by(FlashcardSessionCard.position)
+    ).all()
+    queue = ReviewQueue(deque(card_ids))
+
+    with _queues_lock:
+        queue = _queues.setdefault(key, queue)
+        while len(_queues) > _QUEUE_CACHE_SIZE:
+            _queues.popitem(last=False)
+    return queue
+
+
+def forget_review_queue(study_session: FlashcardSession) -> None:
+    with _queues_lock:
+        _queues.pop((study_session.id, study_session.started_at), None)
@@ -1,27 +1,70 @@
 from __future__ import annotations
 
+import asyncio
 from collections import Counter
 from dataclasses import dataclass
+from dataclasses import field
 import json
+import logging
 import random
 import re
+import threading
 import time
 from typing import Any
+from typing import AsyncIterator
 
+from anyio import to_thread
 from pydantic import BaseModel
 from pydantic import Field
 from pydantic import ValidationError
 
 try:
     from ..config import settings
+    from .cache import ResultCache
+    from .cache import fingerprint
+    from .json_repair import loads_tolerant
+    from .json_repair import salvage_items
+    from .json_stream import JsonArrayStreamParser
+    from .llm import ProviderLimiter
+    from .metrics import instrument_llm
+    from .offline_grading import OfflineGrader
+    from .resilience import CircuitBreaker
+    from .resilience import CircuitOpenError
+    from .resilience import ResilientCaller
+    from .retrieval import estimate_tokens
+    from .singleflight import SingleFlight
 except ImportError:  # pragma: no cover - allows top-level module imports
     from config import settings
+    from services.cache import ResultCache
+    from services.cache import fingerprint
+    from services.json_repair import loads_tolerant
+    from services.json_repair import salvage_items
+    from services.json_stream import JsonArrayStreamParser
+    from services.llm import ProviderLimiter
+    from services.metrics import instrument_llm
+    from services.offline_grading import OfflineGrader
+    from services.resilience import CircuitBreaker
+    from services.resilience import CircuitOpenError
+    from services.resilience import ResilientCaller
+    from services.retrieval import estimate_tokens
+    from services.singleflight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the generation prompt or post-processing changes so cached
+# question sets produced by the old prompt are no longer served.
+GENERATION_PROMPT_VERSION = "1"
 
 
 class GeminiResponseError(RuntimeError):
     pass
 
 
+class GeminiTransientError(GeminiResponseError):
+    """A failure worth retrying: timeouts, dropped connections, 408/429/5xx."""
+
+
 class GeneratedQuestion(BaseModel):
     type: str = Field(pattern="^(mcq|open)$")
     question_text: str = Field(min_length=1)
@@ -39,23 +82,90 @@ class GradeEnvelope(BaseModel):
     feedback: str
 
 
+class QuestionGrade(GradeEnvelope):
+    question_id: int
+
+
+class BatchGradeEnvelope(BaseModel):
+    grades: list[QuestionGrade]
+
+
+@dataclass(frozen=True)
+class OpenAnswer:
+    question_id: int
+    question_text: str
+    user_answer: str
+    # The question's stored explanation; only the local grading tier reads it.
+    explanation: str = ""
+
+
 class VideoSummaryResponse(BaseModel):
     summary: str
     key_points: list[str]
     questions: list[GeneratedQuestion]
 
 
-def _strip_markdown_fences(text: str) -> str:
-    content = text.strip()
-    fence_match = re.search(r"```(?:json)?\s*(.*?)```", content, re.IGNORECASE | re.DOTALL)
-    if fence_match:
-        return fence_match.group(1).strip()
-    return content
+def _allocate_counts(total: int, weights: list[int]) -> list[int]:
+    """Split ``total`` across ``weights`` proportionally, using largest remainders so the sum is exact."""
+    weight_sum = sum(weights)
+    if total <= 0 or weight_sum <= 0:
+        return [0] * len(weights)
+
+    exact = [total * weight / weight_sum for weight in weights]
+    counts = [int(value) for value in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda index: exact[index] - counts[index], reverse=True)
+    for index in by_remainder[: total - sum(counts)]:
+        counts[index] += 1
+    return counts
+
+
+def _merge_chunks(chunks: list[str], groups: int) -> list[str]:
+    """Join adjacent chunks into at most ``groups`` runs of similar length, keeping every chunk."""
+    if len(chunks) <= groups:
+        return chunks
+    total_chars = max(1, sum(len(chunk) for chunk in chunks))
+    runs: list[list[str]] = [[] for _ in range(groups)]
+    offset = 0
+    for chunk in chunks:
+        # Each chunk joins the run its midpoint falls in.
+        runs[min(groups - 1, int((offset + len(chunk) / 2) * groups / total_chars))].append(chunk)
+        offset += len(chunk)
+    return ["\n\n".join(run) for run in runs if run]
 
 
-def _safe_json_loads(raw_text: str) -> Any:
-    cleaned = _strip_markdown_fences(raw_text)
-    return json.loads(cleaned)
+def _question_fingerprint(question: GeneratedQuestion) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", question.question_text.lower()))
+
+
+_TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Gemini calls set no output cap; budget this much output per request for the tokens-per-minute limit.
+_OUTPUT_TOKEN_ESTIMATE = 1024
+
+
+def _is_transient(error: BaseException) -> bool:
+    if isinstance(error, TimeoutError):
+        return True
+    if getattr(error, "code", None) in _TRANSIENT_STATUS_CODES:
+        return True
+    try:
+        import httpx
+    except ImportError:  # pragma: no cover - httpx ships with google-genai
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+def _build_resilience() -> ResilientCaller:
+    return ResilientCaller(
+        max_attempts=settings.gemini_retry_attempts,
+        base_delay_seconds=settings.gemini_retry_base_delay_seconds,
+        max_delay_seconds=settings.gemini_retry_max_delay_seconds,
+        hedge=settings.gemini_hedge_requests,
+        is_retryable=lambda error: isinstance(error, GeminiTransientError),
+        breaker=CircuitBreaker(
+            failure_threshold=settings.gemini_circuit_failure_threshold,
+            reset_timeout_seconds=settings.gemini_circuit_reset_seconds,
+        ),
+    )
 
 
 def _extract_response_text(response: Any) -> str:
@@ -81,7 +191,22 @@ def _extract_response_text(response: Any) -> str:
 class GeminiService:
     api_key: str = settings.gemini_api_key
     model_name: str = settings.gemini_model
+    base_url: str = settings.gemini_base_url
+    max_connections: int = settings.gemini_max_connections
+    max_keepalive_connections: int = settings.gemini_max_keepalive_connections
+    keepalive_expiry_seconds: float = settings.gemini_keepalive_expiry_seconds
+    timeout_seconds: float = settings.gemini_timeout_seconds
+    generation_cache: ResultCache | None = None
+    single_flight: SingleFlight = field(default_factory=SingleFlight)
+    resilience: ResilientCaller = field(default_factory=_build_resilience)
+    limiter: ProviderLimiter = field(default_factory=lambda: ProviderLimiter("gemini"))
+    offline_grader: OfflineGrader = field(default_factory=OfflineGrader)
+    _client: Any = field(default=None, init=False, repr=False)
+    _http_client: Any = field(default=None, init=False, repr=False)
+    _async_http_client: Any = field(default=None, init=False, repr=False)
+    _client_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
 
+    @instrument_llm("gemini")
     def generate_questions(
         self,
         *,
@@ -93,49 +218,294 @@ class GeminiService:
     ) -> tuple[list[GeneratedQuestion], int]:
         start = time.perf_counter()
 
-        if not self.api_key:
+        cache_key = self._generation_cache_key(
+            source_text=source_text,
+            mcq_count=mcq_count,
+            open_count=open_count,
+            difficulty=difficulty,
+        )
+        cached = self._cached_generation(cache_key)
+        if cached is not None:
+            latency = int((time.perf_counter() - start) * 1000)
+            return cached, latency
+
+        # Checked after the cache: earlier model output beats the keyword fallback when Gemini is unavailable.
+        if self._offline():
             questions = self._fallback_generate(source_text, mcq_count, open_count)
             latency = int((time.perf_counter() - start) * 1000)
             return questions, latency
 
-        schema = GenerationEnvelope
+        prompt = self._generation_prompt(
+            source_text=source_text,
+            title=title,
+            mcq_count=mcq_count,
+            open_count=open_count,
+            difficulty=difficulty,
+        )
+        raw_text = self._call_gemini(prompt=prompt, schema=GenerationEnvelope)
+        try:
+            questions = self._parse_generation(raw_text)
+        except (ValidationError, json.JSONDecodeError):
+            questions = self._salvage_generation(raw_text)
+            if len(questions) < mcq_count + open_count:
+                retry_raw = self._call_gemini(prompt=self._repair_prompt(raw_text), schema=GenerationEnvelope)
+                questions = self._best_repair(questions, retry_raw)
 
-        prompt = (
-            "You are generating quiz questions for students. "
-            "Return JSON only. No markdown. "
-            f"Create {mcq_count} MCQ questions and {open_count} open-ended questions. "
-            f"Difficulty: {difficulty}. Quiz title: {title}.\n"
-            "For MCQ: include options as an array of 4 strings and correct_option as A, B, C, or D. "
-            "For open questions: options and correct_option must be null.\n"
-            "Use this bounded source text only:\n"
-            "<SOURCE>\n"
-            f"{source_text}\n"
-            "</SOURCE>"
+        self._store_generation(cache_key, questions)
+        latency = int((time.perf_counter() - start) * 1000)
+        return questions, latency
+
+    @instrument_llm("gemini")
+    async def agenerate_questions(
+        self,
+        *,
+        source_text: str,
+        title: str,
+        mcq_count: int,
+        open_count: int,
+        difficulty: str,
+    ) -> tuple[list[GeneratedQuestion], int]:
+        start = time.perf_counter()
+
+        cache_key = self._generation_cache_key(
+            source_text=source_text,
+            mcq_count=mcq_count,
+            open_count=open_count,
+            difficulty=difficulty,
         )
+        cached = await to_thread.run_sync(self._cached_generation, cache_key)
+        if cached is not None:
+            latency = int((time.perf_counter() - start) * 1000)
+            return cached, latency
+
+        if self._offline():
+            questions = self._fallback_generate(source_text, mcq_count, open_count)
+            latency = int((time.perf_counter() - start) * 1000)
+            return questions, latency
 
-        raw_text = self._call_gemini(prompt=prompt, schema=schema)
+        prompt = self._generation_prompt(
+            source_text=source_text,
+            title=title,
+            mcq_count=mcq_count,
+            open_count=open_count,
+            difficulty=difficulty,
+        )
+        raw_text = await self._acall_gemini(prompt=prompt, schema=GenerationEnvelope)
         try:
-            envelope = GenerationEnvelope.model_validate(_safe_json_loads(raw_text))
-            questions = self._post_process_generated_questions(envelope.questions)
-        except (ValidationError, json.JSONDecodeError) as first_error:
-            repair_prompt = (
-                "Your previous output was invalid JSON for the required schema. "
-                "Return corrected JSON only for the same schema.\n"
-                f"Invalid output:\n{raw_text}"
-            )
-            retry_raw = self._call_gemini(prompt=repair_prompt, schema=schema)
-            try:
-                envelope = GenerationEnvelope.model_validate(_safe_json_loads(retry_raw))
-                questions = self._post_process_generated_questions(envelope.questions)
-            except (ValidationError, json.JSONDecodeError) as second_error:
-                raise GeminiResponseError("Failed to parse Gemini generation response") from second_error
-            raise_from = first_error
-            if raise_from:
-                pass
+            questions = self._parse_generation(raw_text)
+        except (ValidationError, json.JSONDecodeError):
+            questions = self._salvage_generation(raw_text)
+            if len(questions) < mcq_count + open_count:
+                retry_raw = await self._acall_gemini(prompt=self._repair_prompt(raw_text), schema=GenerationEnvelope)
+                questions = self._best_repair(questions, retry_raw)
 
+        await to_thread.run_sync(self._store_generation, cache_key, questions)
         latency = int((time.perf_counter() - start) * 1000)
         return questions, latency
 
+    @instrument_llm("gemini")
+    async def agenerate_questions_chunked(
+        self,
+        *,
+        chunks: list[str],
+        title: str,
+        mcq_count: int,
+        open_count: int,
+        difficulty: str,
+        concurrency: int,
+    ) -> tuple[list[GeneratedQuestion], int]:
+        """Map-reduce generation: spread the counts over chunks, generate concurrently, merge and dedupe."""
+        start = time.perf_counter()
+        if len(chunks) <= 1:
+            return await self.agenerate_questions(
+                source_text=chunks[0] if chunks else "",
+                title=title,
+                mcq_count=mcq_count,
+                open_count=open_count,
+                difficulty=difficulty,
+            )
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        plan = self._plan_chunks(chunks, mcq_count, open_count)
+        results = await asyncio.gather(
+            *(self._agenerate_chunk(semaphore, entry, title=title, difficulty=difficulty) for entry in plan),
+            return_exceptions=True,
+        )
+
+        merged: list[GeneratedQuestion] = []
+        failures: list[BaseException] = []
+        seen: set[str] = set()
+        for result in results:
+            if isinstance(result, BaseException):
+                failures.append(result)
+                continue
+            merged.extend(self._dedupe(result, seen))
+
+        self._raise_if_all_chunks_failed(failures, produced=len(merged), total=len(plan))
+        latency = int((time.perf_counter() - start) * 1000)
+        return merged, latency
+
+    @instrument_llm("gemini")
+    async def astream_questions_chunked(
+        self,
+        *,
+        chunks: list[str],
+        title: str,
+        mcq_count: int,
+        open_count: int,
+        difficulty: str,
+        concurrency: int,
+    ) -> AsyncIterator[GeneratedQuestion]:
+        """Streaming counterpart of agenerate_questions_chunked; yields each chunk's questions as it finishes."""
+        seen: set[str] = set()
+        if len(chunks) <= 1:
+            async for question in self.astream_questions(
+                source_text=chunks[0] if chunks else "",
+                title=title,
+                mcq_count=mcq_count,
+                open_count=open_count,
+                difficulty=difficulty,
+            ):
+                for unique in self._dedupe([question], seen):
+                    yield unique
+            return
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        plan = self._plan_chunks(chunks, mcq_count, open_count)
+        tasks = [
+            asyncio.ensure_future(self._agenerate_chunk(semaphore, entry, title=title, difficulty=difficulty))
+            for entry in plan
+        ]
+        failures: list[BaseException] = []
+        produced = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                try:
+                    questions = await finished
+                except GeminiResponseError as error:
+                    failures.append(error)
+                    continue
+                for question in self._dedupe(questions, seen):
+                    produced += 1
+                    yield question
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        self._raise_if_all_chunks_failed(failures, produced=produced, total=len(plan))
+
+    async def _agenerate_chunk(
+        self,
+        semaphore: asyncio.Semaphore,
+        entry: tuple[str, int, int],
+        *,
+        title: str,
+        difficulty: str,
+    ) -> list[GeneratedQuestion]:
+        chunk, mcq_count, open_count = entry
+        async with semaphore:
+            questions, _ = await self.agenerate_questions(
+                source_text=chunk,
+                title=title,
+                mcq_count=mcq_count,
+                open_count=open_count,
+                difficulty=difficulty,
+            )
+        return questions
+
+    def _plan_chunks(self, chunks: list[str], mcq_count: int, open_count: int) -> list[tuple[str, int, int]]:
+        """``(text, mcq, open)`` per request, covering the whole document.
+
+        With more chunks than questions, adjacent chunks are merged first, so
+        every part gets at least one question and no chunk is left unsent. The
+        rest of the questions go by length. Open questions are spaced evenly
+        through the document rather than bunched at one end.
+        """
+        total = mcq_count + open_count
+        parts = _merge_chunks(chunks, max(1, total))
+        counts = [1 + extra for extra in _allocate_counts(total - len(parts), [len(part) for part in parts])]
+        open_slots = {(2 * index + 1) * total // (2 * open_count) for index in range(open_count)}
+
+        plan: list[tuple[str, int, int]] = []
+        slot = 0
+        for part, count in zip(parts, counts):
+            part_open = sum(1 for position in range(slot, slot + count) if position in open_slots)
+            plan.append((part, count - part_open, part_open))
+            slot += count
+        return plan
+
+    def _dedupe(self, questions: list[GeneratedQuestion], seen: set[str]) -> list[GeneratedQuestion]:
+        unique: list[GeneratedQuestion] = []
+        for question in questions:
+            key = _question_fingerprint(question)
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(question)
+        return unique
+
+    def _raise_if_all_chunks_failed(self, failures: list[BaseException], *, produced: int, total: int) -> None:
+        if not failures:
+            return
+        logger.warning("event=chunk_generation_failed failed=%s chunks=%s", len(failures), total)
+        if produced == 0:
+            first = failures[0]
+            if isinstance(first, GeminiResponseError):
+                raise first
+            raise GeminiResponseError("Chunked generation failed") from first
+
+    @instrument_llm("gemini")
+    async def astream_questions(
+        self,
+        *,
+        source_text: str,
+        title: str,
+        mcq_count: int,
+        open_count: int,
+        difficulty: str,
+    ) -> AsyncIterator[GeneratedQuestion]:
+        """Yield post-processed questions one by one as the model streams them."""
+        cache_key = self._generation_cache_key(
+            source_text=source_text,
+            mcq_count=mcq_count,
+            open_count=open_count,
+            difficulty=difficulty,
+        )
+        cached = await to_thread.run_sync(self._cached_generation, cache_key)
+        if cached is not None:
+            for question in cached:
+                yield question
+            return
+
+        if self._offline():
+            for question in self._fallback_generate(source_text, mcq_count, open_count):
+                yield question
+            return
+
+        prompt = self._generation_prompt(
+            source_text=source_text,
+            title=title,
+            mcq_count=mcq_count,
+            open_count=open_count,
+            difficulty=difficulty,
+        )
+        parser = JsonArrayStreamParser(array_key="questions")
+        streamed: list[GeneratedQuestion] = []
+        async for text in self._astream_gemini(prompt=prompt, schema=GenerationEnvelope):
+            for item in parser.feed(text):
+                try:
+                    candidate = GeneratedQuestion.model_validate(item)
+                except ValidationError:
+                    continue
+                for question in self._post_process_generated_questions([candidate]):
+                    streamed.append(question)
+                    yield question
+
+        if not streamed:
+            raise GeminiResponseError("Gemini stream produced no valid questions")
+        await to_thread.run_sync(self._store_generation, cache_key, streamed)
+
+    @instrument_llm("gemini")
     def grade_open_answer(
         self,
         *,
@@ -143,13 +513,170 @@ class GeminiService:
         question_text: str,
         user_answer: str,
     ) -> tuple[float, str, str]:
-        if not self.api_key:
+        if self._offline():
+            score, feedback = self._fallback_grade(reference_text, question_text, user_answer)
+            return score, feedback, "fallback"
+
+        prompt = self._grading_prompt(
+            reference_text=reference_text,
+            question_text=question_text,
+            user_answer=user_answer,
+        )
+        raw_text = self._call_gemini(prompt=prompt, schema=GradeEnvelope)
+        score, feedback = self._parse_grade(raw_text)
+        return score, feedback, "gemini"
+
+    @instrument_llm("gemini")
+    async def agrade_open_answer(
+        self,
+        *,
+        reference_text: str,
+        question_text: str,
+        user_answer: str,
+    ) -> tuple[float, str, str]:
+        if self._offline():
             score, feedback = self._fallback_grade(reference_text, question_text, user_answer)
             return score, feedback, "fallback"
 
-        schema = GradeEnvelope
+        prompt = self._grading_prompt(
+            reference_text=reference_text,
+            question_text=question_text,
+            user_answer=user_answer,
+        )
+        raw_text = await self._acall_gemini(prompt=prompt, schema=GradeEnvelope)
+        score, feedback = self._parse_grade(raw_text)
+        return score, feedback, "gemini"
+
+    @instrument_llm("gemini")
+    def grade_open_answers(
+        self,
+        *,
+        reference_text: str,
+        answers: list[OpenAnswer],
+    ) -> dict[int, tuple[float, str, str]]:
+        """Grade several open answers against one reference text in a single call."""
+        if not answers:
+            return {}
+
+        if self._offline():
+            grades = self.offline_grader.grade(
+                reference_text, [item.question_text for item in answers], [item.user_answer for item in answers]
+            )
+            return {item.question_id: (score, feedback, "fallback") for item, (score, feedback) in zip(answers, grades)}
+
+        prompt = self._batch_grading_prompt(reference_text=reference_text, answers=answers)
+        raw_text = self._call_gemini(prompt=prompt, schema=BatchGradeEnvelope)
+        results = self._parse_batch_grades(raw_text, answers)
+
+        # Anything the model skipped is graded on its own rather than silently scored zero.
+        for item in answers:
+            if item.question_id not in results:
+                results[item.question_id] = self.grade_open_answer(
+                    reference_text=reference_text,
+                    question_text=item.question_text,
+                    user_answer=item.user_answer,
+                )
+        return results
+
+    @instrument_llm("gemini")
+    def summarize_video(self, transcript_text: str) -> VideoSummaryResponse:
+        if self._offline():
+            return self._fallback_summary()
+
+        raw_text = self._call_gemini(prompt=self._summary_prompt(transcript_text), schema=VideoSummaryResponse)
+        return self._parse_summary(raw_text)
+
+    @instrument_llm("gemini")
+    async def asummarize_video(self, transcript_text: str) -> VideoSummaryResponse:
+        if self._offline():
+            return self._fallback_summary()
+
+        raw_text = await self._acall_gemini(prompt=self._summary_prompt(transcript_text), schema=VideoSummaryResponse)
+        return self._parse_summary(raw_text)
+
+    def _generation_prompt(
+        self,
+        *,
+        source_text: str,
+        title: str,
+        mcq_count: int,
+        open_count: int,
+        difficulty: str,
+    ) -> str:
+        return (
+            "You are generating quiz questions for students. "
+            "Return JSON only. No markdown. "
+            f"Create {mcq_count} MCQ questions and {open_count} open-ended questions. "
+            f"Difficulty: {difficulty}. Quiz title: {title}.\n"
+            "For MCQ: include options as an array of 4 strings and correct_option as A, B, C, or D. "
+            "For open questions: options and correct_option must be null.\n"
+            "Use this bounded source text only:\n"
+            "<SOURCE>\n"
+            f"{source_text}\n"
+            "</SOURCE>"
+        )
+
+    def _generation_cache_key(self, *, source_text: str, mcq_count: int, open_count: int, difficulty: str) -> str:
+        return fingerprint(
+            "generation",
+            source_text,
+            mcq_count,
+            open_count,
+            difficulty,
+            self.model_name,
+            GENERATION_PROMPT_VERSION,
+        )
+
+    # The cache is backed by the database; async callers run these two through ``to_thread``.
+    def _cached_generation(self, cache_key: str) -> list[GeneratedQuestion] | None:
+        if self.generation_cache is None:
+            return None
+        cached = self.generation_cache.get(cache_key)
+        if cached is None:
+            return None
+        return [GeneratedQuestion.model_validate(item) for item in cached]
+
+    def _store_generation(self, cache_key: str, questions: list[GeneratedQuestion]) -> None:
+        if self.generation_cache is None or not questions:
+            return
+        self.generation_cache.set(cache_key, [question.model_dump() for question in questions])
+
+    def _repair_prompt(self, raw_text: str) -> str:
+        return (
+            "Your previous output was invalid JSON for the required schema. "
+            "Return corrected JSON only for the same schema.\n"
+            f"Invalid output:\n{raw_text}"
+        )
+
+    def _parse_generation(self, raw_text: str) -> list[GeneratedQuestion]:
+        # A cut-off reply goes through salvage, which drops the question it stopped inside.
+        envelope = GenerationEnvelope.model_validate(loads_tolerant(raw_text, allow_truncated=False))
+        return self._post_process_generated_questions(envelope.questions)
 
-        prompt = (
+    def _salvage_generation(self, raw_text: str) -> list[GeneratedQuestion]:
+        """Questions that validate on their own from output the envelope rejected."""
+        salvaged: list[GeneratedQuestion] = []
+        for item in salvage_items(raw_text, array_key="questions"):
+            try:
+                salvaged.append(GeneratedQuestion.model_validate(item))
+            except ValidationError:
+                continue
+        if salvaged:
+            logger.info("event=generation_salvaged question_count=%s", len(salvaged))
+        return self._post_process_generated_questions(salvaged)
+
+    def _best_repair(self, salvaged: list[GeneratedQuestion], retry_raw: str) -> list[GeneratedQuestion]:
+        try:
+            repaired = self._parse_generation(retry_raw)
+        except (ValidationError, json.JSONDecodeError):
+            repaired = self._salvage_generation(retry_raw)
+        best = repaired if len(repaired) >= len(salvaged) else salvaged
+        if not best:
+            raise GeminiResponseError("Failed to parse Gemini generation response")
+        return best
+
+    def _grading_prompt(self, *, reference_text: str, question_text: str, user_answer: str) -> str:
+        return (
             "Grade the user's open-ended answer with strict JSON output. "
             "Score must be between 0 and 1. Feedback must be concise and constructive.\n"
             f"Question:\n{question_text}\n\n"
@@ -160,26 +687,51 @@ class GeminiService:
             "</REFERENCE>"
         )
 
-        raw_text = self._call_gemini(prompt=prompt, schema=schema)
+    def _parse_grade(self, raw_text: str) -> tuple[float, str]:
         try:
-            grade = GradeEnvelope.model_validate(_safe_json_loads(raw_text))
+            grade = GradeEnvelope.model_validate(loads_tolerant(raw_text))
         except (ValidationError, json.JSONDecodeError) as error:
             raise GeminiResponseError("Failed to parse Gemini grading response") from error
 
         score = min(1.0, max(0.0, float(grade.score)))
-        return score, grade.feedback.strip(), "gemini"
+        return score, grade.feedback.strip()
 
-    def summarize_video(self, transcript_text: str) -> VideoSummaryResponse:
-        if not self.api_key:
-             # Fallback is not implemented for summary yet, just return dummy data
-             return VideoSummaryResponse(
-                 summary="This is a fallback summary.",
-                 key_points=["Point 1", "Point 2"],
-                 questions=[]
-             )
-
-        schema = VideoSummaryResponse
-        prompt = (
+    def _batch_grading_prompt(self, *, reference_text: str, answers: list[OpenAnswer]) -> str:
+        answer_blocks = "\n\n".join(
+            f"<ANSWER question_id=\"{item.question_id}\">\n"
+            f"Question:\n{item.question_text}\n"
+            f"User answer:\n{item.user_answer}\n"
+            "</ANSWER>"
+            for item in answers
+        )
+        return (
+            "Grade each of the user's open-ended answers with strict JSON output. "
+            "Return one grade per answer, keyed by its question_id. "
+            "Each score must be between 0 and 1. Feedback must be concise and constructive.\n"
+            f"{answer_blocks}\n\n"
+            "Reference material:\n"
+            "<REFERENCE>\n"
+            f"{reference_text}\n"
+            "</REFERENCE>"
+        )
+
+    def _parse_batch_grades(self, raw_text: str, answers: list[OpenAnswer]) -> dict[int, tuple[float, str, str]]:
+        try:
+            envelope = BatchGradeEnvelope.model_validate(loads_tolerant(raw_text))
+        except (ValidationError, json.JSONDecodeError) as error:
+            raise GeminiResponseError("Failed to parse Gemini batch grading response") from error
+
+        expected = {item.question_id for item in answers}
+        results: dict[int, tuple[float, str, str]] = {}
+        for grade in envelope.grades:
+            if grade.question_id not in expected:
+                continue
+            score = min(1.0, max(0.0, float(grade.score)))
+            results[grade.question_id] = (score, grade.feedback.strip(), "gemini")
+        return results
+
+    def _summary_prompt(self, transcript_text: str) -> str:
+        return (
             "You are an expert tutor. Summarize the following video transcript. "
             "Return JSON only. No markdown. "
             "Includes a 'summary' paragraph, a list of 'key_points', and 5 'questions' (mixed MCQ and open) based on the content.\n"
@@ -189,39 +741,176 @@ class GeminiService:
             f"{transcript_text[:30000]}\n"  # Limit transcript length to avoid token limits
             "</TRANSCRIPT>"
         )
-        
-        raw_text = self._call_gemini(prompt=prompt, schema=schema)
+
+    def _parse_summary(self, raw_text: str) -> VideoSummaryResponse:
         try:
-            response = VideoSummaryResponse.model_validate(_safe_json_loads(raw_text))
-            # Post-process questions to ensure they have correct structure
-            processed_questions = self._post_process_generated_questions(response.questions)
-            response.questions = processed_questions
-            return response
+            response = VideoSummaryResponse.model_validate(loads_tolerant(raw_text))
         except (ValidationError, json.JSONDecodeError) as error:
-             raise GeminiResponseError("Failed to parse Gemini summary response") from error
+            raise GeminiResponseError("Failed to parse Gemini summary response") from error
 
-    def _call_gemini(self, *, prompt: str, schema: Any) -> str:
+        # Post-process questions to ensure they have correct structure
+        response.questions = self._post_process_generated_questions(response.questions)
+        return response
+
+    def _fallback_summary(self) -> VideoSummaryResponse:
+        # Fallback is not implemented for summary yet, just return dummy data
+        return VideoSummaryResponse(
+            summary="This is a fallback summary.",
+            key_points=["Point 1", "Point 2"],
+            questions=[],
+        )
+
+    def close(self) -> None:
+        """Release the pooled sync connections; the client is rebuilt lazily on next use.
+
+        The async pool can only be closed from a loop, so it stays open and is
+        reused until ``aclose``.
+        """
+        with self._client_lock:
+            http_client = self._http_client
+            self._client = None
+            self._http_client = None
+        if http_client is not None:
+            http_client.close()
+
+    async def aclose(self) -> None:
+        with self._client_lock:
+            http_client = self._http_client
+            async_http_client = self._async_http_client
+            self._client = None
+            self._http_client = None
+            self._async_http_client = None
+        if http_client is not None:
+            http_client.close()
+        if async_http_client is not None:
+            await async_http_client.aclose()
+
+    def _get_client(self) -> Any:
+        client = self._client
+        if client is not None:
+            return client
+
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._build_client()
+            return self._client
+
+    def _build_client(self) -> Any:
         try:
+            import httpx
             from google import genai
+            from google.genai import types
         except Exception as error:  # pragma: no cover - import-specific path
             raise GeminiResponseError("google-genai package is unavailable") from error
 
-        client = genai.Client(api_key=self.api_key)
+        # One keep-alive pool per process: every generation/grading call reuses
+        # warm connections instead of paying a fresh TLS handshake.
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry_seconds,
+        )
+        self._http_client = httpx.Client(limits=limits, timeout=None)
+        if self._async_http_client is None:
+            self._async_http_client = httpx.AsyncClient(limits=limits, timeout=None)
+        http_options = types.HttpOptions(
+            base_url=self.base_url or None,
+            timeout=int(self.timeout_seconds * 1000),
+            httpx_client=self._http_client,
+            httpx_async_client=self._async_http_client,
+        )
+        return genai.Client(api_key=self.api_key, http_options=http_options)
+
+    def _offline(self) -> bool:
+        """Serve local fallbacks when there is no key or the circuit breaker is refusing calls."""
+        return not self.api_key or self.resilience.breaker.rejecting
+
+    def _call_gemini(self, *, prompt: str, schema: Any) -> str:
+        # Layering: coalesce identical calls, then wait for provider capacity,
+        # then retry/hedge under that one admission.
+        def send() -> str:
+            with self.limiter.limit(estimate_tokens(prompt) + _OUTPUT_TOKEN_ESTIMATE):
+                return self.resilience.call(lambda: self._send_gemini(prompt=prompt, schema=schema))
+
+        try:
+            return self.single_flight.do(self._call_key(prompt, schema), send)
+        except CircuitOpenError as error:
+            raise GeminiResponseError("Gemini is unavailable") from error
+
+    async def _acall_gemini(self, *, prompt: str, schema: Any) -> str:
+        async def send() -> str:
+            async with self.limiter.alimit(estimate_tokens(prompt) + _OUTPUT_TOKEN_ESTIMATE):
+                return await self.resilience.acall(lambda: self._asend_gemini(prompt=prompt, schema=schema))
+
+        try:
+            return await self.single_flight.ado(self._call_key(prompt, schema), send)
+        except CircuitOpenError as error:
+            raise GeminiResponseError("Gemini is unavailable") from error
+
+    def _call_key(self, prompt: str, schema: Any) -> str:
+        return fingerprint("call", self.model_name, getattr(schema, "__name__", str(schema)), prompt)
+
+    def _send_gemini(self, *, prompt: str, schema: Any) -> str:
+        client = self._get_client()
         try:
             response = client.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": schema,
-                    "temperature": 0.2,
-                },
+                config=self._request_config(schema),
             )
-        except Exception as error:  # pragma: no cover - network/model errors
-            raise GeminiResponseError("Gemini request failed") from error
+        except Exception as error:
+            raise self._request_error(error) from error
+
+        return _extract_response_text(response)
+
+    async def _asend_gemini(self, *, prompt: str, schema: Any) -> str:
+        client = self._get_client()
+        try:
+            response = await asyncio.wait_for(
+                client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=self._request_config(schema),
+                ),
+                timeout=self.timeout_seconds,
+            )
+        except Exception as error:
+            raise self._request_error(error) from error
 
         return _extract_response_text(response)
 
+    def _request_error(self, error: Exception) -> GeminiResponseError:
+        if isinstance(error, GeminiResponseError):
+            return error
+        if _is_transient(error):
+            return GeminiTransientError("Gemini request failed")
+        return GeminiResponseError("Gemini request failed")
+
+    async def _astream_gemini(self, *, prompt: str, schema: Any) -> AsyncIterator[str]:
+        client = self._get_client()
+        try:
+            async with self.limiter.alimit(estimate_tokens(prompt) + _OUTPUT_TOKEN_ESTIMATE):
+                stream = await client.aio.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=self._request_config(schema),
+                )
+                async for chunk in stream:
+                    text = getattr(chunk, "text", None)
+                    if text:
+                        yield text
+        except GeminiResponseError:
+            raise
+        except Exception as error:  # pragma: no cover - network/model errors
+            raise GeminiResponseError("Gemini streaming request failed") from error
+
+    def _request_config(self, schema: Any) -> dict[str, Any]:
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": schema,
+            "temperature": 0.2,
+        }
+
     def _post_process_generated_questions(self, questions: list[GeneratedQuestion]) -> list[GeneratedQuestion]:
         processed: list[GeneratedQuestion] = []
         for question in questions:
@@ -295,25 +984,7 @@ class GeminiService:
         return questions
 
     def _fallback_grade(self, reference_text: str, question_text: str, user_answer: str) -> tuple[float, str]:
-        answer_words = {word.lower() for word in re.findall(r"[a-zA-Z]{4,}", user_answer)}
-        reference_words = set(self._extract_keywords(reference_text + " " + question_text, top_n=12))
-
-        if not answer_words:
-            return 0.0, "No answer detected. Provide a concise explanation using key concepts."
-
-        overlap = len(answer_words & reference_words)
-        target = max(1, min(len(reference_words), 6))
-        length_bonus = min(len(answer_words) / 40, 0.2)
-        score = min(1.0, max(0.0, (overlap / target) + length_bonus))
-
-        if overlap == 0:
-            feedback = "Your answer is readable but misses the core concepts from the reference material."
-        else:
-            feedback = (
-                f"You covered {overlap} important concept(s). Improve by explicitly referencing more source terminology."
-            )
-
-        return score, feedback
+        return self.offline_grader.grade(reference_text, [question_text], [user_answer])[0]
 
     def _extract_keywords(self, text: str, top_n: int = 16) -> list[str]:
         stopwords = {
@@ -1,22 +1,69 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from dataclasses import field
+import hashlib
+import logging
 
 try:
+    from ..config import settings
     from ..models import QuestionType
+    from .cache import ResultCache
+    from .cache import fingerprint
     from .gemini import GeminiService
+    from .gemini import OpenAnswer
+    from .offline_grading import OfflineGrader
+    from .retrieval import tokenize
 except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
     from models import QuestionType
+    from services.cache import ResultCache
+    from services.cache import fingerprint
     from services.gemini import GeminiService
+    from services.gemini import OpenAnswer
+    from services.offline_grading import OfflineGrader
+    from services.retrieval import tokenize
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_answer(answer: str) -> str:
+    return " ".join(answer.lower().split())
+
+
+@dataclass
+class GradingTierStats:
+    local_accepted: int = 0
+    local_rejected: int = 0
+    escalated: int = 0
 
 
 @dataclass
 class GradingService:
+    """Grades answers: MCQs by rule, open answers through a local tier and then the LLM.
+
+    The local tier scores each open answer by similarity to the reference.
+    Scores at or above ``local_accept_score`` are final (``graded_by="local"``),
+    as are answers with no content words at all. A low score is not evidence
+    of a wrong answer, because a correct paraphrase shares no words with the
+    reference. Local rejection by score is therefore off unless
+    ``local_reject_score`` is set to 0 or above. Raising the accept threshold
+    above 1 disables local acceptance.
+    """
+
     gemini_service: GeminiService
+    grading_cache: ResultCache | None = None
+    defer_open_grading: bool = settings.defer_open_grading
+    local_grader: OfflineGrader = field(default_factory=OfflineGrader)
+    local_accept_score: float = settings.grading_local_accept_score
+    local_reject_score: float = settings.grading_local_reject_score
+    tier_stats: GradingTierStats = field(default_factory=GradingTierStats)
 
     def grade_answer(
         self,
         *,
+        question_id: int,
         question_type: QuestionType,
         question_text: str,
         user_answer: str,
@@ -40,9 +87,118 @@ class GradingService:
                 )
             return score, feedback, "rule"
 
+        cache_key = self._grading_cache_key(
+            question_id=question_id,
+            question_text=question_text,
+            user_answer=answer,
+            reference_text=reference_text,
+        )
+        if self.grading_cache is not None:
+            cached = self.grading_cache.get(cache_key)
+            if cached is not None:
+                return float(cached["score"]), str(cached["feedback"]), "cache"
+
+        [local] = self._grade_locally(_local_reference(explanation, reference_text), [question_text], [answer])
+        if local is not None:
+            return local
+
         score, feedback, graded_by = self.gemini_service.grade_open_answer(
             reference_text=reference_text,
             question_text=question_text,
             user_answer=answer,
         )
+        # Only model grades are worth remembering; the keyword fallback is cheaper than a lookup.
+        if self.grading_cache is not None and graded_by == "gemini":
+            self.grading_cache.set(cache_key, {"score": score, "feedback": feedback})
         return score, feedback, graded_by
+
+    def grade_batch(self, *, reference_text: str, answers: list[OpenAnswer]) -> dict[int, tuple[float, str, str]]:
+        """Grade an attempt's open answers together, sending the reference text once."""
+        results: dict[int, tuple[float, str, str]] = {}
+        misses: list[OpenAnswer] = []
+        cache_keys: dict[int, str] = {}
+
+        for item in answers:
+            answer = OpenAnswer(
+                question_id=item.question_id,
+                question_text=item.question_text,
+                user_answer=(item.user_answer or "").strip(),
+                explanation=item.explanation,
+            )
+            cache_key = self._grading_cache_key(
+                question_id=answer.question_id,
+                question_text=answer.question_text,
+                user_answer=answer.user_answer,
+                reference_text=reference_text,
+            )
+            cache_keys[answer.question_id] = cache_key
+            cached = self.grading_cache.get(cache_key) if self.grading_cache is not None else None
+            if cached is not None:
+                results[answer.question_id] = (float(cached["score"]), str(cached["feedback"]), "cache")
+            else:
+                misses.append(answer)
+
+        # Same local reference as grade_answer, so an answer gets the same local verdict on either path.
+        by_reference: dict[str, list[OpenAnswer]] = {}
+        for item in misses:
+            by_reference.setdefault(_local_reference(item.explanation, reference_text), []).append(item)
+        local_grades: dict[int, tuple[float, str, str] | None] = {}
+        for local_reference, group in by_reference.items():
+            grades = self._grade_locally(
+                local_reference, [item.question_text for item in group], [item.user_answer for item in group]
+            )
+            local_grades.update(zip((item.question_id for item in group), grades))
+        escalated: list[OpenAnswer] = []
+        for item in misses:
+            local = local_grades[item.question_id]
+            if local is None:
+                escalated.append(item)
+            else:
+                results[item.question_id] = local
+
+        graded = self.gemini_service.grade_open_answers(reference_text=reference_text, answers=escalated)
+        for question_id, (score, feedback, graded_by) in graded.items():
+            results[question_id] = (score, feedback, graded_by)
+            if self.grading_cache is not None and graded_by == "gemini":
+                self.grading_cache.set(cache_keys[question_id], {"score": score, "feedback": feedback})
+        return results
+
+    def _grade_locally(
+        self, reference_text: str, questions: list[str], answers: list[str]
+    ) -> list[tuple[float, str, str] | None]:
+        """Final local grades for clear-cut answers, ``None`` for those the LLM should see."""
+        if not answers:
+            return []
+        outcomes: list[tuple[float, str, str] | None] = []
+        for answer, (score, feedback) in zip(answers, self.local_grader.grade(reference_text, questions, answers)):
+            if not tokenize(answer):
+                self.tier_stats.local_rejected += 1
+                outcomes.append((0.0, feedback, "local"))
+            elif score >= self.local_accept_score:
+                self.tier_stats.local_accepted += 1
+                outcomes.append((score, feedback, "local"))
+            elif score <= self.local_reject_score:
+                self.tier_stats.local_rejected += 1
+                outcomes.append((score, feedback, "local"))
+            else:
+                self.tier_stats.escalated += 1
+                outcomes.append(None)
+        resolved = sum(outcome is not None for outcome in outcomes)
+        if resolved:
+            logger.info("event=grading_resolved_locally resolved=%s escalated=%s", resolved, len(outcomes) - resolved)
+        return outcomes
+
+    def _grading_cache_key(self, *, question_id: int, question_text: str, user_answer: str, reference_text: str) -> str:
+        reference_hash = hashlib.sha256(reference_text.encode("utf-8")).hexdigest()
+        return fingerprint(
+            "grading",
+            question_id,
+            question_text,
+            normalize_answer(user_answer),
+            reference_hash,
+            self.gemini_service.model_name,
+        )
+
+
+def _local_reference(explanation: str, reference_text: str) -> str:
+    return f"Reference explanation: {explanation}\n{reference_text}" if explanation else reference_text
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+import logging
+import queue
+import threading
+
+from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import selectinload
+
+try:
+    from ..database import SessionLocal
+    from ..models import AttemptAnswer
+    from ..models import GradingStatus
+    from .grading import GradingService
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from database import SessionLocal
+    from models import AttemptAnswer
+    from models import GradingStatus
+    from services.grading import GradingService
+
+
+logger = logging.getLogger(__name__)
+
+FAILED_FEEDBACK = "Automatic grading failed. The answer will be graded again when the attempt is completed."
+
+
+@dataclass(frozen=True)
+class GradingJob:
+    answer_id: int
+    user_answer: str
+    grading_service: GradingService
+    # ``cancelled`` and ``started`` are only changed under the queue's lock, so exactly one of them wins.
+    cancelled: threading.Event = field(default_factory=threading.Event, compare=False, repr=False)
+    started: threading.Event = field(default_factory=threading.Event, compare=False, repr=False)
+    done: threading.Event = field(default_factory=threading.Event, compare=False, repr=False)
+
+
+@dataclass
+class GradingQueue:
+    """Bounded in-process queue that grades pending open answers on worker threads.
+
+    Workers only write a grade if the answer is still pending with the same
+    text it was queued with, so a resave or an attempt completion that graded
+    it first always wins. Completion calls ``take_over`` first, so answers
+    are not graded by both.
+    """
+
+    workers: int
+    max_size: int
+    reference_builder: Callable[[Session, int, str], str]
+    session_factory: Callable[[], Session] = SessionLocal
+    completed: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    _queue: queue.Queue[GradingJob | None] = field(init=False, repr=False)
+    _threads: list[threading.Thread] = field(default_factory=list, init=False, repr=False)
+    _in_flight: int = field(default=0, init=False, repr=False)
+    _jobs: dict[int, list[GradingJob]] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._queue = queue.Queue(maxsize=self.max_size)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"grading-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, job: GradingJob) -> bool:
+        """Queue a job; returns False when the pool is stopped or full so the caller can grade inline."""
+        if not self.running:
+            return False
+        with self._lock:
+            self._jobs.setdefault(job.answer_id, []).append(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            logger.warning("event=grading_queue_full depth=%s answer_id=%s", self.depth, job.answer_id)
+            self._forget(job)
+            return False
+        return True
+
+    def take_over(self, answer_ids: Iterable[int], *, timeout: float) -> None:
+        """Hand these answers to the caller: cancel their waiting jobs and wait for running ones.
+
+        A job still running after ``timeout`` is left to finish. The caller's
+        grade then wins, because the worker only writes to pending answers.
+        """
+        running: list[GradingJob] = []
+        with self._lock:
+            for answer_id in answer_ids:
+                for job in self._jobs.get(answer_id, []):
+                    if job.started.is_set():
+                        running.append(job)
+                    elif not job.cancelled.is_set():
+                        job.cancelled.set()
+                        self.cancelled += 1
+        for job in running:
+            if not job.done.wait(timeout):
+                logger.warning("event=grading_take_over_timeout answer_id=%s", job.answer_id)
+
+    def _forget(self, job: GradingJob) -> None:
+        with self._lock:
+            jobs = [other for other in self._jobs.get(job.answer_id, []) if other is not job]
+            if jobs:
+                self._jobs[job.answer_id] = jobs
+            else:
+                self._jobs.pop(job.answer_id, None)
+        job.done.set()
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                cancelled = job.cancelled.is_set()
+                if not cancelled:
+                    job.started.set()
+                    self._in_flight += 1
+            if cancelled:
+                self._forget(job)
+                continue
+            try:
+                self._grade(job)
+            except Exception:
+                logger.exception("event=background_grading_failed answer_id=%s", job.answer_id)
+                self._mark_failed(job)
+                with self._lock:
+                    self.failed += 1
+            else:
+                with self._lock:
+                    self.completed += 1
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._forget(job)
+
+    def _grade(self, job: GradingJob) -> None:
+        with self.session_factory() as db:
+            answer = db.scalar(
+                select(AttemptAnswer)
+                .where(AttemptAnswer.id == job.answer_id)
+                .options(selectinload(AttemptAnswer.question), selectinload(AttemptAnswer.attempt))
+            )
+            if answer is None or answer.grading_status != GradingStatus.pending or answer.user_answer != job.user_answer:
+                return
+
+            question = answer.question
+            explanation = ""
+            if isinstance(question.explanation_json, dict):
+                explanation = str(question.explanation_json.get("text", ""))
+            grade_kwargs = {
+                "question_id": question.id,
+                "question_type": question.type,
+                "question_text": question.question_text,
+                "user_answer": job.user_answer,
+                "correct_option": question.correct_option,
+                "explanation": explanation,
+                "reference_text": self.reference_builder(db, answer.attempt.quiz_id, question.question_text),
+            }
+            # Keep a reference built for an older quiz instead of rebuilding it for every job.
+            db.commit()
+
+        # The LLM call runs without holding a session so slow grades never pin a connection.
+        score, feedback, _ = job.grading_service.grade_answer(**grade_kwargs)
+        self._write(job, score=float(min(1.0, max(0.0, score))), feedback=feedback, status=GradingStatus.graded)
+
+    def _mark_failed(self, job: GradingJob) -> None:
+        try:
+            self._write(job, score=0.0, feedback=FAILED_FEEDBACK, status=GradingStatus.failed)
+        except Exception:
+            logger.exception("event=background_grading_mark_failed answer_id=%s", job.answer_id)
+
+    def _write(self, job: GradingJob, *, score: float, feedback: str, status: GradingStatus) -> None:
+        with self.session_factory() as db:
+            db.execute(
+                update(AttemptAnswer)
+                .where(
+                    AttemptAnswer.id == job.answer_id,
+                    AttemptAnswer.grading_status == GradingStatus.pending,
+                    AttemptAnswer.user_answer == job.user_answer,
+                )
+                .values(score=score, ai_feedback=feedback, grading_status=status)
+            )
+            db.commit()
@@ -0,0 +1,157 @@
+"""Tolerant parsing of model output that was meant to be JSON.
+
+Models wrap JSON in code fences or prose, stop mid-value when they hit the
+token limit, and leave trailing commas. ``loads_tolerant`` fixes those locally;
+``salvage_items`` recovers the complete objects of a list even when the rest of
+the document cannot be repaired, so callers only pay for an LLM repair round
+trip when too little survives. An item the output was cut off inside is never
+kept: closing it would turn e.g. a half-written definition into a valid one.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+try:
+    from .json_stream import JsonArrayStreamParser
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from services.json_stream import JsonArrayStreamParser
+
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.IGNORECASE | re.DOTALL)
+_BARE_TOKEN = re.compile(r"[\w.+-]+$")
+
+
+def extract_json_text(text: str) -> str:
+    """The fenced block if there is one, otherwise everything from the first ``{`` or ``[``."""
+    content = text.strip()
+    fence = _FENCE.search(content)
+    if fence:
+        content = fence.group(1).strip()
+    starts = [index for index in (content.find("{"), content.find("[")) if index >= 0]
+    return content[min(starts) :] if starts else content
+
+
+def repair_json(text: str) -> str:
+    """Best-effort valid JSON text: trailing prose and commas dropped, truncated values closed."""
+    return _repair(text)[0]
+
+
+def _repair(text: str) -> tuple[str, bool]:
+    """The repaired text and whether an open string or container had to be closed."""
+    source = extract_json_text(text)
+    out: list[str] = []
+    closers: list[str] = []
+    in_string = False
+    escaped = False
+    last_string_start = 0
+
+    for char in source:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+            last_string_start = len(out)
+            out.append(char)
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+            out.append(char)
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if closers and closers[-1] == char:
+                closers.pop()
+                out.append(char)
+                if not closers:
+                    break  # end of the top-level value; anything after it is prose
+        else:
+            out.append(char)
+
+    truncated = in_string or bool(closers)
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    if not closers:
+        return "".join(out), truncated
+
+    repaired = _trim_incomplete_tail("".join(out), last_string_start, in_object=closers[-1] == "}")
+    for closer in reversed(closers):
+        repaired = repaired.rstrip().removesuffix(",") + closer
+    return repaired, truncated
+
+
+def loads_tolerant(text: str, *, allow_truncated: bool = True) -> Any:
+    """``json.loads`` with local repair as the fallback; raises ``json.JSONDecodeError`` if both fail.
+
+    With ``allow_truncated=False`` a document that was cut off is rejected
+    instead of closed, for callers that would rather salvage complete items.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(extract_json_text(text))
+    except json.JSONDecodeError:
+        repaired, truncated = _repair(text)
+        if truncated and not allow_truncated:
+            raise json.JSONDecodeError("Truncated JSON", text, len(text)) from None
+        return json.loads(repaired)
+
+
+def salvage_items(text: str, array_key: str | None = None) -> list[dict[str, Any]]:
+    """Objects of the list at ``array_key`` (or the top-level list), keeping whatever parses.
+
+    A document that only needs local fixes yields all of its items. A cut-off
+    or otherwise damaged one yields every complete object before the point of
+    damage, so an item the output stopped inside is dropped.
+    """
+    try:
+        value = loads_tolerant(text, allow_truncated=False)
+    except json.JSONDecodeError:
+        value = None
+    if isinstance(value, dict) and array_key is not None:
+        value = value.get(array_key)
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+
+    parser = JsonArrayStreamParser(array_key=array_key, loads=loads_tolerant)
+    return parser.feed(extract_json_text(text))
+
+
+def _drop_trailing_comma(out: list[str]) -> None:
+    index = len(out)
+    while index and out[index - 1].isspace():
+        index -= 1
+    if index and out[index - 1] == ",":
+        del out[index - 1 :]
+
+
+def _trim_incomplete_tail(text: str, last_string_start: int, *, in_object: bool) -> str:
+    """Remove a cut-off literal, a dangling ``:`` and a key left without a value."""
+    text = text.rstrip()
+    bare = _BARE_TOKEN.search(text)
+    if bare and not _is_scalar(bare.group()):
+        text = text[: bare.start()].rstrip()
+    if text.endswith(":"):
+        text = text[:-1].rstrip()
+    if in_object and text.endswith('"') and text[:last_string_start].rstrip().endswith(("{", ",")):
+        text = text[:last_string_start].rstrip()
+    return text.removesuffix(",")
+
+
+def _is_scalar(token: str) -> bool:
+    try:
+        json.loads(token)
+    except json.JSONDecodeError:
+        return False
+    return True
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+import json
+import re
+from typing import Any
+
+
+class JsonArrayStreamParser:
+    """Incrementally extract complete objects from a JSON array as text arrives.
+
+    With ``array_key`` set, the parser waits for ``"<key>": [`` and emits the
+    objects of that array (e.g. ``{"questions": [...]}``); without it, the first
+    top-level ``[`` is used, which also skips any leading prose or code fence.
+    Items that are not valid JSON objects once closed are dropped; pass a more
+    forgiving ``loads`` to accept items with e.g. trailing commas.
+    """
+
+    def __init__(self, array_key: str | None = None, *, loads: Callable[[str], Any] = json.loads) -> None:
+        self._loads = loads
+        self._buffer = ""
+        self._position = 0
+        self._array_opener = (
+            re.compile(r'(?<!\\)"' + re.escape(array_key) + r'"\s*:\s*\[') if array_key else re.compile(r"\[")
+        )
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start: int | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> list[dict[str, Any]]:
+        if self._finished or not chunk:
+            return []
+
+        self._buffer += chunk
+        if not self._in_array:
+            match = self._array_opener.search(self._buffer, self._position)
+            if match is None:
+                return []
+            self._in_array = True
+            self._position = match.end()
+
+        items: list[dict[str, Any]] = []
+        buffer = self._buffer
+        index = self._position
+        while index < len(buffer):
+            char = buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._item_start = index
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the array itself.
+                    self._finished = True
+                    index += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    item = self._load(buffer[self._item_start : index + 1])
+                    if item is not None:
+                        items.append(item)
+                    self._item_start = None
+            index += 1
+
+        self._compact(index)
+        return items
+
+    def _compact(self, index: int) -> None:
+        # Keep only the unfinished item so long streams do not grow the buffer.
+        keep_from = self._item_start if self._item_start is not None else index
+        self._buffer = self._buffer[keep_from:]
+        self._position = index - keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+
+    def _load(self, raw: str) -> dict[str, Any] | None:
+        try:
+            value = self._loads(raw)
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, dict) else None
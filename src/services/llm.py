@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import asynccontextmanager
+from contextlib import contextmanager
+from dataclasses import dataclass
+from dataclasses import field
+import logging
+import threading
+import time
+from typing import Any
+
+try:
+    from ..config import settings
+    from .metrics import observe_llm_call
+    from .retrieval import estimate_tokens
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
+    from services.metrics import observe_llm_call
+    from services.retrieval import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderBusyError(RuntimeError):
+    """Raised when a request waited ``queue_timeout_seconds`` without getting a slot or rate budget."""
+
+    def __init__(self, provider: str, retry_after: float) -> None:
+        super().__init__(f"{provider} is at capacity, retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class ClaudeResponseError(RuntimeError):
+    pass
+
+
+@dataclass
+class TokenBucket:
+    """Refills ``per_minute`` units evenly over a minute, holding at most one minute's worth."""
+
+    per_minute: float
+    clock: Callable[[], float] = time.monotonic
+    _level: float = field(default=0.0, init=False, repr=False)
+    _updated: float = field(default=0.0, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._level = self.per_minute
+        self._updated = self.clock()
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until ``amount`` is available (0 when it already is). Not thread-safe on its own."""
+        now = self.clock()
+        self._level = min(self.per_minute, self._level + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+        # A request larger than the whole bucket waits for a full bucket instead of forever.
+        missing = min(amount, self.per_minute) - self._level
+        return max(0.0, missing * 60 / self.per_minute)
+
+    def take(self, amount: float) -> None:
+        self._level -= min(amount, self.per_minute)
+
+
+@dataclass
+class _Waiter:
+    wake: Callable[[], None]
+    granted: bool = False
+
+
+@dataclass
+class LimiterStats:
+    admitted: int = 0
+    rejected: int = 0
+    queued_seconds: float = 0.0
+
+
+@dataclass
+class ProviderLimiter:
+    """Admission control for one upstream provider, shared by sync and async callers.
+
+    A request needs an in-flight slot (handed out FIFO) and then one request
+    plus its estimated tokens from the per-minute buckets. Whatever it waits
+    for, it gives up after ``queue_timeout_seconds`` with ProviderBusyError,
+    so bursts queue briefly and then shed instead of piling into upstream 429s.
+    A limit of 0 disables that limit.
+    """
+
+    name: str
+    max_in_flight: int = 0
+    requests_per_minute: float = 0
+    tokens_per_minute: float = 0
+    queue_timeout_seconds: float = 30.0
+    stats: LimiterStats = field(default_factory=LimiterStats)
+    _in_flight: int = field(default=0, init=False, repr=False)
+    _waiters: deque[_Waiter] = field(default_factory=deque, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _requests: TokenBucket | None = field(default=None, init=False, repr=False)
+    _tokens: TokenBucket | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.requests_per_minute > 0:
+            self._requests = TokenBucket(self.requests_per_minute)
+        if self.tokens_per_minute > 0:
+            self._tokens = TokenBucket(self.tokens_per_minute)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @contextmanager
+    def limit(self, tokens: int) -> Iterator[None]:
+        start = time.monotonic()
+        deadline = start + self.queue_timeout_seconds
+        self._acquire_slot(deadline)
+        try:
+            while (wait := self._reserve_budget(tokens)) > 0:
+                if time.monotonic() + wait > deadline:
+                    raise self._busy(wait)
+                time.sleep(wait)
+            self._admitted(start)
+            yield
+        finally:
+            self._release_slot()
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int) -> AsyncIterator[None]:
+        start = time.monotonic()
+        deadline = start + self.queue_timeout_seconds
+        await self._aacquire_slot(deadline)
+        try:
+            while (wait := self._reserve_budget(tokens)) > 0:
+                if time.monotonic() + wait > deadline:
+                    raise self._busy(wait)
+                await asyncio.sleep(wait)
+            self._admitted(start)
+            yield
+        finally:
+            self._release_slot()
+
+    def _admitted(self, start: float) -> None:
+        self.stats.admitted += 1
+        self.stats.queued_seconds += time.monotonic() - start
+
+    def _reserve_budget(self, tokens: int) -> float:
+        """Take one request and ``tokens`` from the buckets, or return how long to wait for both."""
+        with self._lock:
+            needs = [(bucket, amount) for bucket, amount in ((self._requests, 1), (self._tokens, tokens)) if bucket]
+            wait = max((bucket.wait_for(amount) for bucket, amount in needs), default=0.0)
+            if wait == 0:
+                for bucket, amount in needs:
+                    bucket.take(amount)
+            return wait
+
+    def _acquire_slot(self, deadline: float) -> None:
+        with self._lock:
+            if self._try_take_slot():
+                return
+            event = threading.Event()
+            waiter = _Waiter(wake=event.set)
+            self._waiters.append(waiter)
+
+        event.wait(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            if waiter.granted:
+                return
+            self._waiters.remove(waiter)
+        raise self._busy(self.queue_timeout_seconds)
+
+    async def _aacquire_slot(self, deadline: float) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_take_slot():
+                return
+            future: asyncio.Future[None] = loop.create_future()
+            waiter = _Waiter(wake=lambda: loop.call_soon_threadsafe(_resolve, future))
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(future, timeout=max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if isinstance(error, asyncio.CancelledError):
+                if granted:
+                    self._release_slot()
+                raise
+            if not granted:
+                raise self._busy(self.queue_timeout_seconds) from None
+
+    def _try_take_slot(self) -> bool:
+        if self.max_in_flight <= 0 or (self._in_flight < self.max_in_flight and not self._waiters):
+            self._in_flight += 1
+            return True
+        return False
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter so newcomers cannot barge in.
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+                return
+            self._in_flight -= 1
+
+    def _busy(self, retry_after: float) -> ProviderBusyError:
+        self.stats.rejected += 1
+        logger.warning("event=llm_provider_busy provider=%s in_flight=%s queued=%s", self.name, self._in_flight, self.queued)
+        return ProviderBusyError(self.name, retry_after)
+
+
+def _resolve(future: asyncio.Future[None]) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+@dataclass
+class ClaudeProvider:
+    """Claude text completions on a pooled async client, behind the shared provider limiter.
+
+    Calls run on the event loop, so waiting on Claude never holds one of the
+    threads that sync routes and database work share.
+    """
+
+    api_key: str = settings.claude_api_key
+    model_name: str = settings.claude_model
+    base_url: str = settings.claude_base_url
+    max_connections: int = settings.claude_max_connections
+    max_keepalive_connections: int = settings.claude_max_keepalive_connections
+    timeout_seconds: float = settings.claude_timeout_seconds
+    limiter: ProviderLimiter = field(default_factory=lambda: ProviderLimiter("claude"))
+    _client: Any = field(default=None, init=False, repr=False)
+    _http_client: Any = field(default=None, init=False, repr=False)
+    _client_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    async def acomplete(self, prompt: str, *, max_tokens: int, operation: str = "complete") -> str:
+        """Return the model's text reply; ``operation`` names the call in latency metrics."""
+        client = self._get_client()
+        with observe_llm_call("claude", operation):
+            async with self.limiter.alimit(estimate_tokens(prompt) + max_tokens):
+                try:
+                    message = await client.messages.create(
+                        model=self.model_name,
+                        max_tokens=max_tokens,
+                        messages=[{"role": "user", "content": prompt}],
+                    )
+                except Exception as error:
+                    raise ClaudeResponseError("Claude request failed") from error
+        return _message_text(message)
+
+    async def astream(self, prompt: str, *, max_tokens: int, operation: str = "stream") -> AsyncIterator[str]:
+        """Yield the reply's text deltas as Claude produces them; the provider slot is held until the stream ends."""
+        client = self._get_client()
+        with observe_llm_call("claude", operation):
+            async with self.limiter.alimit(estimate_tokens(prompt) + max_tokens):
+                try:
+                    async with client.messages.stream(
+                        model=self.model_name,
+                        max_tokens=max_tokens,
+                        messages=[{"role": "user", "content": prompt}],
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            yield text
+                except Exception as error:
+                    raise ClaudeResponseError("Claude request failed") from error
+
+    async def aclose(self) -> None:
+        with self._client_lock:
+            http_client = self._http_client
+            self._client = None
+            self._http_client = None
+        if http_client is not None:
+            await http_client.aclose()
+
+    def _get_client(self) -> Any:
+        with self._client_lock:
+            if self._client is None:
+                import httpx
+                from anthropic import AsyncAnthropic
+
+                timeout = httpx.Timeout(self.timeout_seconds, connect=min(10.0, self.timeout_seconds))
+                self._http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                    ),
+                    timeout=timeout,
+                )
+                self._client = AsyncAnthropic(
+                    api_key=self.api_key,
+                    base_url=self.base_url or None,
+                    timeout=timeout,
+                    http_client=self._http_client,
+                )
+            return self._client
+
+
+def _message_text(message: Any) -> str:
+    for block in getattr(message, "content", None) or []:
+        text = getattr(block, "text", None)
+        if text:
+            return text.strip()
+    raise ClaudeResponseError("Claude returned no text payload")
@@ -0,0 +1,321 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Metrics are module-level and label-keyed. Values owned by other objects
+(cache stats, queue depth, limiter state) are read at scrape time through
+collectors registered with ``registry.add_collector``.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from dataclasses import field
+import functools
+import inspect
+import math
+import threading
+import time
+from typing import Any
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+LabelValues = tuple[str, ...]
+
+
+@dataclass
+class MetricFamily:
+    name: str
+    kind: str
+    help: str
+    samples: list[tuple[dict[str, str], float]] = field(default_factory=list)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:  # noqa: A002 - Prometheus naming
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:  # noqa: A002
+        super().__init__(name, help, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,  # noqa: A002
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Per series: one slot per bucket (non-cumulative), then sum.
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 1))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-1] += value
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines: list[str] = []
+        for key, series in items:
+            labels = self._labels(key)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = {**labels, "le": _format_value(bound)}
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+        return lines
+
+
+@dataclass
+class MetricsRegistry:
+    _metrics: list[_Metric] = field(default_factory=list, init=False, repr=False)
+    _collectors: list[Callable[[], Iterable[MetricFamily]]] = field(default_factory=list, init=False, repr=False)
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for family in collector():
+                lines.append(f"# HELP {family.name} {family.help}")
+                lines.append(f"# TYPE {family.name} {family.kind}")
+                lines.extend(
+                    f"{family.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in family.samples
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+LLM_CALL_SECONDS = registry.register(
+    Histogram("llm_call_seconds", "Latency of LLM-backed service calls.", ("provider", "method"), LLM_BUCKETS)
+)
+LLM_CALL_ERRORS = registry.register(
+    Counter("llm_call_errors_total", "LLM-backed service calls that raised.", ("provider", "method"))
+)
+EXTRACTION_SECONDS = registry.register(
+    Histogram("extraction_seconds", "Text extraction time for uploaded files.", ("file_type", "pages"))
+)
+HTTP_REQUEST_SECONDS = registry.register(
+    Histogram("http_request_seconds", "HTTP request latency, including streamed bodies.", ("method", "route", "status"))
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "HTTP requests being served."))
+DB_QUERY_SECONDS = registry.register(
+    Histogram("db_query_seconds", "Database statement execution time per route.", ("route",))
+)
+
+_current_scope: ContextVar[dict[str, Any] | None] = ContextVar("metrics_current_scope", default=None)
+
+
+def current_route() -> str:
+    """Path template of the route handling the current request, or ``background`` outside one."""
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def page_band(pages: int | None) -> str:
+    if pages is None:
+        return "n/a"
+    for upper in (1, 10, 50, 200):
+        if pages <= upper:
+            return f"<={upper}"
+    return ">200"
+
+
+@contextmanager
+def observe_llm_call(provider: str, method: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        LLM_CALL_ERRORS.inc(provider=provider, method=method)
+        raise
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - start, provider=provider, method=method)
+
+
+def instrument_llm(provider: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Record latency and errors of a sync, async or async-generator method under its own name.
+
+    For async generators the clock runs until the stream is exhausted or closed.
+    """
+
+    def decorate(function: Callable[..., Any]) -> Callable[..., Any]:
+        method = function.__name__
+
+        if inspect.isasyncgenfunction(function):
+
+            @functools.wraps(function)
+            async def stream_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with observe_llm_call(provider, method):
+                    async for item in function(*args, **kwargs):
+                        yield item
+
+            return stream_wrapper
+
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with observe_llm_call(provider, method):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with observe_llm_call(provider, method):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def instrument_engine(engine: Any) -> None:
+    """Time every statement on ``engine`` under the route that issued it."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany) -> None:  # noqa: ANN001, ARG001
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany) -> None:  # noqa: ANN001, ARG001
+        started = conn.info.get("metrics_query_start")
+        if started:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started.pop(), route=current_route())
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request and exposing the scope to ``current_route``."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _current_scope.set(scope)
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""),
+                route=current_route(),
+                status=str(status["code"]),
+            )
+            _current_scope.reset(token)
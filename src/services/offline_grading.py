@@ -0,0 +1,170 @@
+"""Offline grading of open answers by similarity to the reference material.
+
+Used whenever Gemini cannot be asked (no API key, or the circuit is open).
+Each reference text is split into passages and turned once into a matrix of
+hashed word TF-IDF and character n-gram features, cached by content. Answers
+are then scored in one matrix product against every passage, with passages
+that match the question counting most, so a batch of answers costs a few
+NumPy operations rather than a Python loop over keywords.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+import hashlib
+import threading
+import zlib
+
+import numpy as np
+
+try:
+    from .retrieval import tokenize
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from services.retrieval import tokenize
+
+
+_CACHE_SIZE = 32
+
+
+@dataclass
+class _ReferenceMatrix:
+    passages: list[str]
+    word_idf: np.ndarray
+    char_idf: np.ndarray
+    matrix: np.ndarray
+
+
+@dataclass
+class OfflineGrader:
+    """Scores answers by weighted cosine similarity of word and character features.
+
+    Raw similarities between ``floor`` and ``ceiling`` map linearly onto 0..1.
+    """
+
+    dimensions: int = 4096
+    char_ngrams: tuple[int, int] = (3, 5)
+    word_weight: float = 0.6
+    floor: float = 0.05
+    ceiling: float = 0.55
+    _cache: OrderedDict[str, _ReferenceMatrix] = field(default_factory=OrderedDict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def grade(self, reference_text: str, questions: list[str], answers: list[str]) -> list[tuple[float, str]]:
+        """One ``(score, feedback)`` per answer, each judged against its own question."""
+        similarities = self.similarities(reference_text, questions, answers)
+        scores = np.clip((similarities - self.floor) / (self.ceiling - self.floor), 0.0, 1.0)
+        return [(float(score), _feedback(answer, float(score))) for answer, score in zip(answers, scores)]
+
+    def similarities(self, reference_text: str, questions: list[str], answers: list[str]) -> np.ndarray:
+        """Raw similarity of each answer to the passages most relevant to its question."""
+        if not answers:
+            return np.zeros(0)
+        reference = self._reference(reference_text)
+        answer_words, answer_chars = self._features(answers)
+        question_words, question_chars = self._features(questions)
+        question_vectors = self._combine(question_words, question_chars, reference)
+        # Only what the answer adds beyond restating its question earns credit.
+        answer_vectors = self._combine(
+            np.where(question_words > 0, 0, answer_words), np.where(question_chars > 0, 0, answer_chars), reference
+        )
+
+        # Relevance of each passage to each question, scaled so the best passage counts fully
+        # and squared so passages about other questions barely count.
+        relevance = question_vectors @ reference.matrix.T
+        best = relevance.max(axis=1, keepdims=True)
+        weights = np.where(best > 0, (relevance / np.where(best > 0, best, 1.0)) ** 2, 1.0)
+        similarities = (answer_vectors @ reference.matrix.T * weights).max(axis=1)
+        empty = np.array([not tokenize(answer) for answer in answers])
+        return np.where(empty, 0.0, similarities)
+
+    def _reference(self, reference_text: str) -> _ReferenceMatrix:
+        key = hashlib.sha256(reference_text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        passages = _passages(reference_text)
+        # The whole text is one more row, so answers drawing on several passages still match.
+        passages.append(reference_text)
+        words, chars = self._features(passages)
+        reference = _ReferenceMatrix(passages, _idf(words), _idf(chars), np.zeros(0))
+        reference.matrix = self._combine(words, chars, reference)
+
+        with self._lock:
+            self._cache[key] = reference
+            while len(self._cache) > _CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return reference
+
+    def _features(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        words = self._counts([self._word_features(text) for text in texts])
+        chars = self._counts([self._char_features(text) for text in texts])
+        return words, chars
+
+    def _combine(self, words: np.ndarray, chars: np.ndarray, reference: _ReferenceMatrix) -> np.ndarray:
+        # Sublinear TF times IDF, each block L2-normalized and weighted so a dot product is a blended cosine.
+        word_block = _normalize(np.log1p(words) * reference.word_idf) * np.sqrt(self.word_weight)
+        char_block = _normalize(np.log1p(chars) * reference.char_idf) * np.sqrt(1 - self.word_weight)
+        return np.hstack([word_block, char_block])
+
+    def _counts(self, features: list[list[int]]) -> np.ndarray:
+        counts = np.zeros((len(features), self.dimensions), dtype=np.float32)
+        for row, indices in enumerate(features):
+            if indices:
+                counts[row] = np.bincount(indices, minlength=self.dimensions)
+        return counts
+
+    def _word_features(self, text: str) -> list[int]:
+        return [_bucket(token, self.dimensions) for token in tokenize(text)]
+
+    def _char_features(self, text: str) -> list[int]:
+        low, high = self.char_ngrams
+        indices: list[int] = []
+        for token in tokenize(text):
+            padded = f" {token} "
+            for size in range(low, high + 1):
+                indices.extend(_bucket(padded[start : start + size], self.dimensions) for start in range(len(padded) - size + 1))
+        return indices
+
+
+def _passages(reference_text: str) -> list[str]:
+    """Non-empty lines, keeping each ``Reference explanation:`` with the question line above it."""
+    passages: list[str] = []
+    for line in (line.strip() for line in reference_text.splitlines()):
+        if not line:
+            continue
+        if line.startswith("Reference explanation:") and passages:
+            passages[-1] = f"{passages[-1]}\n{line}"
+        else:
+            passages.append(line)
+    return passages
+
+
+def _bucket(feature: str, dimensions: int) -> int:
+    # crc32 rather than hash(): stable across processes, so scores are reproducible.
+    return zlib.crc32(feature.encode("utf-8")) % dimensions
+
+
+def _idf(counts: np.ndarray) -> np.ndarray:
+    document_frequency = (counts > 0).sum(axis=0)
+    total = counts.shape[0]
+    return (np.log((1 + total) / (1 + document_frequency)) + 1).astype(np.float32)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def _feedback(answer: str, score: float) -> str:
+    if not tokenize(answer):
+        return "No answer detected. Provide a concise explanation using key concepts."
+    if score >= 0.75:
+        return "Your answer closely matches the reference material."
+    if score >= 0.35:
+        return "Your answer touches on the reference material. Improve by covering more of its key terms and ideas."
+    return "Your answer misses the core concepts from the reference material."
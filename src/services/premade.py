@@ -0,0 +1,283 @@
+"""Pre-generated flashcard decks for the fixed premade topics.
+
+Premade topics never change, so their cards are generated once rather than
+on every visit. Each topic keeps ``variants`` decks. They are persisted, held
+in memory and served at random, so repeat visits differ without costing a
+Claude call. A background warm-up fills missing variants at startup. A first
+request that arrives before its topic is warm generates one variant itself.
+Regeneration runs only when triggered manually and at most once per
+``regenerate_interval_seconds`` for each topic.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+import logging
+import random
+import time
+
+from anyio import to_thread
+from sqlalchemy import delete
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+try:
+    from ..config import settings
+    from ..database import SessionLocal
+    from ..models import PremadeDeckVariant
+    from .json_repair import salvage_items
+    from .llm import ClaudeProvider
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
+    from database import SessionLocal
+    from models import PremadeDeckVariant
+    from services.json_repair import salvage_items
+    from services.llm import ClaudeProvider
+
+
+logger = logging.getLogger(__name__)
+
+# Curriculum outlines Claude writes each premade deck from, keyed by lower-cased deck title.
+PREMADE_TOPICS = {
+    "human anatomy ii": {
+        "title": "Human Anatomy II",
+        "subject": "Medicine",
+        "description": """
+        Human Anatomy II covering:
+        - The cardiovascular system: heart chambers, valves, major vessels (aorta, vena cava, pulmonary)
+        - The respiratory system: trachea, bronchi, alveoli, gas exchange
+        - The nervous system: CNS vs PNS, neurons, synaptic transmission, reflex arcs
+        - The musculoskeletal system: major bones, joints, muscle types, tendons vs ligaments
+        - The digestive system: organs, enzymes, absorption
+        - The endocrine system: key hormones and their glands (insulin, cortisol, adrenaline, thyroxine)
+        - The renal system: nephron structure, filtration, osmoregulation
+        Focus on precise anatomical terminology and functional relationships between structures.
+        """,
+    },
+    "microbiology basic": {
+        "title": "Microbiology Basic",
+        "subject": "Biology",
+        "description": """
+        Introductory Microbiology covering:
+        - Cell types: prokaryotes vs eukaryotes, key structural differences
+        - Bacterial structure: cell wall, flagella, pili, plasmids, capsule
+        - Bacterial reproduction: binary fission, conjugation, transformation, transduction
+        - Viruses: structure, lytic vs lysogenic cycles, viral replication
+        - Fungi: hyphae, spore formation, pathogenic fungi
+        - Microbial metabolism: aerobic vs anaerobic respiration, fermentation
+        - Host-pathogen interactions: infection, colonisation, virulence factors
+        - Antibiotics: mechanisms of action (cell wall inhibition, protein synthesis inhibition, etc.)
+        - Gram staining: principle, procedure, interpretation
+        """,
+    },
+    "organic compounds": {
+        "title": "Organic Compounds",
+        "subject": "Chemistry",
+        "description": """
+        Organic Chemistry covering:
+        - Functional groups: alkanes, alkenes, alkynes, alcohols, aldehydes, ketones, carboxylic acids, amines, esters
+        - IUPAC nomenclature rules
+        - Reaction types: addition, substitution, elimination, condensation, hydrolysis
+        - Isomerism: structural isomers, stereoisomers, enantiomers, diastereomers
+        - Mechanisms: nucleophilic substitution (SN1 vs SN2), electrophilic addition
+        - Aromatic chemistry: benzene, electrophilic aromatic substitution
+        - Polymers: addition polymers, condensation polymers
+        - Organic analysis: mass spec, IR spectroscopy, NMR key concepts
+        """,
+    },
+    "calculus i": {
+        "title": "Calculus I",
+        "subject": "Mathematics",
+        "description": """
+        Calculus I covering:
+        - Limits: definition, limit laws, one-sided limits, limits at infinity
+        - Continuity: definition, types of discontinuities
+        - Derivatives: definition from first principles, differentiation rules
+        - Rules: power rule, product rule, quotient rule, chain rule
+        - Derivatives of standard functions: sin, cos, tan, exp, ln
+        - Applications: tangent lines, increasing/decreasing functions, critical points
+        - Optimisation: finding local and global maxima/minima
+        - Integration: antiderivatives, definite vs indefinite integrals
+        - Fundamental Theorem of Calculus
+        - Integration techniques: substitution, integration by parts
+        """,
+    },
+}
+
+
+class PremadeGenerationError(RuntimeError):
+    """Claude's reply contained no usable flashcards."""
+
+
+class PremadeRegenerationLimited(RuntimeError):
+    def __init__(self, topic_key: str, retry_after: float) -> None:
+        super().__init__(f"{topic_key} was regenerated recently")
+        self.topic_key = topic_key
+        self.retry_after = retry_after
+
+
+def cards_from_reply(response_text: str) -> list[dict[str, str]]:
+    """``{term, definition}`` cards from a reply, keeping every complete card of a truncated or untidy array."""
+    return [
+        {"term": str(card["term"]), "definition": str(card["definition"])}
+        for card in salvage_items(response_text)
+        if card.get("term") and card.get("definition")
+    ]
+
+
+def premade_prompt(deck_title: str, topic_description: str, max_cards: int, variant_note: str = "") -> str:
+    return f"""
+You are an expert university tutor creating high-quality exam flashcards.
+
+Topic: {deck_title}
+Curriculum content:
+{topic_description}
+
+Create exactly {max_cards} flashcards for this topic.{variant_note}
+
+Requirements:
+- Cover a broad range of concepts across the whole topic
+- Each 'term' should be a specific concept, process, structure, or definition (2-6 words)
+- Each 'definition' should be a clear, precise, student-friendly explanation (1-3 sentences)
+- Include a mix of: key definitions, mechanisms/processes, comparisons, and clinical/applied facts
+- Do NOT repeat similar cards
+
+Return ONLY a valid JSON array. No markdown, no prose, no code fences.
+Each object must have exactly two keys: "term" and "definition".
+
+Example format:
+[{{"term": "Mitosis", "definition": "Cell division producing two genetically identical daughter cells. Occurs in 4 stages: prophase, metaphase, anaphase, telophase."}}]
+"""
+
+
+@dataclass
+class PremadeDeckStore:
+    claude: ClaudeProvider
+    variants: int = settings.premade_variants
+    cards_per_deck: int = settings.premade_cards_per_deck
+    regenerate_interval_seconds: float = settings.premade_regenerate_interval_seconds
+    session_factory: Callable[[], Session] = SessionLocal
+    _decks: dict[str, list[list[dict[str, str]]]] = field(default_factory=dict, init=False, repr=False)
+    _topic_locks: dict[str, asyncio.Lock] = field(default_factory=dict, init=False, repr=False)
+    _last_regenerated: dict[str, float] = field(default_factory=dict, init=False, repr=False)
+    _warmup: asyncio.Task | None = field(default=None, init=False, repr=False)
+
+    async def deck(self, topic_key: str) -> list[dict[str, str]]:
+        """A stored variant for ``topic_key``, generating the first one if the topic is still cold."""
+        decks = self._decks.get(topic_key)
+        if not decks:
+            async with self._topic_lock(topic_key):
+                decks = await self._load(topic_key)
+                if not decks:
+                    await self._generate_variant(topic_key, 0)
+                    decks = self._decks[topic_key]
+        return random.choice(decks)
+
+    def start_warmup(self) -> None:
+        """Fill every topic's variants in the background; call from the event loop."""
+        if not self.claude.api_key:
+            logger.info("event=premade_warmup_skipped reason=no_api_key")
+            return
+        if self._warmup is None or self._warmup.done():
+            self._warmup = asyncio.get_running_loop().create_task(self.warm())
+
+    async def warm(self) -> None:
+        for topic_key in PREMADE_TOPICS:
+            try:
+                async with self._topic_lock(topic_key):
+                    stored = len(await self._load(topic_key))
+                    for variant in range(stored, self.variants):
+                        await self._generate_variant(topic_key, variant)
+            except Exception:
+                # One failing topic must not keep the others cold; the next request retries it.
+                logger.exception("event=premade_warmup_failed topic=%s", topic_key)
+        logger.info("event=premade_warmup_done topics=%s", len(PREMADE_TOPICS))
+
+    async def regenerate(self, topic_key: str) -> int:
+        """Replace every variant of a topic; raises PremadeRegenerationLimited if it ran too recently."""
+        now = time.monotonic()
+        last = self._last_regenerated.get(topic_key)
+        if last is not None and now - last < self.regenerate_interval_seconds:
+            raise PremadeRegenerationLimited(topic_key, self.regenerate_interval_seconds - (now - last))
+        self._last_regenerated[topic_key] = now
+
+        try:
+            async with self._topic_lock(topic_key):
+                fresh = [await self._request_cards(topic_key, variant) for variant in range(self.variants)]
+                await to_thread.run_sync(self._replace_rows, topic_key, fresh)
+                self._decks[topic_key] = fresh
+        except Exception:
+            # A failed attempt changed nothing, so it does not use up the topic's allowance.
+            self._last_regenerated.pop(topic_key, None)
+            raise
+        logger.info("event=premade_regenerated topic=%s variants=%s", topic_key, len(fresh))
+        return len(fresh)
+
+    async def aclose(self) -> None:
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
+            try:
+                await self._warmup
+            except asyncio.CancelledError:
+                pass
+        self._warmup = None
+
+    def _topic_lock(self, topic_key: str) -> asyncio.Lock:
+        # Serializes generation per topic, so concurrent first visits share one Claude call.
+        return self._topic_locks.setdefault(topic_key, asyncio.Lock())
+
+    async def _load(self, topic_key: str) -> list[list[dict[str, str]]]:
+        decks = self._decks.get(topic_key)
+        if decks is None:
+            decks = await to_thread.run_sync(self._read_rows, topic_key)
+            self._decks[topic_key] = decks
+        return decks
+
+    async def _generate_variant(self, topic_key: str, variant: int) -> None:
+        cards = await self._request_cards(topic_key, variant)
+        await to_thread.run_sync(self._write_row, topic_key, variant, cards)
+        self._decks.setdefault(topic_key, []).append(cards)
+        logger.info("event=premade_variant_stored topic=%s variant=%s cards=%s", topic_key, variant, len(cards))
+
+    async def _request_cards(self, topic_key: str, variant: int) -> list[dict[str, str]]:
+        topic = PREMADE_TOPICS[topic_key]
+        variant_note = ""
+        if self.variants > 1:
+            variant_note = (
+                f" This is deck {variant + 1} of {self.variants} for the topic;"
+                " favour concepts the other decks are less likely to pick."
+            )
+        prompt = premade_prompt(topic["title"], topic["description"], self.cards_per_deck, variant_note)
+        response_text = await self.claude.acomplete(
+            prompt, max_tokens=3000, operation="flashcards_generate_premade"
+        )
+        cards = cards_from_reply(response_text)
+        if not cards:
+            raise PremadeGenerationError(f"No usable flashcards for {topic_key}")
+        return cards[: self.cards_per_deck]
+
+    def _read_rows(self, topic_key: str) -> list[list[dict[str, str]]]:
+        with self.session_factory() as db:
+            rows = db.scalars(
+                select(PremadeDeckVariant.cards_json)
+                .where(PremadeDeckVariant.topic_key == topic_key)
+                .order_by(PremadeDeckVariant.variant)
+            ).all()
+        return [list(cards) for cards in rows]
+
+    def _write_row(self, topic_key: str, variant: int, cards: list[dict[str, str]]) -> None:
+        with self.session_factory() as db:
+            db.add(PremadeDeckVariant(topic_key=topic_key, variant=variant, cards_json=cards))
+            db.commit()
+
+    def _replace_rows(self, topic_key: str, decks: list[list[dict[str, str]]]) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(PremadeDeckVariant).where(PremadeDeckVariant.topic_key == topic_key))
+            db.add_all(
+                PremadeDeckVariant(topic_key=topic_key, variant=variant, cards_json=cards)
+                for variant, cards in enumerate(decks)
+            )
+            db.commit()
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+try:
+    from ..config import settings
+    from ..models import Question
+    from ..models import Quiz
+    from ..models import QuizReference
+    from ..models import QuizSourceChunk
+    from .cache import fingerprint
+    from .retrieval import BM25Index
+    from .retrieval import select_passages
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
+    from models import Question
+    from models import Quiz
+    from models import QuizReference
+    from models import QuizSourceChunk
+    from services.cache import fingerprint
+    from services.retrieval import BM25Index
+    from services.retrieval import select_passages
+
+
+_INDEX_CACHE_SIZE = 64
+_index_cache: OrderedDict[str, BM25Index] = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def _reference_header(quiz: Quiz) -> str:
+    chunks: list[str] = []
+    if quiz.title:
+        chunks.append(f"Quiz title: {quiz.title}")
+    if quiz.subject:
+        chunks.append(f"Subject: {quiz.subject}")
+    if quiz.description:
+        chunks.append(f"Description: {quiz.description}")
+    return "\n".join(chunks)
+
+
+def _question_passage(question: Question) -> str:
+    explanation = (question.explanation_json or {}).get("text") if isinstance(question.explanation_json, dict) else None
+    if explanation:
+        return f"Q: {question.question_text}\nReference explanation: {explanation}"
+    return f"Q: {question.question_text}"
+
+
+def refresh_reference(db: Session, quiz_id: int) -> QuizReference:
+    """Rebuild a quiz's reference row from its current questions and source passages.
+
+    Call it in the same transaction as any change to the quiz header, its
+    questions or its source; the caller commits.
+    """
+    db.flush()
+    quiz = db.get(Quiz, quiz_id)
+    if quiz is None:
+        raise ValueError(f"Quiz {quiz_id} does not exist")
+
+    questions = db.scalars(select(Question).where(Question.quiz_id == quiz_id).order_by(Question.id.asc())).all()
+    chunks = db.scalars(
+        select(QuizSourceChunk.text).where(QuizSourceChunk.quiz_id == quiz_id).order_by(QuizSourceChunk.position.asc())
+    ).all()
+    header = _reference_header(quiz)
+    # Retrievable units: each question with its explanation, then the stored source passages.
+    passages = [_question_passage(question) for question in questions] + list(chunks)
+    content_hash = fingerprint(header, passages)
+
+    reference = db.get(QuizReference, quiz_id)
+    if reference is None:
+        reference = QuizReference(quiz_id=quiz_id, version=1)
+        db.add(reference)
+    elif reference.content_hash != content_hash:
+        reference.version += 1
+    reference.content_hash = content_hash
+    reference.header_text = header
+    reference.passages_json = passages
+    return reference
+
+
+def load_reference(db: Session, quiz_id: int) -> QuizReference:
+    """Read the materialized reference, building it once for quizzes that predate it.
+
+    A newly built reference is only flushed; it is saved with the caller's commit.
+    """
+    reference = db.get(QuizReference, quiz_id)
+    if reference is None:
+        reference = refresh_reference(db, quiz_id)
+    return reference
+
+
+def _passage_index(reference: QuizReference) -> BM25Index:
+    # Keyed by content rather than (quiz_id, version): SQLite may reuse the id of a deleted quiz.
+    key = reference.content_hash
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+
+    index = BM25Index(list(reference.passages_json or []))
+    with _index_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def build_grading_context(db: Session, quiz_id: int, query: str, *, token_budget: int | None = None) -> str:
+    """Reference text for grading: the quiz header plus the passages that best match ``query``."""
+    budget = settings.grading_context_tokens if token_budget is None else token_budget
+    reference = load_reference(db, quiz_id)
+    index = _passage_index(reference)
+    chunks = [reference.header_text] if reference.header_text else []
+    chunks.extend(select_passages(index.passages, query, budget, index=index))
+    return "\n".join(chunks)
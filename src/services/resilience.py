@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+from enum import Enum
+import logging
+import random
+import threading
+import time
+from typing import TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitState(str, Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+@dataclass
+class CircuitBreaker:
+    """Stop calling an upstream that keeps failing, then let a single probe test it again.
+
+    Opens after ``failure_threshold`` consecutive transient failures. Once
+    ``reset_timeout_seconds`` have passed it turns half-open and admits one
+    probe: success closes it, failure re-opens it.
+    """
+
+    failure_threshold: int = 5
+    reset_timeout_seconds: float = 30.0
+    clock: Callable[[], float] = time.monotonic
+    _state: CircuitState = field(default=CircuitState.closed, init=False, repr=False)
+    _failures: int = field(default=0, init=False, repr=False)
+    _opened_at: float = field(default=0.0, init=False, repr=False)
+    _probe_in_flight: bool = field(default=False, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def rejecting(self) -> bool:
+        """True while a call would be refused, so callers can degrade without trying."""
+        with self._lock:
+            state = self._current_state()
+            return state is CircuitState.open or (state is CircuitState.half_open and self._probe_in_flight)
+
+    def acquire(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state is CircuitState.closed:
+                return True
+            if state is CircuitState.half_open and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state is not CircuitState.closed:
+                logger.info("event=circuit_closed")
+            self._state = CircuitState.closed
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state is CircuitState.half_open or self._failures >= self.failure_threshold:
+                self._state = CircuitState.open
+                self._opened_at = self.clock()
+                self._probe_in_flight = False
+                logger.warning("event=circuit_open failures=%s", self._failures)
+
+    def release(self) -> None:
+        """Give back a half-open probe slot whose call ended without a verdict (e.g. cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _current_state(self) -> CircuitState:
+        if self._state is CircuitState.open and self.clock() - self._opened_at >= self.reset_timeout_seconds:
+            self._state = CircuitState.half_open
+            self._probe_in_flight = False
+        return self._state
+
+
+@dataclass
+class LatencyTracker:
+    """Sliding window of recent successful call latencies."""
+
+    window: int = 200
+    min_samples: int = 20
+    _samples: deque[float] = field(default_factory=deque, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            while len(self._samples) > self.window:
+                self._samples.popleft()
+
+    def percentile(self, fraction: float) -> float | None:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+@dataclass
+class ResilienceStats:
+    calls: int = 0
+    retries: int = 0
+    rejected: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+
+
+@dataclass
+class ResilientCaller:
+    """Retry, hedge and circuit-break calls to one upstream.
+
+    ``is_retryable`` decides which exceptions are transient: those are retried
+    with full-jitter exponential backoff and count against the breaker. Any
+    other exception is raised at once and counts as the upstream being healthy.
+    Per-call deadlines belong to the wrapped call itself, so a timeout should
+    surface as a retryable exception. Hedging is async-only: once an attempt
+    has outlived the observed ``hedge_percentile`` latency, a duplicate is sent
+    and whichever answers first wins.
+    """
+
+    max_attempts: int = 3
+    base_delay_seconds: float = 0.5
+    max_delay_seconds: float = 8.0
+    hedge: bool = False
+    hedge_percentile: float = 0.95
+    is_retryable: Callable[[BaseException], bool] = lambda error: False
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    latency: LatencyTracker = field(default_factory=LatencyTracker)
+    stats: ResilienceStats = field(default_factory=ResilienceStats)
+
+    def call(self, send: Callable[[], T]) -> T:
+        self.stats.calls += 1
+        attempt = 0
+        while True:
+            self._acquire()
+            start = time.perf_counter()
+            try:
+                result = send()
+            except Exception as error:
+                if not self._settle_failure(error, attempt):
+                    raise
+                attempt += 1
+                time.sleep(self.backoff(attempt))
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self._settle_success(time.perf_counter() - start)
+            return result
+
+    async def acall(self, send: Callable[[], Awaitable[T]]) -> T:
+        self.stats.calls += 1
+        attempt = 0
+        while True:
+            self._acquire()
+            start = time.perf_counter()
+            try:
+                result = await (self._hedged(send) if self.hedge else send())
+            except Exception as error:
+                if not self._settle_failure(error, attempt):
+                    raise
+                attempt += 1
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self._settle_success(time.perf_counter() - start)
+            return result
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay_seconds, self.base_delay_seconds * 2 ** (attempt - 1)))
+
+    def _acquire(self) -> None:
+        if not self.breaker.acquire():
+            self.stats.rejected += 1
+            raise CircuitOpenError("Circuit is open")
+
+    def _settle_success(self, elapsed: float) -> None:
+        self.breaker.record_success()
+        self.latency.observe(elapsed)
+
+    def _settle_failure(self, error: Exception, attempt: int) -> bool:
+        """Record the failure; return True when the call should be retried."""
+        if not self.is_retryable(error):
+            self.breaker.record_success()
+            return False
+
+        self.breaker.record_failure()
+        if attempt + 1 >= self.max_attempts or self.breaker.rejecting:
+            return False
+        self.stats.retries += 1
+        logger.info("event=upstream_retry attempt=%s error=%s", attempt + 1, type(error).__name__)
+        return True
+
+    async def _hedged(self, send: Callable[[], Awaitable[T]]) -> T:
+        delay = self.latency.percentile(self.hedge_percentile)
+        if delay is None:
+            return await send()
+
+        primary = asyncio.ensure_future(send())
+        pending: set[asyncio.Future[T]] = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.stats.hedges += 1
+            hedge = asyncio.ensure_future(send())
+            pending.add(hedge)
+            errors: list[BaseException] = []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is hedge:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    errors.append(error)
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+import math
+import re
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when which who why with".split()
+)
+# Rough chars-per-token ratio for English prose; good enough for prompt budgeting.
+CHARS_PER_TOKEN = 4
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+@dataclass
+class BM25Index:
+    """Okapi BM25 over a fixed list of passages."""
+
+    passages: list[str]
+    k1: float = 1.5
+    b: float = 0.75
+    _terms: list[Counter[str]] = field(default_factory=list, init=False, repr=False)
+    _lengths: list[int] = field(default_factory=list, init=False, repr=False)
+    _document_frequency: Counter[str] = field(default_factory=Counter, init=False, repr=False)
+    _average_length: float = field(default=0.0, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        for passage in self.passages:
+            terms = Counter(tokenize(passage))
+            self._terms.append(terms)
+            self._lengths.append(sum(terms.values()))
+            self._document_frequency.update(terms.keys())
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    def scores(self, query: str) -> list[float]:
+        total = len(self.passages)
+        query_terms = set(tokenize(query))
+        results: list[float] = []
+        for terms, length in zip(self._terms, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self._average_length or 1.0))
+            for term in query_terms:
+                frequency = terms.get(term)
+                if not frequency:
+                    continue
+                df = self._document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                score += idf * frequency * (self.k1 + 1) / (frequency + norm)
+            results.append(score)
+        return results
+
+
+def select_passages(
+    passages: list[str],
+    query: str,
+    token_budget: int,
+    *,
+    index: BM25Index | None = None,
+) -> list[str]:
+    """Return the passages most relevant to ``query`` that fit in ``token_budget``, in source order.
+
+    Passages are taken greedily by BM25 score; ones that no longer fit are
+    skipped in favour of smaller, lower-ranked ones. Passages sharing no terms
+    with the query are left out, unless nothing matches at all, in which case
+    the ranking degrades to source order. Pass a prebuilt ``index`` over the
+    same passages to skip re-tokenizing them.
+    """
+    if not passages or token_budget <= 0:
+        return []
+
+    scores = (index or BM25Index(passages)).scores(query)
+    ranked = sorted(range(len(passages)), key=lambda position: (-scores[position], position))
+    if scores[ranked[0]] > 0:
+        ranked = [position for position in ranked if scores[position] > 0]
+
+    chosen: list[int] = []
+    remaining = token_budget
+    for position in ranked:
+        cost = estimate_tokens(passages[position])
+        if cost <= remaining:
+            chosen.append(position)
+            remaining -= cost
+
+    if not chosen:
+        # Even the best passage is over budget: keep its head rather than nothing.
+        return [passages[ranked[0]][: token_budget * CHARS_PER_TOKEN]]
+    return [passages[position] for position in sorted(chosen)]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from dataclasses import field
+import logging
+import threading
+from typing import Any
+from typing import TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    leaders: int = 0
+    coalesced: int = 0
+
+
+@dataclass
+class SingleFlight:
+    """Collapse concurrent identical calls into one upstream call.
+
+    The first caller for a key runs the call; callers that arrive while it is in
+    flight wait on the same result, and an exception is re-raised to every one
+    of them. Nothing is cached once the call settles. ``do`` serves threads,
+    ``ado`` serves coroutines; the two never share calls.
+    """
+
+    stats: SingleFlightStats = field(default_factory=SingleFlightStats)
+    _calls: dict[str, Future[Any]] = field(default_factory=dict, init=False, repr=False)
+    _tasks: dict[str, asyncio.Task[Any]] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def do(self, key: str, call: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.stats.leaders += 1
+            else:
+                self.stats.coalesced += 1
+
+        if not leader:
+            logger.info("event=llm_call_coalesced key=%s", key[:12])
+            return future.result()
+
+        try:
+            result = call()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def ado(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and task.get_loop() is loop and not task.done():
+                self.stats.coalesced += 1
+                leader = False
+            else:
+                task = loop.create_task(call())
+                task.add_done_callback(lambda finished: self._forget(key, finished))
+                self._tasks[key] = task
+                self.stats.leaders += 1
+                leader = True
+
+        if not leader:
+            logger.info("event=llm_call_coalesced key=%s", key[:12])
+        # Shield the shared call so one waiter disconnecting does not cancel it for the others.
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task[Any]) -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter has gone away.
+            task.exception()
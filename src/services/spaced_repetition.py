@@ -0,0 +1,161 @@
+"""SM-2 scheduling of flashcards and an in-memory queue of due cards.
+
+Each rating moves a card's ease and interval by the SM-2 rules and sets its
+next due time. The schedules table has a ``(user_id, due_at)`` index for
+loading and bulk recomputation. "Which cards are due next" is served from a
+per-user min-heap over ``(due_at, card_id)``. The heap is loaded in due order
+from that index, so the loaded list already satisfies the heap invariant.
+Updated schedules push a new entry and leave the old one to be skipped lazily.
+A query for N cards visits about N heap nodes rather than every card.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from datetime import timedelta
+import heapq
+import threading
+
+from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+try:
+    from ..config import settings
+    from ..models import FlashcardSchedule
+    from ..models import User
+except ImportError:  # pragma: no cover - allows top-level module imports
+    from config import settings
+    from models import FlashcardSchedule
+    from models import User
+
+
+# SM-2 answer quality (0-5) for each rating; below 3 counts as a lapse.
+RATING_QUALITY = {"easy": 5, "hard": 3, "missed": 1}
+MIN_EASE = 1.3
+_HEAP_CACHE_SIZE = 256
+
+_heaps: OrderedDict[tuple[int, datetime], "DueHeap"] = OrderedDict()
+_heaps_lock = threading.Lock()
+
+
+def sm2(ease: float, interval_days: int, repetitions: int, quality: int) -> tuple[float, int, int]:
+    """Next ``(ease, interval_days, repetitions)`` after a review of the given quality."""
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        return ease, 1, 0
+    if repetitions == 0:
+        interval_days = 1
+    elif repetitions == 1:
+        interval_days = 6
+    else:
+        interval_days = round(interval_days * ease)
+    return ease, min(interval_days, settings.flashcard_max_interval_days), repetitions + 1
+
+
+def review_card(schedule: FlashcardSchedule, rating: str, now: datetime) -> None:
+    schedule.ease, schedule.interval_days, schedule.repetitions = sm2(
+        schedule.ease, schedule.interval_days, schedule.repetitions, RATING_QUALITY[rating]
+    )
+    schedule.last_reviewed_at = now
+    schedule.due_at = now + timedelta(days=schedule.interval_days)
+
+
+@dataclass
+class DueHeap:
+    """Min-heap of ``(due_at, card_id)``; entries whose card has since moved are stale and skipped."""
+
+    _heap: list[tuple[datetime, int]] = field(default_factory=list, repr=False)
+    _due: dict[int, datetime] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def push(self, card_id: int, due_at: datetime) -> None:
+        with self._lock:
+            if self._due.get(card_id) == due_at:
+                return
+            self._due[card_id] = due_at
+            heapq.heappush(self._heap, (due_at, card_id))
+            if len(self._heap) > 2 * len(self._due) + 64:
+                self._heap = [(due, card) for card, due in self._due.items()]
+                heapq.heapify(self._heap)
+
+    def next_due(self, limit: int, now: datetime) -> list[tuple[int, datetime]]:
+        """Up to ``limit`` cards due by ``now``, most overdue first, without popping them."""
+        found: list[tuple[int, datetime]] = []
+        with self._lock:
+            heap = self._heap
+            # Best-first walk of the heap's tree: a node's children are looked at only once it is reached.
+            frontier = [(heap[0], 0)] if heap else []
+            while frontier and len(found) < limit:
+                (due_at, card_id), index = heapq.heappop(frontier)
+                if due_at > now:
+                    break
+                if self._due.get(card_id) == due_at:
+                    found.append((card_id, due_at))
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child], child))
+        return found
+
+
+def due_heap(db: Session, user: User) -> DueHeap:
+    key = (user.id, user.created_at)
+    with _heaps_lock:
+        heap = _heaps.get(key)
+        if heap is not None:
+            _heaps.move_to_end(key)
+            return heap
+
+    rows = db.execute(
+        select(FlashcardSchedule.due_at, FlashcardSchedule.card_id)
+        .where(FlashcardSchedule.user_id == user.id)
+        .order_by(FlashcardSchedule.due_at, FlashcardSchedule.card_id)
+    ).all()
+    heap = DueHeap([(due_at, card_id) for due_at, card_id in rows], {card_id: due_at for due_at, card_id in rows})
+
+    with _heaps_lock:
+        heap = _heaps.setdefault(key, heap)
+        while len(_heaps) > _HEAP_CACHE_SIZE:
+            _heaps.popitem(last=False)
+    return heap
+
+
+def reset_due_heap(user: User) -> None:
+    with _heaps_lock:
+        _heaps.pop((user.id, user.created_at), None)
+
+
+def reschedule_all(db: Session, user: User) -> int:
+    """Recompute every reviewed card's interval and due time from its last review, in one batch.
+
+    Meant for the nightly job: intervals are clamped to the current
+    ``FLASHCARD_MAX_INTERVAL_DAYS`` and due times are derived again from the
+    stored review history. The user's heap is dropped and rebuilt on next use.
+    """
+    rows = db.execute(
+        select(FlashcardSchedule.card_id, FlashcardSchedule.interval_days, FlashcardSchedule.last_reviewed_at).where(
+            FlashcardSchedule.user_id == user.id, FlashcardSchedule.last_reviewed_at.is_not(None)
+        )
+    ).all()
+    changes = []
+    for card_id, interval_days, last_reviewed_at in rows:
+        interval_days = min(interval_days, settings.flashcard_max_interval_days)
+        changes.append(
+            {
+                "card_id": card_id,
+                "interval_days": interval_days,
+                "due_at": last_reviewed_at + timedelta(days=interval_days),
+            }
+        )
+    if changes:
+        # Bulk UPDATE by primary key: one executemany, no ORM objects loaded.
+        db.execute(update(FlashcardSchedule), changes)
+    db.commit()
+    reset_due_heap(user)
+    return len(changes)
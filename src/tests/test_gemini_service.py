@@ -0,0 +1,604 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+import json
+import threading
+import time
+
+import pytest
+
+from src.benchmarks.llm_stub import running_stub
+from src.database import Base
+from src.database import engine
+from src.services.cache import ResultCache
+from src.models import QuestionType
+from src.services.dedupe import QuestionIndex
+from src.services.dedupe import question_shingles
+from src.services.extract import chunk_text
+from src.services.gemini import GeminiResponseError
+from src.services.gemini import GeminiService
+from src.services.gemini import GeminiTransientError
+from src.services.gemini import OpenAnswer
+from src.services.json_repair import loads_tolerant
+from src.services.json_repair import salvage_items
+from src.services.grading import GradingService
+from src.services.llm import ClaudeProvider
+from src.services.llm import ProviderBusyError
+from src.services.llm import ProviderLimiter
+from src.services.llm import TokenBucket
+from src.services.resilience import CircuitBreaker
+from src.services.resilience import CircuitState
+from src.services.resilience import LatencyTracker
+from src.services.resilience import ResilientCaller
+from src.services.retrieval import select_passages
+from src.services.singleflight import SingleFlight
+from src.services.spaced_repetition import DueHeap
+from src.services.spaced_repetition import sm2
+
+
+@pytest.fixture
+def reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+def _cache(namespace: str, **overrides) -> ResultCache:
+    options = {'ttl_seconds': 3600, 'max_entries': 10, 'memory_entries': 4}
+    options.update(overrides)
+    return ResultCache(namespace=namespace, **options)
+
+
+def test_gemini_client_is_pooled_and_rebuilt_after_close():
+    with running_stub() as stub:
+        service = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url)
+
+        first = service.grade_open_answer(reference_text='Cells.', question_text='What is a cell?', user_answer='A unit.')
+        client = service._client
+        second = service.grade_open_answer(reference_text='Cells.', question_text='What is a cell?', user_answer='A unit.')
+
+        assert first == second == (0.75, 'Stub feedback.', 'gemini')
+        assert client is not None
+        assert service._client is client
+
+        async_http_client = service._async_http_client
+        service.close()
+        assert service._client is None
+        # The async pool is left for aclose() and reused rather than leaked.
+        assert service._async_http_client is async_http_client
+
+        service.grade_open_answer(reference_text='Cells.', question_text='What is a cell?', user_answer='A unit.')
+        assert service._client is not None
+        assert service._client is not client
+        assert service._async_http_client is async_http_client
+        asyncio.run(service.aclose())
+        assert async_http_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_async_api_shares_the_pooled_client():
+    with running_stub() as stub:
+        service = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url)
+
+        questions, _ = await service.agenerate_questions(
+            source_text='Cells are the basic unit of life.',
+            title='Cells',
+            mcq_count=1,
+            open_count=0,
+            difficulty='intermediate',
+        )
+        grade = await service.agrade_open_answer(
+            reference_text='Cells.', question_text='What is a cell?', user_answer='A unit.'
+        )
+        summary = await service.asummarize_video('A lecture about cells.')
+
+        assert [question.correct_option for question in questions] == ['A']
+        assert grade == (0.75, 'Stub feedback.', 'gemini')
+        assert summary.summary == 'Stub summary.'
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_streamed_generation_yields_questions_from_partial_chunks(reset_db):
+    cache = _cache('generation')
+    kwargs = {
+        'source_text': 'Cells are the basic unit of life.',
+        'title': 'Cells',
+        'mcq_count': 1,
+        'open_count': 0,
+        'difficulty': 'intermediate',
+    }
+    with running_stub(stream_chunk_chars=7) as stub:
+        service = GeminiService(
+            api_key='test-key', model_name='stub-model', base_url=stub.base_url, generation_cache=cache
+        )
+        streamed = [question async for question in service.astream_questions(**kwargs)]
+        replayed = [question async for question in service.astream_questions(**kwargs)]
+        await service.aclose()
+
+    assert [question.question_text for question in streamed] == ['Which structure is the basic unit of life?']
+    assert replayed == streamed
+    assert stub.request_count == 1
+
+
+def test_repeat_generation_is_served_from_cache(reset_db):
+    cache = _cache('generation')
+    kwargs = {
+        'source_text': 'Cells are the basic unit of life.',
+        'title': 'Cells',
+        'mcq_count': 1,
+        'open_count': 0,
+        'difficulty': 'intermediate',
+    }
+    with running_stub() as stub:
+        service = GeminiService(
+            api_key='test-key', model_name='stub-model', base_url=stub.base_url, generation_cache=cache
+        )
+        first, _ = service.generate_questions(**kwargs)
+        second, _ = service.generate_questions(**kwargs)
+        assert stub.request_count == 1
+
+        cache.clear_memory()
+        third, _ = service.generate_questions(**{**kwargs, 'title': 'Renamed quiz'})
+        assert stub.request_count == 1
+
+        service.generate_questions(**{**kwargs, 'difficulty': 'advanced'})
+        assert stub.request_count == 2
+        service.close()
+
+    assert first == second == third
+    assert (cache.stats.memory_hits, cache.stats.db_hits, cache.stats.misses) == (1, 1, 2)
+
+    # Without a key (or with the circuit open) cached model output still beats the keyword fallback.
+    offline = GeminiService(api_key='', model_name='stub-model', generation_cache=cache)
+    assert offline.generate_questions(**kwargs)[0] == first
+
+
+def test_result_cache_evicts_least_recently_used_rows(reset_db):
+    cache = _cache('eviction', max_entries=2, memory_entries=0)
+    cache.set('a', [1])
+    cache.set('b', [2])
+    assert cache.get('a') == [1]
+    cache.set('c', [3])
+
+    assert cache.get('b') is None
+    assert cache.get('a') == [1]
+    assert cache.get('c') == [3]
+    assert cache.stats.evictions == 1
+
+
+def test_unchanged_open_answer_is_graded_from_cache(reset_db):
+    grade_kwargs = {
+        'question_id': 7,
+        'question_type': QuestionType.open,
+        'question_text': 'What is a cell?',
+        'correct_option': None,
+        'explanation': '',
+        'reference_text': 'Cells are the basic unit of life.',
+    }
+    with running_stub() as stub:
+        gemini = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url)
+        grading = GradingService(
+            gemini_service=gemini, grading_cache=_cache('grading'), local_accept_score=2.0, local_reject_score=-1.0
+        )
+
+        first = grading.grade_answer(user_answer='The basic  unit of life.', **grade_kwargs)
+        resaved = grading.grade_answer(user_answer='the basic unit of LIFE.', **grade_kwargs)
+        edited = grading.grade_answer(user_answer='A building block.', **grade_kwargs)
+        gemini.close()
+
+    assert first == (0.75, 'Stub feedback.', 'gemini')
+    assert resaved == (0.75, 'Stub feedback.', 'cache')
+    assert edited[2] == 'gemini'
+    assert stub.request_count == 2
+
+
+@pytest.mark.asyncio
+async def test_chunked_generation_spreads_counts_and_dedupes():
+    sections = [f'# Section {index}\n' + 'Cells divide and grow. ' * 40 for index in range(3)]
+    chunks = chunk_text('\n\n'.join(sections), 1000)
+    assert len(chunks) == 3
+
+    with running_stub() as stub:
+        service = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url)
+        assert [plan[1:] for plan in service._plan_chunks(chunks, 4, 1)] == [(2, 0), (1, 1), (1, 0)]
+
+        questions, _ = await service.agenerate_questions_chunked(
+            chunks=chunks, title='Cells', mcq_count=4, open_count=1, difficulty='intermediate', concurrency=2
+        )
+        streamed = [
+            question
+            async for question in service.astream_questions_chunked(
+                chunks=chunks, title='Cells', mcq_count=4, open_count=1, difficulty='intermediate', concurrency=2
+            )
+        ]
+        await service.aclose()
+
+    # Every chunk was generated, and the stub's identical answers collapse to one question.
+    assert stub.request_count == 6
+    assert len(questions) == len(streamed) == 1
+
+
+def test_chunk_plan_covers_every_chunk_when_chunks_outnumber_questions():
+    chunks = [f'Chunk {index}. ' + 'Cells divide and grow. ' * 4 for index in range(25)]
+    plan = GeminiService(api_key='')._plan_chunks(chunks, 5, 2)
+
+    # 25 chunks, 7 questions: adjacent chunks are merged so every one is sent, each part gets a question.
+    assert len(plan) == 7
+    assert [chunk for text, _, _ in plan for chunk in text.split('\n\n')] == chunks
+    assert all(mcq + open_ == 1 for _, mcq, open_ in plan)
+    # Open questions are spread through the document, not left to the final chunks.
+    assert [index for index, (_, _, open_) in enumerate(plan) if open_] == [1, 5]
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_upstream_request():
+    with running_stub(latency_ms=100) as stub:
+        service = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url)
+        grades = await asyncio.gather(
+            *(
+                service.agrade_open_answer(reference_text='Cells.', question_text='What is a cell?', user_answer='A unit.')
+                for _ in range(5)
+            )
+        )
+        await service.aclose()
+
+    assert set(grades) == {(0.75, 'Stub feedback.', 'gemini')}
+    assert stub.request_count == 1
+    assert (service.single_flight.stats.leaders, service.single_flight.stats.coalesced) == (1, 4)
+
+
+def test_single_flight_propagates_errors_to_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def failing_call():
+        calls.append(1)
+        release.wait(1)
+        raise GeminiResponseError('upstream down')
+
+    errors = []
+
+    def worker():
+        try:
+            flight.do('key', failing_call)
+        except GeminiResponseError as error:
+            errors.append(str(error))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flight.stats.leaders + flight.stats.coalesced < 4:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert errors == ['upstream down'] * 4
+
+
+def _resilience(**overrides) -> ResilientCaller:
+    options = {
+        'max_attempts': 3,
+        'base_delay_seconds': 0.0,
+        'is_retryable': lambda error: isinstance(error, GeminiTransientError),
+    }
+    options.update(overrides)
+    return ResilientCaller(**options)
+
+
+def test_transient_upstream_errors_are_retried():
+    with running_stub(fail_first=2) as stub:
+        service = GeminiService(
+            api_key='test-key', model_name='stub-model', base_url=stub.base_url, resilience=_resilience()
+        )
+        grade = service.grade_open_answer(reference_text='Cells.', question_text='What is a cell?', user_answer='A unit.')
+        service.close()
+
+    assert grade == (0.75, 'Stub feedback.', 'gemini')
+    assert stub.request_count == 3
+    assert service.resilience.stats.retries == 2
+
+
+def test_open_circuit_switches_to_local_fallback():
+    with running_stub(error_rate=1.0) as stub:
+        resilience = _resilience(max_attempts=1, breaker=CircuitBreaker(failure_threshold=2, reset_timeout_seconds=60))
+        service = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url, resilience=resilience)
+        for index in range(2):
+            with pytest.raises(GeminiResponseError):
+                service.grade_open_answer(reference_text='Cells.', question_text=f'Q{index}?', user_answer='A unit.')
+
+        score, _, graded_by = service.grade_open_answer(
+            reference_text='Cells are units.', question_text='What is a cell?', user_answer='A unit.'
+        )
+        questions, _ = service.generate_questions(
+            source_text='Cells are the basic units of life.', title='Bio', mcq_count=1, open_count=0, difficulty='easy'
+        )
+        service.close()
+
+    assert resilience.breaker.state is CircuitState.open
+    assert graded_by == 'fallback'
+    assert len(questions) == 1
+    assert stub.request_count == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_attempt_is_hedged_after_observed_p95():
+    caller = ResilientCaller(hedge=True, latency=LatencyTracker(min_samples=1))
+    caller.latency.observe(0.01)
+    delays = iter([1.0, 0.0])
+
+    async def send():
+        await asyncio.sleep(next(delays))
+        return 'ok'
+
+    started = time.perf_counter()
+    assert await caller.acall(send) == 'ok'
+    assert time.perf_counter() - started < 0.5
+    assert (caller.stats.hedges, caller.stats.hedge_wins) == (1, 1)
+
+
+def test_select_passages_ranks_by_bm25_within_budget():
+    passages = [
+        'Glaciers carve valleys as ice flows downhill.',
+        'Mitochondria produce ATP during cellular respiration.',
+        'Chloroplasts capture light for photosynthesis.',
+        'Respiration in mitochondria consumes oxygen and releases carbon dioxide.',
+    ]
+
+    selected = select_passages(passages, 'How do mitochondria make ATP?', token_budget=40)
+
+    assert selected == [passages[1], passages[3]]
+    assert select_passages(passages, 'unrelated words', token_budget=12) == [passages[0]]
+
+
+@pytest.mark.asyncio
+async def test_provider_limiter_caps_in_flight_calls_and_sheds_after_queue_timeout():
+    limiter = ProviderLimiter('gemini', max_in_flight=2, queue_timeout_seconds=0.2)
+    peak = 0
+
+    async def call(duration):
+        nonlocal peak
+        async with limiter.alimit(10):
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(duration)
+        return 'ok'
+
+    results = await asyncio.gather(call(0.05), call(0.05), call(0.05), call(0.05))
+    assert results == ['ok'] * 4
+    assert peak == 2
+
+    slow = [asyncio.ensure_future(call(0.5)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    with pytest.raises(ProviderBusyError):
+        await call(0)
+    await asyncio.gather(*slow)
+    assert (limiter.stats.admitted, limiter.stats.rejected, limiter.in_flight) == (6, 1, 0)
+
+
+def test_token_bucket_paces_requests_per_minute():
+    now = [0.0]
+    bucket = TokenBucket(per_minute=60, clock=lambda: now[0])
+
+    assert bucket.wait_for(60) == 0
+    bucket.take(60)
+    assert bucket.wait_for(1) == pytest.approx(1.0)
+    now[0] += 0.5
+    assert bucket.wait_for(1) == pytest.approx(0.5)
+
+
+def test_gemini_calls_pass_through_the_provider_limiter():
+    limiter = ProviderLimiter('gemini', max_in_flight=1, requests_per_minute=600)
+    with running_stub() as stub:
+        service = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url, limiter=limiter)
+        service.grade_open_answer(reference_text='Cells.', question_text='What is a cell?', user_answer='A unit.')
+        service.close()
+
+    assert limiter.stats.admitted == 1
+    assert limiter.in_flight == 0
+
+
+def test_json_repair_closes_truncated_output_and_salvages_items():
+    assert loads_tolerant('Result:\n```json\n{"a": [1, 2,], "b": {"c": tru') == {'a': [1, 2], 'b': {}}
+    assert loads_tolerant('{"text": "cut mid-str') == {'text': 'cut mid-str'}
+    damaged = '{"questions": [{"n": 1}, {"n": 2} {"n": }]}'
+    assert salvage_items(damaged, array_key='questions') == [{'n': 1}, {'n': 2}]
+
+
+def test_salvage_drops_the_item_cut_off_inside_its_last_string():
+    cut = '[{"term": "DNA", "definition": "Genetic material"}, {"term": "ATP", "definition": "Adenosine tri'
+    assert salvage_items(cut) == [{'term': 'DNA', 'definition': 'Genetic material'}]
+    cut_envelope = '{"questions": [{"n": 1}, {"n": 2, "text": "Which organelle'
+    assert salvage_items(cut_envelope, array_key='questions') == [{'n': 1}]
+    with pytest.raises(json.JSONDecodeError):
+        loads_tolerant(cut, allow_truncated=False)
+
+
+def _question_json(index: int) -> str:
+    return json.dumps(
+        {
+            'type': 'mcq',
+            'question_text': f'Question number {index} about cells?',
+            'options': ['Cell', 'Atom', 'Organ', 'Tissue'],
+            'correct_option': 'A',
+            'explanation': 'Because.',
+        }
+    )
+
+
+def test_generation_repairs_locally_and_only_round_trips_when_short(monkeypatch):
+    service = GeminiService(api_key='test-key', model_name='stub-model')
+    truncated = '{"questions": [' + ', '.join(_question_json(index) for index in range(2)) + ', {"type": "mc'
+    replies = [truncated, '{"questions": [' + ', '.join(_question_json(index) for index in range(3)) + ']}']
+    prompts: list[str] = []
+
+    def fake_call(*, prompt, schema):
+        prompts.append(prompt)
+        return replies[len(prompts) - 1]
+
+    monkeypatch.setattr(service, '_call_gemini', fake_call)
+    questions, _ = service.generate_questions(source_text='Cells.', title='T', mcq_count=2, open_count=0, difficulty='easy')
+    assert len(questions) == 2
+    assert len(prompts) == 1
+
+    prompts.clear()
+    questions, _ = service.generate_questions(source_text='Cells!', title='T', mcq_count=3, open_count=0, difficulty='easy')
+    assert len(questions) == 3
+    assert len(prompts) == 2
+    assert prompts[1].startswith('Your previous output was invalid JSON')
+
+
+_CELL_REFERENCE = (
+    'Quiz title: Cell biology\n'
+    'Q: What do mitochondria do?\n'
+    'Reference explanation: Mitochondria produce ATP through cellular respiration, supplying energy to the cell.\n'
+    'Q: What is osmosis?\n'
+    'Reference explanation: Osmosis is the movement of water across a membrane toward higher solute concentration.'
+)
+
+
+def test_offline_grading_scores_a_batch_by_similarity_to_the_question_passages():
+    service = GeminiService(api_key='')
+    answers = [
+        OpenAnswer(question_id=1, question_text='What do mitochondria do?', user_answer='They produce ATP through cellular respiration.'),
+        OpenAnswer(question_id=2, question_text='What do mitochondria do?', user_answer='Water crosses a membrane.'),
+        OpenAnswer(question_id=3, question_text='What do mitochondria do?', user_answer='What do mitochondria do?'),
+        OpenAnswer(question_id=4, question_text='What is osmosis?', user_answer='Water moving across a membrane toward higher solute concentration.'),
+        OpenAnswer(question_id=5, question_text='What is osmosis?', user_answer='   '),
+    ]
+
+    grades = service.grade_open_answers(reference_text=_CELL_REFERENCE, answers=answers)
+
+    assert {graded_by for _, _, graded_by in grades.values()} == {'fallback'}
+    assert grades[1][0] > 0.6 and grades[4][0] > 0.6
+    assert grades[2][0] < 0.2 and grades[3][0] == 0.0 and grades[5][0] == 0.0
+    single = service.grade_open_answer(reference_text=_CELL_REFERENCE, question_text=answers[0].question_text, user_answer=answers[0].user_answer)
+    assert single[0] == pytest.approx(grades[1][0])
+
+
+def test_clear_cut_open_answers_are_graded_locally_and_the_rest_escalated():
+    grade_kwargs = {
+        'question_id': 1,
+        'question_type': QuestionType.open,
+        'question_text': 'What do mitochondria do?',
+        'correct_option': None,
+        'explanation': 'Mitochondria produce ATP through cellular respiration, supplying energy to the cell.',
+        'reference_text': _CELL_REFERENCE,
+    }
+    with running_stub() as stub:
+        gemini = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url)
+        grading = GradingService(gemini_service=gemini)
+
+        copied = grading.grade_answer(user_answer='They produce ATP through cellular respiration, supplying energy.', **grade_kwargs)
+        empty = grading.grade_answer(user_answer='  ', **grade_kwargs)
+        unrelated = grading.grade_answer(user_answer='Pizza.', **grade_kwargs)
+        partial = grading.grade_answer(user_answer='They give the cell energy.', **grade_kwargs)
+        # Correct, but shares no words with the reference: only the LLM can tell it from the unrelated answer.
+        synonyms = grading.grade_answer(user_answer='Kreb cycle and oxidative phosphorylation', **grade_kwargs)
+        gemini.close()
+
+    assert copied[0] == 1.0 and copied[2] == 'local'
+    assert empty == (0.0, empty[1], 'local')
+    assert unrelated == partial == synonyms == (0.75, 'Stub feedback.', 'gemini')
+    assert stub.request_count == 3
+    assert (grading.tier_stats.local_accepted, grading.tier_stats.local_rejected, grading.tier_stats.escalated) == (1, 1, 3)
+
+
+def test_single_and_batch_grading_use_the_same_local_reference():
+    explanation = 'Mitochondria produce ATP through cellular respiration, supplying energy to the cell.'
+    answer = 'They produce ATP through cellular respiration, supplying energy.'
+    # The retrieved context lacks the explanation; only the question's stored explanation supports the answer.
+    reference_text = 'Quiz title: Cell biology\nQ: What is osmosis?'
+    grading = GradingService(gemini_service=GeminiService(api_key=''))
+
+    single = grading.grade_answer(
+        question_id=1,
+        question_type=QuestionType.open,
+        question_text='What do mitochondria do?',
+        user_answer=answer,
+        correct_option=None,
+        explanation=explanation,
+        reference_text=reference_text,
+    )
+    batch = grading.grade_batch(
+        reference_text=reference_text,
+        answers=[OpenAnswer(1, 'What do mitochondria do?', answer, explanation=explanation)],
+    )
+
+    assert single[2] == 'local'
+    assert batch[1] == single
+
+
+def test_sm2_intervals_and_due_heap_serve_the_most_overdue_cards():
+    ease, interval, repetitions = 2.5, 0, 0
+    intervals = []
+    for _ in range(4):
+        ease, interval, repetitions = sm2(ease, interval, repetitions, 5)
+        intervals.append(interval)
+    assert intervals == [1, 6, 17, 49]
+    assert sm2(ease, interval, repetitions, 1)[1:] == (1, 0)
+    assert sm2(1.3, 6, 2, 3)[0] == 1.3
+
+    now = datetime(2025, 1, 1)
+    entries = sorted((now + timedelta(minutes=offset), card_id) for card_id, offset in enumerate(range(-500, 500)))
+    heap = DueHeap(entries, {card_id: due for due, card_id in entries})
+    heap.push(0, now + timedelta(days=3))  # the most overdue card was just reviewed
+
+    due = heap.next_due(3, now)
+    assert [card_id for card_id, _ in due] == [1, 2, 3]
+    assert len(heap.next_due(10_000, now)) == 500
+
+
+def test_question_index_finds_rephrasings_through_lsh_candidates():
+    index = QuestionIndex(threshold=0.7)
+    bank = [f'Which enzyme number {number} catalyses reaction {number * 7} in pathway {number % 13}?' for number in range(2000)]
+    for question_id, text in enumerate(bank):
+        index.add(question_id, question_shingles(text))
+    index.add(5000, question_shingles('Which structure is the basic unit of life?', ['Cell', 'Atom']))
+
+    matches = index.near_duplicates(question_shingles('What is the basic unit of life?', ['Atom', 'Cell']))
+    assert [question_id for question_id, _ in matches] == [5000]
+    assert index.near_duplicates(question_shingles('What is the basic unit of matter?', ['Atom', 'Cell'])) == []
+    assert index.near_duplicates(question_shingles(bank[42]))[0] == (42, 1.0)
+
+    index.remove(5000)
+    assert index.near_duplicates(question_shingles('What is the basic unit of life?', ['Atom', 'Cell'])) == []
+    assert len(index) == 2000
+
+
+@pytest.mark.asyncio
+async def test_stub_speaks_the_anthropic_messages_protocol():
+    with running_stub(latency_ms=5, latency_distribution='lognormal', seed=7, stream_chunk_chars=5) as stub:
+        provider = ClaudeProvider(api_key='test-key', model_name='stub-model', base_url=stub.base_url)
+        cards = await provider.acomplete('Create up to 3 flashcards from these notes.', max_tokens=100)
+        check = await provider.acomplete('Return a JSON object with "correct" and "feedback".', max_tokens=100)
+
+        deltas = [text async for text in provider.astream('Create up to 2 flashcards.', max_tokens=100)]
+        await provider.aclose()
+
+    assert len(json.loads(cards)) == 3
+    assert json.loads(check)['correct'] is True
+    assert len(deltas) > 1
+    assert len(json.loads(''.join(deltas))) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claude_calls_share_one_connection_pool():
+    with running_stub(latency_ms=100) as stub:
+        provider = ClaudeProvider(api_key='test-key', model_name='stub-model', base_url=stub.base_url, max_connections=4)
+        started = time.perf_counter()
+        replies = await asyncio.gather(
+            *(provider.acomplete(f'Create up to {n} flashcards.', max_tokens=50) for n in range(1, 9))
+        )
+        elapsed = time.perf_counter() - started
+        client = provider._get_client()
+        await provider.aclose()
+
+    assert [len(json.loads(reply)) for reply in replies] == list(range(1, 9))
+    # Eight 100ms calls through four pooled connections take two rounds, not eight.
+    assert 0.2 <= elapsed < 0.6
+    assert provider._client is None and client is not None
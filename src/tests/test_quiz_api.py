@@ -1,19 +1,46 @@
 from __future__ import annotations
 
+from dataclasses import replace
+from datetime import timedelta
 import io
+import json
+import threading
+import time
 
 from fastapi.testclient import TestClient
 import pytest
 from starlette.datastructures import UploadFile
+from starlette.requests import ClientDisconnect
 
+from src.config import settings
 from src.database import Base
+from src.database import SessionLocal
 from src.database import engine
 from src.database import ensure_test_user
+from src.dependencies import get_claude_provider
 from src.dependencies import get_gemini_service
+from src.dependencies import get_grading_queue
 from src.dependencies import get_grading_service
+from src.dependencies import get_premade_store
+from src.benchmarks.llm_stub import running_stub
 from src.main import app
+from src.main import stream_cards
+from src.models import FlashcardSchedule
+from src.models import FlashcardSession
+from src.models import QuizReference
+from src.services.cache import ResultCache
+from src.services.gemini import GeminiResponseError
+from src.services.gemini import GeminiService
+from src.services.grading import GradingService
+from src.services.grading_queue import GradingQueue
+from src.services.llm import ProviderBusyError
+from src.services.premade import PremadeDeckStore
+from src.services.reference import build_grading_context
 from src.services.extract import ephemeral_upload
 from src.services.extract import validate_upload_file
+from src.services.flashcard_check import FlashcardAnswer
+from src.services.flashcard_check import FlashcardChecker
+from src.services.flashcard_sessions import forget_review_queue
 
 
 @pytest.fixture(autouse=True)
@@ -30,31 +57,35 @@ def client() -> TestClient:
         yield test_client
 
 
+_MCQ_TEXTS = ('What is the key concept?', 'Which organelle makes ATP?', 'Where does photosynthesis happen?')
+_OPEN_TEXTS = ('Explain the concept in your own words.', 'Describe how membranes control transport.')
+
+
 class _FakeGemini:
     def generate_questions(self, *, source_text, title, mcq_count, open_count, difficulty):
         questions = []
-        for _ in range(mcq_count):
+        for index in range(mcq_count):
             questions.append(
                 type(
                     'GeneratedQuestion',
                     (),
                     {
                         'type': 'mcq',
-                        'question_text': 'What is the key concept?',
+                        'question_text': _MCQ_TEXTS[index],
                         'options': ['One', 'Two', 'Three', 'Four'],
                         'correct_option': 'A',
                         'explanation': 'Because A is the supported statement.',
                     },
                 )()
             )
-        for _ in range(open_count):
+        for index in range(open_count):
             questions.append(
                 type(
                     'GeneratedQuestion',
                     (),
                     {
                         'type': 'open',
-                        'question_text': 'Explain the concept in your own words.',
+                        'question_text': _OPEN_TEXTS[index],
                         'options': None,
                         'correct_option': None,
                         'explanation': 'Strong answers should be concise and accurate.',
@@ -63,12 +94,39 @@ class _FakeGemini:
             )
         return questions, 123
 
+    async def agenerate_questions(self, **kwargs):
+        return self.generate_questions(**kwargs)
+
+    async def agenerate_questions_chunked(self, *, chunks, concurrency, **kwargs):
+        return self.generate_questions(source_text='\n\n'.join(chunks), **kwargs)
+
+    async def astream_questions_chunked(self, *, chunks, concurrency, **kwargs):
+        questions, _ = self.generate_questions(source_text='\n\n'.join(chunks), **kwargs)
+        for question in questions:
+            yield question
+
 
 class _FakeGrader:
+    defer_open_grading = False
+
     def grade_answer(self, **kwargs):
         return 2.5, 'High confidence answer.', 'fake'
 
 
+class _BatchOnlyGemini:
+    model_name = 'fake-model'
+
+    def __init__(self):
+        self.batch_calls = []
+
+    def grade_open_answer(self, **kwargs):
+        raise AssertionError('deferred answers must not be graded one by one')
+
+    def grade_open_answers(self, *, reference_text, answers):
+        self.batch_calls.append([answer.question_id for answer in answers])
+        return {answer.question_id: (0.5, f'Graded {answer.user_answer}', 'gemini') for answer in answers}
+
+
 def create_quiz(client: TestClient) -> int:
     response = client.post(
         '/api/quizzes',
@@ -82,6 +140,15 @@ def create_quiz(client: TestClient) -> int:
     return response.json()['id']
 
 
+def wait_for_grading(client: TestClient, attempt_id: int, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        session = client.get(f'/api/attempts/{attempt_id}').json()
+        if session['grading_progress']['pending'] == 0 or time.monotonic() > deadline:
+            return session
+        time.sleep(0.02)
+
+
 def test_quiz_crud_and_pagination(client: TestClient):
     for index in range(3):
         response = client.post(
@@ -159,6 +226,96 @@ def test_generation_and_attempt_flow(client: TestClient):
     app.dependency_overrides.clear()
 
 
+def test_streamed_generation_emits_one_event_per_question(client: TestClient):
+    app.dependency_overrides[get_gemini_service] = lambda: _FakeGemini()
+
+    quiz_id = create_quiz(client)
+    response = client.post(
+        f'/api/quizzes/{quiz_id}/generate/stream',
+        files={'file': ('notes.txt', b'Cells are the basic unit of life.', 'text/plain')},
+        data={'mcq_count': '2', 'open_count': '1', 'difficulty': 'intermediate'},
+    )
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = [block.split('\n', 1) for block in response.text.strip().split('\n\n')]
+    names = [name.removeprefix('event: ') for name, _ in events]
+    assert names == ['question', 'question', 'question', 'done']
+    payloads = [json.loads(data.removeprefix('data: ')) for _, data in events]
+    # Streamed questions are not saved yet; done lists them with their ids.
+    assert [(payload['id'], payload['position']) for payload in payloads[:-1]] == [(None, 0), (None, 1), (None, 2)]
+    assert payloads[-1]['created_count'] == 3
+
+    listed = client.get(f'/api/quizzes/{quiz_id}/questions').json()['items']
+    assert [item['type'] for item in listed] == ['mcq', 'mcq', 'open']
+    assert payloads[-1]['questions'] == listed
+
+    app.dependency_overrides.clear()
+
+
+def test_streamed_generation_stores_its_cache_entry_while_streaming(client: TestClient):
+    # Real streaming path: the generation cache writes to the database before the route saves the questions.
+    cache = ResultCache(namespace='generation', ttl_seconds=3600, max_entries=10, memory_entries=0)
+    with running_stub(stream_chunk_chars=7) as stub:
+        service = GeminiService(api_key='test-key', model_name='stub-model', base_url=stub.base_url, generation_cache=cache)
+        app.dependency_overrides[get_gemini_service] = lambda: service
+        quiz_id = create_quiz(client)
+
+        def generate():
+            return client.post(
+                f'/api/quizzes/{quiz_id}/generate/stream',
+                files={'file': ('notes.txt', b'Cells are the basic unit of life.', 'text/plain')},
+                data={'mcq_count': '1', 'open_count': '0'},
+            )
+
+        started = time.perf_counter()
+        first = generate()
+        elapsed = time.perf_counter() - started
+        second = generate()
+        service.close()
+
+    for response in (first, second):
+        events = [block.split('\n', 1) for block in response.text.strip().split('\n\n')]
+        assert [name for name, _ in events] == ['event: question', 'event: done']
+    assert elapsed < 3
+    assert stub.request_count == 1
+    assert cache.stats.db_hits == 1
+    listed = client.get(f'/api/quizzes/{quiz_id}/questions').json()['items']
+    assert [item['question_text'] for item in listed] == ['Which structure is the basic unit of life?']
+
+    app.dependency_overrides.clear()
+
+
+class _FailingStreamGemini(_FakeGemini):
+    async def astream_questions_chunked(self, *, chunks, concurrency, **kwargs):
+        questions, _ = self.generate_questions(source_text='\n\n'.join(chunks), **kwargs)
+        yield questions[0]
+        raise GeminiResponseError('stream broke')
+
+
+def test_failed_streamed_generation_keeps_the_previous_questions(client: TestClient):
+    app.dependency_overrides[get_gemini_service] = lambda: _FakeGemini()
+    quiz_id = create_quiz(client)
+
+    def generate():
+        return client.post(
+            f'/api/quizzes/{quiz_id}/generate/stream',
+            files={'file': ('notes.txt', b'Cells are the basic unit of life.', 'text/plain')},
+            data={'mcq_count': '2', 'open_count': '1', 'difficulty': 'intermediate'},
+        )
+
+    generate()
+    before = client.get(f'/api/quizzes/{quiz_id}/questions').json()['items']
+
+    app.dependency_overrides[get_gemini_service] = lambda: _FailingStreamGemini()
+    response = generate()
+    names = [block.split('\n', 1)[0] for block in response.text.strip().split('\n\n')]
+    assert names == ['event: question', 'event: error']
+    assert client.get(f'/api/quizzes/{quiz_id}/questions').json()['items'] == before
+
+    app.dependency_overrides.clear()
+
+
 def test_open_answer_score_is_clamped(client: TestClient):
     app.dependency_overrides[get_grading_service] = lambda: _FakeGrader()
 
@@ -182,7 +339,113 @@ def test_open_answer_score_is_clamped(client: TestClient):
         json={'user_answer': 'Water moves across a membrane.'},
     )
     assert answered.status_code == 200
-    assert answered.json()['score'] == 1.0
+    assert answered.json()['grading_status'] == 'pending'
+
+    session = wait_for_grading(client, attempt_id)
+    assert session['grading_progress'] == {'total': 1, 'graded': 1, 'pending': 0, 'deferred': 0, 'failed': 0}
+    assert session['answers'][0]['score'] == 1.0
+    assert session['answers'][0]['ai_feedback'] == 'High confidence answer.'
+
+    queue_status = client.get('/api/grading/queue').json()
+    assert queue_status['running'] is True
+    assert queue_status['depth'] == 0
+    assert queue_status['completed'] >= 1
+
+    app.dependency_overrides.clear()
+
+
+def test_deferred_open_answers_are_batch_graded_on_completion(client: TestClient):
+    gemini = _BatchOnlyGemini()
+    app.dependency_overrides[get_grading_service] = lambda: GradingService(
+        gemini_service=gemini, defer_open_grading=True, local_accept_score=2.0, local_reject_score=-1.0
+    )
+
+    quiz_id = create_quiz(client)
+    question_ids = []
+    for text in ('Describe osmosis', 'Describe diffusion'):
+        response = client.post(
+            f'/api/quizzes/{quiz_id}/questions',
+            json={'type': 'open', 'question_text': text, 'explanation': {'text': 'Membranes.'}},
+        )
+        question_ids.append(response.json()['id'])
+
+    attempt_id = client.post(f'/api/quizzes/{quiz_id}/attempts', json={'resume_if_exists': False}).json()['id']
+    for question_id in question_ids:
+        saved = client.put(f'/api/attempts/{attempt_id}/answers/{question_id}', json={'user_answer': 'Water moves.'})
+        assert saved.status_code == 200
+        assert saved.json()['graded_by'] == 'deferred'
+        assert saved.json()['score'] == 0.0
+
+    assert gemini.batch_calls == []
+
+    completed = client.post(f'/api/attempts/{attempt_id}/complete')
+    assert completed.status_code == 200
+    assert completed.json()['total_score'] == 1.0
+    assert gemini.batch_calls == [question_ids]
+
+    results = client.get(f'/api/attempts/{attempt_id}/results').json()
+    assert [item['ai_feedback'] for item in results['questions']] == ['Graded Water moves.'] * 2
+
+    app.dependency_overrides.clear()
+
+
+class _GatedGrader:
+    defer_open_grading = False
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.single_calls = []
+        self.batch_calls = []
+
+    def grade_answer(self, **kwargs):
+        self.single_calls.append(kwargs['question_id'])
+        self.gate.wait(5)
+        return 0.5, 'Graded in the background.', 'fake'
+
+    def grade_batch(self, *, reference_text, answers):
+        self.batch_calls.append([answer.question_id for answer in answers])
+        return {answer.question_id: (1.0, 'Graded on completion.', 'fake') for answer in answers}
+
+
+def test_completion_takes_over_background_grading_without_grading_twice(client: TestClient):
+    grader = _GatedGrader()
+    grading_queue = GradingQueue(workers=1, max_size=10, reference_builder=build_grading_context)
+    grading_queue.start()
+    app.dependency_overrides[get_grading_service] = lambda: grader
+    app.dependency_overrides[get_grading_queue] = lambda: grading_queue
+
+    quiz_id = create_quiz(client)
+    question_ids = []
+    for text in ('Describe osmosis', 'Describe diffusion'):
+        response = client.post(
+            f'/api/quizzes/{quiz_id}/questions',
+            json={'type': 'open', 'question_text': text, 'explanation': {'text': 'Membranes.'}},
+        )
+        question_ids.append(response.json()['id'])
+
+    attempt_id = client.post(f'/api/quizzes/{quiz_id}/attempts', json={'resume_if_exists': False}).json()['id']
+    for question_id in question_ids:
+        saved = client.put(f'/api/attempts/{attempt_id}/answers/{question_id}', json={'user_answer': 'Water moves.'})
+        assert saved.json()['grading_status'] == 'pending'
+
+    # The single worker is busy with the first answer; the second is still waiting in the queue.
+    deadline = time.monotonic() + 5
+    while grading_queue.in_flight == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    threading.Timer(0.2, grader.gate.set).start()
+
+    completed = client.post(f'/api/attempts/{attempt_id}/complete')
+    assert completed.status_code == 200
+    grading_queue.stop()
+
+    assert grader.single_calls == [question_ids[0]]
+    assert grader.batch_calls == [[question_ids[1]]]
+    assert grading_queue.cancelled == 1
+    results = client.get(f'/api/attempts/{attempt_id}/results').json()
+    assert [item['ai_feedback'] for item in results['questions']] == [
+        'Graded in the background.',
+        'Graded on completion.',
+    ]
 
     app.dependency_overrides.clear()
 
@@ -199,3 +462,360 @@ async def test_ephemeral_upload_cleanup():
 
     assert temp_path is not None
     assert not temp_path.exists()
+
+
+class _RecordingGrader:
+    defer_open_grading = False
+
+    def __init__(self):
+        self.references = []
+
+    def grade_answer(self, **kwargs):
+        self.references.append(kwargs['reference_text'])
+        return 0.5, 'Recorded.', 'fake'
+
+
+def test_open_answers_are_graded_against_retrieved_passages(client: TestClient, monkeypatch):
+    grader = _RecordingGrader()
+    app.dependency_overrides[get_gemini_service] = lambda: _FakeGemini()
+    app.dependency_overrides[get_grading_service] = lambda: grader
+    monkeypatch.setattr('src.services.reference.settings', replace(settings, grading_context_tokens=250))
+
+    quiz_id = create_quiz(client)
+    source = '\n\n'.join(
+        [
+            'Photosynthesis converts light into chemical energy inside chloroplasts. ' * 12,
+            'Mitochondria produce ATP through cellular respiration and the electron transport chain. ' * 10,
+            'Glaciers carve valleys as compacted ice flows slowly downhill. ' * 12,
+        ]
+    )
+    generated = client.post(
+        f'/api/quizzes/{quiz_id}/generate',
+        files={'file': ('notes.txt', source.encode(), 'text/plain')},
+        data={'mcq_count': '1', 'open_count': '0', 'difficulty': 'intermediate'},
+    )
+    assert generated.status_code == 200
+
+    question_id = client.post(
+        f'/api/quizzes/{quiz_id}/questions',
+        json={'type': 'open', 'question_text': 'How do mitochondria produce ATP?'},
+    ).json()['id']
+    attempt_id = client.post(f'/api/quizzes/{quiz_id}/attempts', json={'resume_if_exists': False}).json()['id']
+    client.put(f'/api/attempts/{attempt_id}/answers/{question_id}', json={'user_answer': 'Respiration.'})
+    wait_for_grading(client, attempt_id)
+
+    [reference] = grader.references
+    assert 'Mitochondria produce ATP' in reference
+    assert 'Glaciers' not in reference
+    assert len(reference) < len(source)
+
+    app.dependency_overrides.clear()
+
+
+def test_quiz_reference_is_versioned_on_question_changes(client: TestClient):
+    quiz_id = create_quiz(client)
+
+    def reference():
+        with SessionLocal() as db:
+            row = db.get(QuizReference, quiz_id)
+            return row.version, row.passages_json
+
+    question_id = client.post(
+        f'/api/quizzes/{quiz_id}/questions',
+        json={'type': 'open', 'question_text': 'Describe osmosis', 'explanation': {'text': 'Water crosses membranes.'}},
+    ).json()['id']
+    assert reference() == (1, ['Q: Describe osmosis\nReference explanation: Water crosses membranes.'])
+
+    client.patch(f'/api/questions/{question_id}', json={'question_text': 'Describe osmosis'})
+    assert reference()[0] == 1
+
+    client.patch(f'/api/questions/{question_id}', json={'explanation': {'text': 'Solvent moves to higher solute.'}})
+    assert reference() == (2, ['Q: Describe osmosis\nReference explanation: Solvent moves to higher solute.'])
+
+    client.delete(f'/api/questions/{question_id}')
+    assert reference() == (3, [])
+
+
+class _BusyClaude:
+    async def acomplete(self, prompt, *, max_tokens, operation='complete'):
+        raise ProviderBusyError('claude', retry_after=2.4)
+
+
+def test_provider_at_capacity_returns_503_with_retry_after(client: TestClient):
+    app.dependency_overrides[get_claude_provider] = lambda: _BusyClaude()
+
+    response = client.post('/flashcards/generate', json={'note_text': 'Cells are units of life.'})
+
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '3'
+
+    app.dependency_overrides.clear()
+
+
+def test_near_duplicate_questions_are_rejected_unless_allowed(client: TestClient):
+    quiz_id = create_quiz(client)
+    options = [{'key': 'A', 'text': 'Cell'}, {'key': 'B', 'text': 'Atom'}]
+
+    def create(text, **params):
+        payload = {'type': 'mcq', 'question_text': text, 'options': options, 'correct_option': 'A'}
+        return client.post(f'/api/quizzes/{quiz_id}/questions', json=payload, params=params)
+
+    original = create('Which structure is the basic unit of life?')
+    assert original.status_code == 201
+    other = create('Which organelle produces ATP?')
+    assert other.status_code == 201
+
+    rephrased = create('What is the basic unit of life?')
+    assert rephrased.status_code == 409
+    assert f'question {original.json()["id"]}' in rephrased.json()['detail']
+    assert create('What is the basic unit of life?', allow_duplicate='true').status_code == 201
+
+    edited = client.patch(f'/api/questions/{other.json()["id"]}', json={'question_text': 'Which structure is the basic unit of life?'})
+    assert edited.status_code == 409
+    client.delete(f'/api/questions/{original.json()["id"]}')
+    assert create('Which structure is a basic unit of life?').status_code == 409  # the allowed copy is indexed too
+
+
+class _RepetitiveGemini(_FakeGemini):
+    def generate_questions(self, **kwargs):
+        questions, latency = super().generate_questions(**kwargs)
+        for question in questions[1:]:
+            question.question_text = 'Which is the key concept?'
+        return questions, latency
+
+
+def test_generation_drops_near_duplicate_questions(client: TestClient):
+    app.dependency_overrides[get_gemini_service] = lambda: _RepetitiveGemini()
+    quiz_id = create_quiz(client)
+
+    generated = client.post(
+        f'/api/quizzes/{quiz_id}/generate',
+        files={'file': ('notes.txt', b'Cells are the basic unit of life.', 'text/plain')},
+        data={'mcq_count': '3', 'open_count': '0'},
+    )
+
+    assert generated.status_code == 200
+    assert [question['question_text'] for question in generated.json()['questions']] == ['What is the key concept?']
+    assert generated.json()['duplicates_dropped'] == 2
+    app.dependency_overrides.clear()
+
+
+class _ScriptedClaude:
+    api_key = 'test-key'
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    async def acomplete(self, prompt, *, max_tokens, operation='complete'):
+        self.calls += 1
+        return self.reply
+
+    async def astream(self, prompt, *, max_tokens, operation='stream'):
+        self.calls += 1
+        for start in range(0, len(self.reply), 7):
+            yield self.reply[start : start + 7]
+
+
+def test_flashcards_are_salvaged_from_untidy_claude_output(client: TestClient):
+    truncated = 'Sure!\n```json\n[{"term": "Cell", "definition": "Unit of life.",}, {"term": "ATP", "defin'
+    app.dependency_overrides[get_claude_provider] = lambda: _ScriptedClaude(truncated)
+
+    response = client.post('/flashcards/generate', json={'note_text': 'Cells.'})
+    assert response.status_code == 200
+    assert [card['term'] for card in response.json()['flashcards']] == ['Cell']
+
+    app.dependency_overrides[get_claude_provider] = lambda: _ScriptedClaude('I cannot help with that.')
+    response = client.post('/flashcards/generate', json={'note_text': 'Cells.'})
+    assert response.status_code == 502
+
+    app.dependency_overrides.clear()
+
+
+def test_flashcard_session_rates_one_card_at_a_time(client: TestClient):
+    cards = [{'term': term, 'definition': f'{term} definition'} for term in ('Cell', 'ATP', 'DNA')]
+    deck = client.post('/flashcards/decks', json={'title': 'Biology', 'cards': cards}).json()
+    card_ids = [card['id'] for card in deck['cards']]
+
+    session = client.post(f"/flashcards/decks/{deck['id']}/sessions").json()
+    assert session['card']['term'] == 'Cell'
+    assert session['remaining'] == 3
+
+    def rate(card_id, rating):
+        return client.post(f"/flashcards/sessions/{session['id']}/rate", json={'card_id': card_id, 'rating': rating})
+
+    assert rate(card_ids[1], 'easy').status_code == 409
+    assert rate(card_ids[0], 'missed').json()['card']['term'] == 'ATP'
+    assert rate(card_ids[1], 'easy').json()['card']['term'] == 'DNA'
+    state = rate(card_ids[2], 'hard').json()
+    assert (state['card']['term'], state['remaining']) == ('Cell', 2)
+
+    # The queue lives in the database too, so it survives losing the in-memory copy.
+    with SessionLocal() as db:
+        forget_review_queue(db.get(FlashcardSession, session['id']))
+    assert client.get(f"/flashcards/sessions/{session['id']}").json()['card']['term'] == 'Cell'
+
+    rate(card_ids[0], 'easy')
+    state = rate(card_ids[2], 'easy').json()
+    assert state['session_complete'] is True
+    assert state['card'] is None
+    assert state['stats'] == {'easy': 3, 'hard': 1, 'missed': 1}
+
+
+def test_rated_cards_are_scheduled_and_served_from_the_due_queue(client: TestClient, monkeypatch):
+    cards = [{'term': term, 'definition': f'{term} definition'} for term in ('Cell', 'ATP', 'DNA')]
+    deck = client.post('/flashcards/decks', json={'title': 'Biology', 'cards': cards}).json()
+    card_ids = [card['id'] for card in deck['cards']]
+    assert [item['card']['id'] for item in client.get('/flashcards/due').json()['items']] == card_ids
+
+    session = client.post(f"/flashcards/decks/{deck['id']}/sessions").json()
+    client.post(f"/flashcards/sessions/{session['id']}/rate", json={'card_id': card_ids[0], 'rating': 'easy'})
+    due = client.get('/flashcards/due', params={'limit': 5}).json()['items']
+    assert [item['card']['id'] for item in due] == card_ids[1:]
+
+    with SessionLocal() as db:
+        schedule = db.get(FlashcardSchedule, card_ids[0])
+        assert (schedule.interval_days, schedule.repetitions) == (1, 1)
+        schedule.interval_days = 400
+        db.commit()
+
+    monkeypatch.setattr('src.services.spaced_repetition.settings', replace(settings, flashcard_max_interval_days=30))
+    assert client.post('/flashcards/reschedule').json() == {'rescheduled': 1}
+    with SessionLocal() as db:
+        schedule = db.get(FlashcardSchedule, card_ids[0])
+        assert schedule.interval_days == 30
+        assert schedule.due_at == schedule.last_reviewed_at + timedelta(days=30)
+
+
+def test_premade_decks_are_generated_once_and_served_from_the_store(client: TestClient):
+    claude = _ScriptedClaude('[{"term": "Aorta", "definition": "Main artery."}, {"term": "Alveoli", "definition": "Air sacs."}]')
+    store = PremadeDeckStore(claude=claude, variants=2)
+    app.dependency_overrides[get_premade_store] = lambda: store
+
+    for _ in range(3):
+        response = client.post('/flashcards/generate-premade', json={'deck_title': 'Human Anatomy II', 'max_cards': 1})
+        assert response.status_code == 200
+        assert response.json()['subject'] == 'Medicine'
+        assert [card['term'] for card in response.json()['flashcards']] == ['Aorta']
+    assert claude.calls == 1
+
+    # A fresh process serves the persisted variant without calling Claude.
+    restarted = PremadeDeckStore(claude=claude, variants=2)
+    app.dependency_overrides[get_premade_store] = lambda: restarted
+    client.post('/flashcards/generate-premade', json={'deck_title': 'human anatomy ii'})
+    assert claude.calls == 1
+
+    assert client.post('/flashcards/premade/Human Anatomy II/regenerate').json()['variants'] == 2
+    assert claude.calls == 3
+    limited = client.post('/flashcards/premade/Human Anatomy II/regenerate')
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) > 0
+    assert client.post('/flashcards/premade/Unknown/regenerate').status_code == 404
+
+    app.dependency_overrides.clear()
+
+
+def test_batch_check_resolves_clear_answers_locally_and_sends_the_rest_in_one_call(client: TestClient):
+    claude = _ScriptedClaude(
+        '[{"card": 1, "correct": true, "feedback": "Nice paraphrase."},'
+        ' {"card": 2, "correct": false, "feedback": "Not a cheese."}]'
+    )
+    app.dependency_overrides[get_claude_provider] = lambda: claude
+    definition = 'Organelle that produces ATP, the powerhouse of the cell.'
+    answers = [
+        'organelle that produces ATP the powerhouse of the cel',
+        'Powerhouse of the cell, it makes ATP',
+        'A type of cheese',
+        'the',
+        '',
+    ]
+
+    response = client.post(
+        '/flashcards/check-batch',
+        json={'items': [{'term': 'Mitochondria', 'definition': definition, 'user_answer': answer} for answer in answers]},
+    )
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [(result['correct'], result['checked_by']) for result in results] == [
+        (True, 'local'),
+        (True, 'llm'),
+        (False, 'llm'),
+        (False, 'local'),
+        (False, 'local'),
+    ]
+    assert claude.calls == 1 and response.json()['llm_calls'] == 1
+
+    single = client.post('/flashcards/check', json={'term': 'Mitochondria', 'definition': definition, 'user_answer': definition})
+    assert single.json()['correct'] is True
+    assert claude.calls == 1
+    # A correct answer that shares no words with the definition is Claude's call, not a local miss.
+    paraphrase = FlashcardAnswer('Mitochondria', 'Organelle that produces ATP', 'The powerhouse of the cell')
+    assert FlashcardChecker().triage([paraphrase]) == [None]
+
+    app.dependency_overrides.clear()
+
+
+class _TrackedClaude(_ScriptedClaude):
+    closed = False
+
+    async def astream(self, prompt, *, max_tokens, operation='stream'):
+        try:
+            async for chunk in super().astream(prompt, max_tokens=max_tokens, operation=operation):
+                yield chunk
+        finally:
+            self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_card_stream_releases_claude_when_the_body_is_never_sent():
+    claude = _TrackedClaude('[{"term": "Cell", "definition": "Unit of life."}]')
+    response = await stream_cards(claude, 'Cells.', 5, 'flashcards_generate_stream')
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        raise OSError('client went away')
+
+    with pytest.raises(ClientDisconnect):
+        await response({'type': 'http', 'asgi': {'spec_version': '2.4'}}, receive, send)
+    assert claude.closed
+
+
+def test_flashcards_stream_as_ndjson_one_line_per_card(client: TestClient):
+    reply = '```json\n[{"term": "Cell", "definition": "Unit of life."}, {"term": "ATP", "definition": "Energy currency."}, {"term": "DNA"'
+    app.dependency_overrides[get_claude_provider] = lambda: _ScriptedClaude(reply)
+
+    with client.stream('POST', '/flashcards/generate/stream', json={'note_text': 'Cells.', 'max_cards': 5}) as response:
+        assert response.headers['content-type'].startswith('application/x-ndjson')
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert [(line['type'], line.get('term')) for line in lines] == [('card', 'Cell'), ('card', 'ATP'), ('done', None)]
+    assert lines[-1]['count'] == 2
+
+    app.dependency_overrides[get_claude_provider] = lambda: _ScriptedClaude('I cannot help with that.')
+    response = client.post('/flashcards/generate-upload/stream', data={'note_text': 'Cells.'})
+    assert [json.loads(line)['type'] for line in response.text.splitlines()] == ['error']
+
+    app.dependency_overrides.clear()
+
+
+def test_metrics_endpoint_reports_route_latency_and_db_time(client: TestClient):
+    quiz_id = create_quiz(client)
+    client.get(f'/api/quizzes/{quiz_id}')
+    client.post(
+        f'/api/quizzes/{quiz_id}/generate',
+        files={'file': ('notes.md', b'# Cells\n\nCells are the basic unit of life.', 'text/markdown')},
+        data={'mcq_count': '1', 'open_count': '0'},
+    )
+
+    response = client.get('/api/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    body = response.text
+    assert '# TYPE http_request_seconds histogram' in body
+    assert 'http_request_seconds_count{method="GET",route="/api/quizzes/{quiz_id}",status="200"}' in body
+    assert 'db_query_seconds_count{route="/api/quizzes/{quiz_id}"}' in body
+    assert 'extraction_seconds_count{file_type="md",pages="n/a"}' in body
+    assert 'llm_call_seconds_count{provider="gemini",method="agenerate_questions_chunked"}' in body
+    assert 'llm_in_flight{provider="claude"} 0' in body